@@ -1,6 +1,7 @@
-from crewai import Agent, Crew, Process, Task, LLM
+from crewai import Agent, Crew, Process, Task
 from crewai.project import CrewBase, agent, crew, task
 from CrewAI.sql_tools import LangGraphSQLTool
+from LangGRAPH_SQL.llm_provider import get_crew_llm
 import opik
 from opik.integrations.langchain import OpikTracer
 opik_tracer = OpikTracer()
@@ -31,8 +32,9 @@ class SqlCrew():
 			)
 		
 		# Initialize the LLM using CrewAI's native wrapper (LiteLLM)
-		# This avoids the "models/gemini..." prefix issue from langchain_google_genai
-		self.llm = LLM(
+		# This avoids the "models/gemini..." prefix issue from langchain_google_genai.
+		# LLM_MODE=record/replay/fake swaps in the offline provider.
+		self.llm = get_crew_llm(
 			model="gemini/gemini-2.5-flash", 
 			temperature=0,
 			callbacks=[opik_tracer]
@@ -0,0 +1,234 @@
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+import unicodedata
+
+from LangGRAPH_SQL.db_version import data_version_tracker, schema_hash
+from LangGRAPH_SQL.kb_service import kb_service
+from LangGRAPH_SQL.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_DIR = os.path.join(PROJECT_ROOT, '.cache')
+
+_UNITS = {
+    'zero': 0, 'one': 1, 'two': 2, 'three': 3, 'four': 4, 'five': 5, 'six': 6,
+    'seven': 7, 'eight': 8, 'nine': 9,
+}
+_TEENS = {
+    'ten': 10, 'eleven': 11, 'twelve': 12, 'thirteen': 13, 'fourteen': 14, 'fifteen': 15,
+    'sixteen': 16, 'seventeen': 17, 'eighteen': 18, 'nineteen': 19,
+}
+_TENS = {
+    'twenty': 20, 'thirty': 30, 'forty': 40, 'fifty': 50, 'sixty': 60, 'seventy': 70,
+    'eighty': 80, 'ninety': 90,
+}
+_SCALES = {'hundred': 100, 'thousand': 1000}
+_WORD_KIND = {**dict.fromkeys(_UNITS, 'unit'), **dict.fromkeys(_TEENS, 'teen'),
+              **dict.fromkeys(_TENS, 'tens'), 'hundred': 'hundred', 'thousand': 'thousand'}
+# Word kinds that may precede each kind inside one number ("two hundred and five", "twenty-one")
+_FOLLOWS = {
+    'unit': {None, 'tens', 'hundred', 'thousand'},
+    'teen': {None, 'hundred', 'thousand'},
+    'tens': {None, 'hundred', 'thousand'},
+    'hundred': {'unit', 'teen'},
+    'thousand': {'unit', 'teen', 'tens', 'hundred'},
+}
+_NUMBER_WORD = r"(?:" + "|".join(_WORD_KIND) + r")"
+_NUMBER_WORDS_RE = re.compile(
+    rf"\b{_NUMBER_WORD}(?:(?:\s+|-|(?<=hundred)\s+and\s+|(?<=thousand)\s+and\s+){_NUMBER_WORD})*\b"
+)
+_THOUSANDS_RE = re.compile(r"(?<=\d),(?=\d{3}\b)")
+_NUMBER_RE = re.compile(r"\d+(?:\.\d+)?")
+
+
+def _number_words(match) -> str:
+    """Digits for a run of number words; a word that cannot continue the number starts a new one."""
+    numbers, total, current, last = [], 0, 0, None
+    for word in re.findall(r"[a-z]+", match.group(0)):
+        if word == 'and':
+            continue
+        kind = _WORD_KIND[word]
+        if last not in _FOLLOWS[kind] or (kind == 'thousand' and total):
+            if last is not None:
+                numbers.append(total + current)
+            total, current, last = 0, 0, None
+            if kind in _SCALES:
+                # "hundred" or "thousand" on its own
+                current = 1
+        if kind == 'hundred':
+            current *= 100
+        elif kind == 'thousand':
+            total, current = (total + current) * 1000, 0
+        else:
+            current += _UNITS.get(word, 0) + _TEENS.get(word, 0) + _TENS.get(word, 0)
+        last = kind
+    numbers.append(total + current)
+    return " ".join(str(n) for n in numbers)
+
+
+def _canonical_number(match) -> str:
+    value = float(match.group(0))
+    return str(int(value)) if value.is_integer() else repr(value)
+
+
+def normalize_question(question: str) -> str:
+    """
+    Canonical form of a user question used as a cache key.
+
+    Case-folds, collapses whitespace, drops trailing punctuation and rewrites
+    numbers consistently ("five" -> "5", "two hundred and five" -> "205",
+    "1,000" -> "1000", "05.0" -> "5").
+    """
+    q = unicodedata.normalize("NFKC", question or "").casefold()
+    q = _NUMBER_WORDS_RE.sub(_number_words, q)
+    q = _THOUSANDS_RE.sub("", q)
+    q = _NUMBER_RE.sub(_canonical_number, q)
+    q = " ".join(q.split())
+    return q.rstrip("?!. ")
+
+
+class AnswerCache:
+    """
+    Persistent end-to-end cache of `run_sql_pipeline` answers.
+
+    Entries are keyed by the normalized question, the knowledge base hash and
+    the current finance.db data version, so any change to the schema or data
+    makes old answers unreachable; they are also purged as soon as the change
+    is noticed. Eviction is LRU (bounded by `max_entries`) plus a TTL.
+    """
+
+    def __init__(self, path: str, ttl_seconds: float = 3600, max_entries: int = 1000):
+        self.path = path
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._conn = None
+        self._current_version = None
+
+    def _connection(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS answers (
+                    key TEXT PRIMARY KEY,
+                    question TEXT NOT NULL,
+                    version TEXT NOT NULL,
+                    answer TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_answers_last_access ON answers(last_access)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_answers_version ON answers(version)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _version(self, conn) -> str:
+        """Current schema/data version; purges entries from older versions when it changes."""
+        version = f"{schema_hash(kb_service.path)}:{data_version_tracker.version()}"
+        if version != self._current_version:
+            dropped = conn.execute("DELETE FROM answers WHERE version != ?", (version,)).rowcount
+            conn.commit()
+            if dropped:
+                self.evictions += dropped
+                logger.info("Answer cache: database or schema changed, dropped %s stale entries", dropped)
+            self._current_version = version
+        return version
+
+    @staticmethod
+    def _key(normalized: str, version: str) -> str:
+        return hashlib.sha256(f"{version}\x00{normalized}".encode('utf-8')).hexdigest()
+
+    def get(self, question: str):
+        """Return the cached answer for `question`, or None on a miss."""
+        normalized = normalize_question(question)
+        with self._lock:
+            conn = self._connection()
+            key = self._key(normalized, self._version(conn))
+            row = conn.execute("SELECT answer, created_at FROM answers WHERE key = ?", (key,)).fetchone()
+            now = time.time()
+            if row is None:
+                self.misses += 1
+                return None
+            answer, created_at = row
+            if now - created_at > self.ttl_seconds:
+                conn.execute("DELETE FROM answers WHERE key = ?", (key,))
+                conn.commit()
+                self.evictions += 1
+                self.misses += 1
+                return None
+            conn.execute("UPDATE answers SET last_access = ? WHERE key = ?", (now, key))
+            conn.commit()
+            self.hits += 1
+            return answer
+
+    def put(self, question: str, answer: str):
+        normalized = normalize_question(question)
+        with self._lock:
+            conn = self._connection()
+            version = self._version(conn)
+            now = time.time()
+            conn.execute(
+                "INSERT OR REPLACE INTO answers (key, question, version, answer, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (self._key(normalized, version), normalized, version, answer, now, now)
+            )
+            # LRU eviction down to max_entries
+            evicted = conn.execute(
+                "DELETE FROM answers WHERE key IN ("
+                "SELECT key FROM answers ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            ).rowcount
+            conn.commit()
+            self.evictions += max(evicted, 0)
+
+    def clear(self):
+        with self._lock:
+            conn = self._connection()
+            conn.execute("DELETE FROM answers")
+            conn.commit()
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
+
+
+ANSWER_CACHE_ENABLED = os.environ.get("ANSWER_CACHE_ENABLED", "1") not in ("0", "false", "False")
+
+answer_cache = AnswerCache(
+    path=os.environ.get("ANSWER_CACHE_PATH", os.path.join(CACHE_DIR, 'answer_cache.sqlite')),
+    ttl_seconds=float(os.environ.get("ANSWER_CACHE_TTL", 3600)),
+    max_entries=int(os.environ.get("ANSWER_CACHE_MAX_ENTRIES", 1000)),
+)
+
+
+def _collect_cache_stats():
+    s = answer_cache.stats()
+    return [
+        ("answer_cache_hits_total", "counter", "End-to-end answer cache hits", [({}, s["hits"])]),
+        ("answer_cache_misses_total", "counter", "End-to-end answer cache misses", [({}, s["misses"])]),
+        ("answer_cache_evictions_total", "counter", "Answer cache entries evicted (LRU, TTL, data change)",
+         [({}, s["evictions"])]),
+        ("answer_cache_hit_ratio", "gauge", "End-to-end answer cache hit ratio", [({}, s["hit_rate"])]),
+    ]
+
+
+metrics.register_collector(_collect_cache_stats)
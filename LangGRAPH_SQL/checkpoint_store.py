@@ -0,0 +1,498 @@
+import os
+import json
+import time
+import uuid
+import queue
+import random
+import sqlite3
+import logging
+import threading
+from datetime import datetime, timezone
+
+from langgraph.checkpoint.base import (
+    WRITES_IDX_MAP,
+    BaseCheckpointSaver,
+    CheckpointTuple,
+    get_checkpoint_id,
+    get_checkpoint_metadata,
+    writes_sort_key,
+)
+
+from LangGRAPH_SQL.async_utils import run_blocking
+
+logger = logging.getLogger(__name__)
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_CHECKPOINT_PATH = os.path.join(os.path.dirname(CURRENT_DIR), '.cache', 'checkpoints.db')
+
+CHECKPOINT_ENABLED = os.environ.get("CHECKPOINT_ENABLED", "1") not in ("0", "false", "False")
+CHECKPOINT_DB_PATH = os.environ.get("CHECKPOINT_DB_PATH", DEFAULT_CHECKPOINT_PATH)
+# Max queued statements written in one transaction by the background writer
+CHECKPOINT_BATCH_SIZE = max(1, int(os.environ.get("CHECKPOINT_BATCH_SIZE", 256)))
+# Threads (checkpoints, writes, thread and run rows) untouched for this long are
+# deleted by the background writer; 0 keeps everything
+CHECKPOINT_RETENTION_HOURS = float(os.environ.get("CHECKPOINT_RETENTION_HOURS", 168))
+# Seconds between retention passes
+CHECKPOINT_PRUNE_INTERVAL = max(1.0, float(os.environ.get("CHECKPOINT_PRUNE_INTERVAL", 600)))
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS checkpoints (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    parent_checkpoint_id TEXT,
+    type TEXT,
+    checkpoint BLOB,
+    metadata_type TEXT,
+    metadata BLOB,
+    created_at REAL NOT NULL,
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id)
+);
+CREATE TABLE IF NOT EXISTS writes (
+    thread_id TEXT NOT NULL,
+    checkpoint_ns TEXT NOT NULL DEFAULT '',
+    checkpoint_id TEXT NOT NULL,
+    task_id TEXT NOT NULL,
+    idx INTEGER NOT NULL,
+    channel TEXT NOT NULL,
+    type TEXT,
+    value BLOB,
+    task_path TEXT NOT NULL DEFAULT '',
+    PRIMARY KEY (thread_id, checkpoint_ns, checkpoint_id, task_id, idx)
+);
+CREATE TABLE IF NOT EXISTS threads (
+    thread_id TEXT PRIMARY KEY,
+    metadata TEXT NOT NULL DEFAULT '{}',
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    thread_id TEXT NOT NULL,
+    status TEXT NOT NULL,
+    input TEXT,
+    error TEXT,
+    metadata TEXT NOT NULL DEFAULT '{}',
+    created_at TEXT NOT NULL,
+    updated_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_threads_created_at ON threads (created_at);
+CREATE INDEX IF NOT EXISTS idx_runs_thread_created ON runs (thread_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_runs_created_at ON runs (created_at);
+CREATE INDEX IF NOT EXISTS idx_threads_updated_at ON threads (updated_at);
+"""
+
+# Checkpoints other than the newest of each namespace of a thread, and their writes
+_LATEST = ("SELECT checkpoint_ns, MAX(checkpoint_id) FROM checkpoints WHERE thread_id = ? GROUP BY checkpoint_ns")
+_THREAD_TABLES = ("writes", "checkpoints", "runs", "threads")
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+def _now() -> str:
+    return datetime.now(timezone.utc).isoformat()
+
+
+class SQLiteCheckpointSaver(BaseCheckpointSaver[str]):
+    """
+    LangGraph checkpointer backed by a local SQLite file.
+
+    `put`/`put_writes` only serialize and enqueue; a single background thread
+    drains the queue and commits everything pending in one transaction, so a
+    node's latency doesn't include an fsync. Every queued statement gets a
+    sequence number; a read of one thread waits only until that thread's last
+    queued statement is committed (other threads' writes queued behind it are
+    not waited for), which keeps it consistent with what the graph has written.
+    Writes still queued when the process dies are lost; a resumed run then
+    restarts from the last checkpoint that made it to disk.
+
+    Storage is bounded in two ways: `compact_thread` drops a thread's history
+    but its latest checkpoint (the pipeline does this for ad-hoc threads once
+    their run ends), and the writer deletes threads untouched for
+    `retention_hours` every CHECKPOINT_PRUNE_INTERVAL seconds.
+    """
+
+    def __init__(self, path: str = None, *, serde=None, batch_size: int = None, retention_hours: float = None):
+        super().__init__(serde=serde)
+        self.path = path or CHECKPOINT_DB_PATH
+        self.batch_size = batch_size or CHECKPOINT_BATCH_SIZE
+        self.retention_hours = CHECKPOINT_RETENTION_HOURS if retention_hours is None else retention_hours
+        self._last_prune = time.monotonic()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        with _connect(self.path) as conn:
+            conn.executescript(_SCHEMA)
+        self._local = threading.local()
+        self._queue = queue.Queue()
+        # Sequence numbers of queued statements: last enqueued, last committed, last per thread
+        self._seq = threading.Condition()
+        self._enqueued = 0
+        self._committed = 0
+        self._thread_seq = {}
+        self.stats = {"statements": 0, "transactions": 0, "pruned_threads": 0}
+        self._writer = threading.Thread(target=self._write_loop, name="checkpoint-writer", daemon=True)
+        self._writer.start()
+
+    # --- Background writer ---
+
+    def _write_loop(self):
+        conn = _connect(self.path)
+        while True:
+            if self.retention_hours > 0 and time.monotonic() - self._last_prune >= CHECKPOINT_PRUNE_INTERVAL:
+                self._last_prune = time.monotonic()
+                try:
+                    self.prune(conn)
+                except Exception as e:
+                    logger.error("Checkpoint retention pass failed: %s", e, exc_info=True)
+            try:
+                batch = [self._queue.get(timeout=CHECKPOINT_PRUNE_INTERVAL)]
+            except queue.Empty:
+                continue
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                with conn:
+                    for _, sql, params in batch:
+                        conn.execute(sql, params)
+                self.stats["statements"] += len(batch)
+                self.stats["transactions"] += 1
+            except Exception as e:
+                logger.error("Checkpoint writer failed to commit %d statements: %s", len(batch), e, exc_info=True)
+            finally:
+                # Failed statements are logged and dropped: readers must not wait for them forever
+                with self._seq:
+                    self._committed = batch[-1][0]
+                    for _, _, params in batch:
+                        if self._thread_seq.get(params[0], 0) <= self._committed:
+                            self._thread_seq.pop(params[0], None)
+                    self._seq.notify_all()
+
+    def prune(self, conn: sqlite3.Connection = None) -> int:
+        """Delete threads with no checkpoint and no thread/run update within `retention_hours`."""
+        conn = conn or _connect(self.path)
+        cutoff = time.time() - self.retention_hours * 3600
+        cutoff_iso = datetime.fromtimestamp(cutoff, timezone.utc).isoformat()
+        stale = {r[0] for r in conn.execute(
+            "SELECT thread_id FROM checkpoints GROUP BY thread_id HAVING MAX(created_at) < ?", (cutoff,))}
+        stale |= {r[0] for r in conn.execute("SELECT thread_id FROM threads WHERE updated_at < ?", (cutoff_iso,))}
+        if stale:
+            # Still active: a recent checkpoint or a recent thread/run update
+            stale -= {r[0] for r in conn.execute(
+                "SELECT DISTINCT thread_id FROM checkpoints WHERE created_at >= ?", (cutoff,))}
+            stale -= {r[0] for r in conn.execute("SELECT thread_id FROM threads WHERE updated_at >= ?", (cutoff_iso,))}
+        stale = sorted(stale)
+        with conn:
+            for start in range(0, len(stale), 500):
+                chunk = stale[start:start + 500]
+                marks = ",".join("?" * len(chunk))
+                for table in _THREAD_TABLES:
+                    conn.execute(f"DELETE FROM {table} WHERE thread_id IN ({marks})", chunk)
+        if stale:
+            self.stats["pruned_threads"] += len(stale)
+            logger.info("Checkpoint retention: deleted %s threads idle for more than %sh",
+                        len(stale), self.retention_hours)
+        return len(stale)
+
+    def _enqueue(self, sql: str, params: tuple):
+        # Every statement's first parameter is its thread_id
+        with self._seq:
+            self._enqueued += 1
+            self._thread_seq[params[0]] = self._enqueued
+            self._queue.put((self._enqueued, sql, params))
+
+    def flush(self, thread_id: str = None):
+        """
+        Block until the writes queued so far are committed: those of `thread_id`
+        only when given, else all of them. Writes queued after the call are not waited for.
+        """
+        with self._seq:
+            target = self._enqueued if thread_id is None else self._thread_seq.get(thread_id, 0)
+            self._seq.wait_for(lambda: self._committed >= target)
+
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = _connect(self.path)
+            self._local.conn = conn
+        return conn
+
+    def _read(self, sql: str, params: tuple = (), thread_id: str = None):
+        self.flush(thread_id)
+        return self._connection().execute(sql, params).fetchall()
+
+    # --- Sync API ---
+
+    def _tuple(self, thread_id, checkpoint_ns, checkpoint_id, parent_id, type_, checkpoint, metadata_type, metadata):
+        writes = self._read(
+            "SELECT task_id, channel, type, value, task_path, idx FROM writes "
+            "WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+            (thread_id, checkpoint_ns, checkpoint_id), thread_id,
+        )
+        writes.sort(key=lambda w: writes_sort_key(w[4], w[0], w[5]))
+        return CheckpointTuple(
+            config={"configurable": {
+                "thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint_id,
+            }},
+            checkpoint=self.serde.loads_typed((type_, checkpoint)),
+            metadata=self.serde.loads_typed((metadata_type, metadata)),
+            parent_config=(
+                {"configurable": {
+                    "thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": parent_id,
+                }}
+                if parent_id else None
+            ),
+            pending_writes=[(w[0], w[1], self.serde.loads_typed((w[2], w[3]))) for w in writes],
+        )
+
+    def get_tuple(self, config):
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        columns = ("thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, "
+                   "type, checkpoint, metadata_type, metadata")
+        if checkpoint_id := get_checkpoint_id(config):
+            rows = self._read(
+                f"SELECT {columns} FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? AND checkpoint_id = ?",
+                (thread_id, checkpoint_ns, checkpoint_id), thread_id,
+            )
+        else:
+            rows = self._read(
+                f"SELECT {columns} FROM checkpoints WHERE thread_id = ? AND checkpoint_ns = ? "
+                f"ORDER BY checkpoint_id DESC LIMIT 1",
+                (thread_id, checkpoint_ns), thread_id,
+            )
+        return self._tuple(*rows[0]) if rows else None
+
+    def list(self, config, *, filter=None, before=None, limit=None):
+        where, params = [], []
+        if config:
+            where.append("thread_id = ?")
+            params.append(config["configurable"]["thread_id"])
+            checkpoint_ns = config["configurable"].get("checkpoint_ns")
+            if checkpoint_ns is not None:
+                where.append("checkpoint_ns = ?")
+                params.append(checkpoint_ns)
+            if checkpoint_id := get_checkpoint_id(config):
+                where.append("checkpoint_id = ?")
+                params.append(checkpoint_id)
+        if before and (before_id := get_checkpoint_id(before)):
+            where.append("checkpoint_id < ?")
+            params.append(before_id)
+        sql = ("SELECT thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, "
+               "type, checkpoint, metadata_type, metadata FROM checkpoints")
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY checkpoint_id DESC"
+        # Metadata is a serialized blob, so the filter is applied after decoding
+        if limit is not None and not filter:
+            sql += f" LIMIT {int(limit)}"
+
+        thread_id = config["configurable"]["thread_id"] if config else None
+        for row in self._read(sql, tuple(params), thread_id):
+            if filter:
+                metadata = self.serde.loads_typed((row[6], row[7]))
+                if not all(metadata.get(k) == v for k, v in filter.items()):
+                    continue
+            if limit is not None:
+                if limit <= 0:
+                    break
+                limit -= 1
+            yield self._tuple(*row)
+
+    def put(self, config, checkpoint, metadata, new_versions):
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        type_, blob = self.serde.dumps_typed(checkpoint)
+        metadata_type, metadata_blob = self.serde.dumps_typed(get_checkpoint_metadata(config, metadata))
+        self._enqueue(
+            "INSERT OR REPLACE INTO checkpoints (thread_id, checkpoint_ns, checkpoint_id, parent_checkpoint_id, "
+            "type, checkpoint, metadata_type, metadata, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (thread_id, checkpoint_ns, checkpoint["id"], config["configurable"].get("checkpoint_id"),
+             type_, blob, metadata_type, metadata_blob, time.time()),
+        )
+        return {"configurable": {
+            "thread_id": thread_id, "checkpoint_ns": checkpoint_ns, "checkpoint_id": checkpoint["id"],
+        }}
+
+    def put_writes(self, config, writes, task_id, task_path=""):
+        thread_id = config["configurable"]["thread_id"]
+        checkpoint_ns = config["configurable"].get("checkpoint_ns", "")
+        checkpoint_id = config["configurable"]["checkpoint_id"]
+        for idx, (channel, value) in enumerate(writes):
+            # Regular writes are kept once per (task, idx); special writes (errors, interrupts) replace
+            verb = "INSERT OR REPLACE" if channel in WRITES_IDX_MAP else "INSERT OR IGNORE"
+            type_, blob = self.serde.dumps_typed(value)
+            self._enqueue(
+                f"{verb} INTO writes (thread_id, checkpoint_ns, checkpoint_id, task_id, idx, channel, "
+                f"type, value, task_path) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (thread_id, checkpoint_ns, checkpoint_id, task_id, WRITES_IDX_MAP.get(channel, idx),
+                 channel, type_, blob, task_path),
+            )
+
+    def delete_thread(self, thread_id):
+        for table in _THREAD_TABLES:
+            self._enqueue(f"DELETE FROM {table} WHERE thread_id = ?", (thread_id,))
+        self.flush(thread_id)
+
+    def compact_thread(self, thread_id):
+        """
+        Keep only the latest checkpoint (per namespace) of a thread and its writes.
+        That is all a resume needs; the history before it is dropped. Non-blocking.
+        """
+        self._enqueue(f"DELETE FROM writes WHERE thread_id = ? AND (checkpoint_ns, checkpoint_id) NOT IN ({_LATEST})",
+                      (thread_id, thread_id))
+        self._enqueue(f"DELETE FROM checkpoints WHERE thread_id = ? AND (checkpoint_ns, checkpoint_id) NOT IN ({_LATEST})",
+                      (thread_id, thread_id))
+
+    def get_next_version(self, current, channel):
+        if current is None:
+            current_v = 0
+        elif isinstance(current, int):
+            current_v = current
+        else:
+            current_v = int(current.split(".")[0])
+        return f"{current_v + 1:032}.{random.random():016}"
+
+    # --- Async API: writes are already non-blocking, reads go to the blocking executor ---
+
+    async def aget_tuple(self, config):
+        return await run_blocking(self.get_tuple, config)
+
+    async def alist(self, config, *, filter=None, before=None, limit=None):
+        items = await run_blocking(lambda: list(self.list(config, filter=filter, before=before, limit=limit)))
+        for item in items:
+            yield item
+
+    async def aput(self, config, checkpoint, metadata, new_versions):
+        return self.put(config, checkpoint, metadata, new_versions)
+
+    async def aput_writes(self, config, writes, task_id, task_path=""):
+        return self.put_writes(config, writes, task_id, task_path)
+
+    async def adelete_thread(self, thread_id):
+        return await run_blocking(self.delete_thread, thread_id)
+
+
+class RunStore:
+    """Threads and runs behind the /threads endpoints, indexed by thread_id and created_at."""
+
+    def __init__(self, path: str = None):
+        self.path = path or CHECKPOINT_DB_PATH
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = _connect(self.path)
+        with self._conn:
+            self._conn.executescript(_SCHEMA)
+
+    @staticmethod
+    def _thread_row(row):
+        return {"thread_id": row[0], "metadata": json.loads(row[1]), "created_at": row[2], "updated_at": row[3]}
+
+    @staticmethod
+    def _run_row(row):
+        return {
+            "run_id": row[0], "thread_id": row[1], "status": row[2],
+            "input": json.loads(row[3]) if row[3] else None, "error": row[4],
+            "metadata": json.loads(row[5]), "created_at": row[6], "updated_at": row[7],
+        }
+
+    def create_thread(self, thread_id: str = None, metadata: dict = None) -> dict:
+        thread_id = thread_id or str(uuid.uuid4())
+        now = _now()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO threads (thread_id, metadata, created_at, updated_at) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT(thread_id) DO UPDATE SET metadata = excluded.metadata, updated_at = excluded.updated_at",
+                (thread_id, json.dumps(metadata or {}, default=str), now, now),
+            )
+        return self.get_thread(thread_id)
+
+    def get_thread(self, thread_id: str):
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT thread_id, metadata, created_at, updated_at FROM threads WHERE thread_id = ?", (thread_id,)
+            ).fetchone()
+        return self._thread_row(row) if row else None
+
+    def touch_thread(self, thread_id: str):
+        now = _now()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO threads (thread_id, metadata, created_at, updated_at) VALUES (?, '{}', ?, ?) "
+                "ON CONFLICT(thread_id) DO UPDATE SET updated_at = excluded.updated_at",
+                (thread_id, now, now),
+            )
+
+    def search_threads(self, metadata: dict = None, limit: int = 10, offset: int = 0):
+        where, params = "", []
+        if metadata:
+            where = " WHERE " + " AND ".join("json_extract(metadata, ?) = ?" for _ in metadata)
+            for k, v in metadata.items():
+                params.extend([f"$.{k}", v])
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT thread_id, metadata, created_at, updated_at FROM threads{where} "
+                f"ORDER BY created_at DESC LIMIT ? OFFSET ?",
+                (*params, int(limit), int(offset)),
+            ).fetchall()
+        return [self._thread_row(r) for r in rows]
+
+    def create_run(self, thread_id: str, input_: dict = None, metadata: dict = None) -> dict:
+        run_id = str(uuid.uuid4())
+        now = _now()
+        self.touch_thread(thread_id)
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO runs (run_id, thread_id, status, input, metadata, created_at, updated_at) "
+                "VALUES (?, ?, 'pending', ?, ?, ?, ?)",
+                (run_id, thread_id, json.dumps(input_, default=str) if input_ is not None else None,
+                 json.dumps(metadata or {}, default=str), now, now),
+            )
+        return {"run_id": run_id, "thread_id": thread_id, "status": "pending", "created_at": now}
+
+    def update_run(self, run_id: str, status: str, error: str = None):
+        with self._lock, self._conn:
+            self._conn.execute(
+                "UPDATE runs SET status = ?, error = ?, updated_at = ? WHERE run_id = ?",
+                (status, error, _now(), run_id),
+            )
+
+    def list_runs(self, thread_id: str, limit: int = 10, offset: int = 0):
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT run_id, thread_id, status, input, error, metadata, created_at, updated_at FROM runs "
+                "WHERE thread_id = ? ORDER BY created_at DESC LIMIT ? OFFSET ?",
+                (thread_id, int(limit), int(offset)),
+            ).fetchall()
+        return [self._run_row(r) for r in rows]
+
+
+_checkpointer = None
+_run_store = None
+_init_lock = threading.Lock()
+
+
+def get_checkpointer():
+    """Shared checkpointer, or None when CHECKPOINT_ENABLED is off."""
+    global _checkpointer
+    if not CHECKPOINT_ENABLED:
+        return None
+    with _init_lock:
+        if _checkpointer is None:
+            _checkpointer = SQLiteCheckpointSaver()
+            logger.info("Checkpointing graph state to %s", _checkpointer.path)
+    return _checkpointer
+
+
+def get_run_store() -> RunStore:
+    global _run_store
+    with _init_lock:
+        if _run_store is None:
+            _run_store = RunStore()
+    return _run_store
@@ -0,0 +1,138 @@
+import os
+import time
+import asyncio
+import hashlib
+import logging
+
+from LangGRAPH_SQL.answer_cache import normalize_question
+from LangGRAPH_SQL.db_version import data_version_tracker
+from LangGRAPH_SQL.kb_service import kb_service
+
+logger = logging.getLogger(__name__)
+
+COALESCE_ENABLED = os.environ.get("COALESCE_ENABLED", "1") not in ("0", "false", "False")
+
+
+class Flight:
+    """
+    One in-flight run shared by every request with the same key.
+
+    Events are appended to `history` as the producer yields them; each subscriber
+    replays the history from the start and then follows new events, so a
+    request that joins mid-run still receives the complete stream.
+    """
+
+    def __init__(self, key: str):
+        self.key = key
+        self.history = []
+        self.done = False
+        self.error = None
+        self.subscribers = 0
+        self.started_at = time.monotonic()
+        self.task = None
+        self._changed = asyncio.Condition()
+
+    async def _publish(self, event):
+        async with self._changed:
+            self.history.append(event)
+            self._changed.notify_all()
+
+    async def _finish(self, error=None):
+        async with self._changed:
+            self.error = error
+            self.done = True
+            self._changed.notify_all()
+
+    async def events(self):
+        self.subscribers += 1
+        position = 0
+        try:
+            while True:
+                async with self._changed:
+                    await self._changed.wait_for(lambda: position < len(self.history) or self.done)
+                    pending = self.history[position:]
+                    finished = self.done and position + len(pending) == len(self.history)
+                for event in pending:
+                    yield event
+                position += len(pending)
+                if finished:
+                    break
+            if self.error is not None:
+                raise self.error
+        finally:
+            self.subscribers -= 1
+            # Nobody is listening any more: stop spending LLM calls on it
+            if self.subscribers == 0 and not self.done and self.task is not None:
+                self.task.cancel()
+
+
+class RunCoalescer:
+    """
+    Single-flight execution of identical in-flight questions.
+
+    Requests are keyed by the normalized question, the knowledge base version,
+    the database data version and any request options that change the output
+    (stream mode, result format). The first request starts the run; identical
+    requests arriving while it is in flight attach to it instead of starting
+    their own, and receive the same events.
+    """
+
+    def __init__(self, enabled: bool = COALESCE_ENABLED):
+        self.enabled = enabled
+        self._flights = {}
+        self.stats = {"runs": 0, "collapsed": 0, "late_joins": 0}
+
+    def key_for(self, question: str, *options) -> str:
+        parts = [
+            normalize_question(question),
+            kb_service.get().version,
+            data_version_tracker.version(),
+            *[str(o) for o in options],
+        ]
+        return hashlib.sha256("\x1f".join(parts).encode('utf-8')).hexdigest()
+
+    def join(self, key: str, producer_factory):
+        """
+        Return `(flight, is_leader)` for `key`, starting `producer_factory()` (an
+        async iterator of events) if no identical run is in flight.
+        """
+        flight = self._flights.get(key)
+        if flight is not None and not flight.done:
+            self.stats["collapsed"] += 1
+            if flight.history:
+                self.stats["late_joins"] += 1
+            logger.info("Coalescing request onto in-flight run %s (%d events so far, %d subscribers)",
+                        key[:12], len(flight.history), flight.subscribers)
+            return flight, False
+
+        flight = Flight(key)
+        self._flights[key] = flight
+        self.stats["runs"] += 1
+        flight.task = asyncio.create_task(self._produce(flight, producer_factory))
+        return flight, True
+
+    async def _produce(self, flight: Flight, producer_factory):
+        error = None
+        try:
+            async for event in producer_factory():
+                await flight._publish(event)
+        except asyncio.CancelledError:
+            error = RuntimeError("Run cancelled: all subscribers disconnected")
+        except Exception as e:
+            error = e
+        finally:
+            if self._flights.get(flight.key) is flight:
+                del self._flights[flight.key]
+            await flight._finish(error)
+
+    def metrics(self) -> dict:
+        total = self.stats["runs"] + self.stats["collapsed"]
+        return {
+            **self.stats,
+            "requests": total,
+            "in_flight": len(self._flights),
+            "collapse_rate": self.stats["collapsed"] / total if total else 0.0,
+        }
+
+
+coalescer = RunCoalescer()
@@ -1,28 +1,61 @@
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.runnables import RunnablePassthrough, RunnableMap, RunnableLambda
-import pickle
 import re
 import ast
+import os
+import asyncio
 import logging
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
 
 logger = logging.getLogger(__name__)
-from LangGRAPH_SQL.rate_limiter_utils import rate_limiter
 
 from langgraph.graph import StateGraph, START, END
 from typing import Dict, Any, TypedDict, Annotated
 from operator import add
 
 from LangGRAPH_SQL.customer_helper import *
-from IPython.display import Image
+from LangGRAPH_SQL.kb_service import kb_service
+from LangGRAPH_SQL.schema_retriever import get_retriever, column_name, estimate_text_tokens
+from LangGRAPH_SQL.metrics import timed_node, COMPACT_SELECTIONS
 
 from dotenv import load_dotenv
 
 load_dotenv()
 
-with open('E:\\sql_crew\\LangGRAPH_SQL\\kb.pkl', 'rb') as f:
-    loaded_dict = pickle.load(f)
+# Max number of per-table column-selection LLM calls in flight at once.
+# The shared rate limiter still applies; 1 restores the sequential behaviour.
+COLUMN_SELECTION_CONCURRENCY = max(1, int(os.environ.get("COLUMN_SELECTION_CONCURRENCY", 4)))
+
+# Long-lived pool for the sync path, created on first use. It is separate from
+# async_utils' blocking executor because the sync pipeline may itself be running
+# on that executor, and waiting on it from one of its own workers can deadlock.
+_column_pool = None
+_column_pool_lock = threading.Lock()
+
+
+def _get_column_pool() -> ThreadPoolExecutor:
+    global _column_pool
+    if _column_pool is None:
+        with _column_pool_lock:
+            if _column_pool is None:
+                _column_pool = ThreadPoolExecutor(max_workers=COLUMN_SELECTION_CONCURRENCY,
+                                                  thread_name_prefix="column_selection")
+    return _column_pool
+
+# How tables and columns are selected:
+#   multi   - one subquestion call, then one column-selection call per table
+#   compact - subquestions, tables and columns from a single call; falls back to
+#             multi when the answer does not validate against the KB
+#   auto    - compact while the candidate tables' schema fits COMPACT_MAX_SCHEMA_TOKENS
+SELECTION_MODES = ("multi", "compact", "auto")
+SELECTION_MODE = os.environ.get("SELECTION_MODE", "auto").lower()
+if SELECTION_MODE not in SELECTION_MODES:
+    raise ValueError(f"Invalid SELECTION_MODE '{SELECTION_MODE}'. Choose one of {SELECTION_MODES}")
+COMPACT_MAX_SCHEMA_TOKENS = int(os.environ.get("COMPACT_MAX_SCHEMA_TOKENS", 1500))
+
 
 d_store = {
     "customer" : ['customer', 'sellers'],
@@ -35,33 +68,44 @@ class overallstate(TypedDict):
     table_lst: list[str]
     table_extract : Annotated[list[str], add]
     column_extract : Annotated[list[str], add]
+    compact_status : str
 
 
-def agent_subquestion(q,v):
-    rate_limiter.check_and_wait()
-    response = chain_subquestion.invoke({"tables": v, "user_query": q}).replace('```', '')
+def _extract_subquestion_list(response):
     match = re.search(r"\[\s*\[.*?\]\s*(,\s*\[.*?\]\s*)*\]", response, re.DOTALL)
     if match:
-        result = match.group(0)
-    return result
+        return match.group(0)
+    # Left to the caller's parser, which falls back to no subquestions
+    return response
 
-def solve_subquestion(q, lst):
-    final = []
-    for tab in lst:
-        desc = loaded_dict[tab][0]
-        final.append([tab, desc])
-    
-    result_dict = {item[0]: item[1] for item in final}
 
-    subquestion = agent_subquestion(q, str(result_dict))
+def agent_subquestion(q,v):
+    response = chain_subquestion.invoke({"tables": v, "user_query": q}).replace('```', '')
+    return _extract_subquestion_list(response)
+
+
+async def aagent_subquestion(q, v):
+    response = await chain_subquestion.ainvoke({"tables": v, "user_query": q})
+    return _extract_subquestion_list(response.replace('```', ''))
+
+
+def _subquestion_tables(q, lst):
+    # Only the relevant tables once the descriptions outgrow SCHEMA_TOKEN_BUDGET
+    tables = get_retriever().relevant_tables(q, lst)
+    return str(kb_service.get().table_descriptions(tables))
+
+
+def solve_subquestion(q, lst):
+    subquestion = agent_subquestion(q, _subquestion_tables(q, lst))
     return subquestion
 
 
+async def asolve_subquestion(q, lst):
+    return await aagent_subquestion(q, _subquestion_tables(q, lst))
 
-def agent_column_selection(mq, q,c):
-    rate_limiter.check_and_wait()
-    response = chain_column_extractor.invoke({"columns": c, "query": q, "main_question":mq}).replace('```', '')
 
+
+def _extract_column_list(response):
     match = re.search(r"\[\s*\[.*?\]\s*(,\s*\[.*?\]\s*)*\]", response, re.DOTALL)
     if match:
         result = match.group(0)
@@ -70,70 +114,256 @@ def agent_column_selection(mq, q,c):
     return result
 
 
-def solve_column_selection(main_q, list_sub):
-    final_col = []
+def agent_column_selection(mq, q,c):
+    response = chain_column_extractor.invoke({"columns": c, "query": q, "main_question":mq}).replace('```', '')
+    return _extract_column_list(response)
+
+
+async def aagent_column_selection(mq, q, c):
+    response = await chain_column_extractor.ainvoke({"columns": c, "query": q, "main_question": mq})
+    return _extract_column_list(response.replace('```', ''))
+
+
+def _validate_subquestion_entry(tab, valid_tables):
+    """(question, table_name) for one subquestion entry, repairing a swap; None if unusable."""
+    if not isinstance(tab, (list, tuple)) or len(tab) < 2:
+        logger.warning("Skipping malformed subquestion entry: %s", tab)
+        return None
+        
+    question = tab[0]
+    table_name = tab[1]
     
+    # Defensive Check: If table_name is not in the KB, 
+    # check if the LLM swapped them (sometimes happens)
+    if table_name not in valid_tables:
+        if question in valid_tables:
+            # LLM swapped table and question
+            logger.warning("Detected table/question swap. Swapping back: %s <-> %s", table_name, question)
+            table_name, question = question, table_name
+        else:
+            logger.error("LLM provided invalid table name: '%s'. Skipping.", table_name)
+            return None
+    return question, table_name
+
+
+def _column_selection_jobs(list_sub):
+    """Validate subquestion entries and return (question, table_name) pairs, repairing swaps."""
     # Pre-get valid table names for validation
-    valid_tables = list(loaded_dict.keys())
+    valid_tables = list(kb_service.get().keys())
+    jobs = [_validate_subquestion_entry(tab, valid_tables) for tab in list_sub]
+    return [job for job in jobs if job is not None]
+
+
+def _tag_columns(table_name, columns):
+    return [["name of table:" + table_name] + col_selec for col_selec in columns]
+
+
+def _parse_column_selection(table_name, out_column):
+    # clean the output if it has markdown code blocks
+    cleaned_out = out_column.replace('```json', '').replace('```', '').strip()
     
-    for tab in list_sub:
-        if not isinstance(tab, (list, tuple)) or len(tab) < 2:
-            logger.warning(f"Skipping malformed subquestion entry: {tab}")
-            continue
-            
-        question = tab[0]
-        table_name = tab[1]
-        
-        # Defensive Check: If table_name is not in loaded_dict, 
-        # check if the LLM swapped them (sometimes happens)
-        if table_name not in valid_tables:
-            if question in valid_tables:
-                # LLM swapped table and question
-                logger.warning(f"Detected table/question swap. Swapping back: {table_name} <-> {question}")
-                table_name, question = question, table_name
-            else:
-                logger.error(f"LLM provided invalid table name: '{table_name}'. Skipping.")
-                continue
+    try:
+        trans_col = ast.literal_eval(cleaned_out)
+    except Exception as e:
+        logger.error("Failed to parse column selection output: %s. Error: %s", out_column, e)
+        trans_col = []
+
+    return _tag_columns(table_name, trans_col)
+
+
+def solve_column_selection(main_q, list_sub, concurrency=None):
+    """
+    Select columns for every (subquestion, table) pair.
+
+    The per-table LLM calls are independent, so they run on a shared thread
+    pool, at most `concurrency` at a time (default and upper bound
+    COLUMN_SELECTION_CONCURRENCY). Each call runs in a copy of the caller's
+    context, so log lines keep the run's ids. Results keep the order of `list_sub`.
+    """
+    jobs = _column_selection_jobs(list_sub)
+    concurrency = concurrency or COLUMN_SELECTION_CONCURRENCY
+
+    def run(job):
+        question, table_name = job
+        try:
+            columns = get_retriever().column_slice(table_name, f"{question} {main_q}")
+            out_column = agent_column_selection(main_q, question, columns)
+            return _parse_column_selection(table_name, out_column)
+        except Exception as e:
+            logger.error("Unexpected error processing table '%s': %s", table_name, e)
+            return []
+
+    if concurrency == 1 or len(jobs) <= 1:
+        results = [run(job) for job in jobs]
+    else:
+        slots = threading.Semaphore(concurrency)
+
+        def bounded(job):
+            with slots:
+                return run(job)
+
+        pool = _get_column_pool()
+        # One context copy per job: a Context cannot be entered by two threads at once
+        futures = [pool.submit(contextvars.copy_context().run, bounded, job) for job in jobs]
+        results = [f.result() for f in futures]
+
+    final_col = []
+    for inter in results:
+        final_col.extend(inter)
+    return final_col
+
 
+async def asolve_column_selection(main_q, list_sub, concurrency=None):
+    """Async counterpart of `solve_column_selection` bounded by a semaphore."""
+    jobs = _column_selection_jobs(list_sub)
+    semaphore = asyncio.Semaphore(concurrency or COLUMN_SELECTION_CONCURRENCY)
+
+    async def run(job):
+        question, table_name = job
         try:
-            columns = loaded_dict[table_name][1]
-            out_column = agent_column_selection(main_q, question, str(columns))
-            # clean the output if it has markdown code blocks
-            cleaned_out = out_column.replace('```json', '').replace('```', '').strip()
-            
-            try:
-                trans_col = ast.literal_eval(cleaned_out)
-            except Exception as e:
-                logger.error(f"Failed to parse column selection output: {out_column}. Error: {e}")
-                trans_col = []
-
-            inter = []
-            for col_selec in trans_col:
-                new_col = ["name of table:" + table_name] + col_selec
-                inter.append(new_col)
-            final_col.extend(inter)
-            
+            columns = get_retriever().column_slice(table_name, f"{question} {main_q}")
+            async with semaphore:
+                out_column = await aagent_column_selection(main_q, question, columns)
+            return _parse_column_selection(table_name, out_column)
         except Exception as e:
-            logger.error(f"Unexpected error processing table '{table_name}': {e}")
-            continue
-            
+            logger.error("Unexpected error processing table '%s': %s", table_name, e)
+            return []
+
+    results = await asyncio.gather(*(run(job) for job in jobs))
+
+    final_col = []
+    for inter in results:
+        final_col.extend(inter)
     return final_col
 
 
-def sq_node(state: overallstate):
+def _compact_schema(q, lst):
+    tables = get_retriever().relevant_tables(q, lst)
+    return kb_service.get().schema_text_for(tables)
+
+
+def _use_compact(schema_text):
+    if SELECTION_MODE == "auto":
+        return estimate_text_tokens(schema_text) <= COMPACT_MAX_SCHEMA_TOKENS
+    return SELECTION_MODE == "compact"
+
+
+def _validate_compact_selection(response):
+    """
+    (table_extract, column_extract) from a compact-mode answer, or None if it
+    does not validate against the KB: every entry must name a KB table (swaps
+    repaired as in the multi-call path) and only columns of that table.
+    """
+    cleaned = response.replace('```json', '').replace('```', '').strip()
+    start, end = cleaned.find('['), cleaned.rfind(']')
+    try:
+        entries = ast.literal_eval(cleaned[start:end + 1]) if start != -1 else None
+    except Exception as e:
+        logger.warning("Failed to parse compact selection output: %s. Error: %s", response, e)
+        return None
+    if not isinstance(entries, list) or not entries:
+        logger.warning("Compact selection returned no tables: %s", response)
+        return None
+
+    kb = kb_service.get()
+    valid_tables = list(kb.keys())
+    table_extract, column_extract = [], []
+    for entry in entries:
+        if not isinstance(entry, (list, tuple)) or len(entry) != 3 or not isinstance(entry[2], (list, tuple)):
+            logger.warning("Malformed compact selection entry: %s", entry)
+            return None
+        job = _validate_subquestion_entry(entry[:2], valid_tables)
+        if job is None:
+            return None
+        question, table_name = job
+        known = {column_name(col) for col in kb[table_name][1]}
+        for col in entry[2]:
+            if not (isinstance(col, (list, tuple)) and len(col) == 2 and all(isinstance(c, str) for c in col)):
+                logger.warning("Malformed compact column entry for '%s': %s", table_name, col)
+                return None
+            if col[0].strip() not in known:
+                logger.warning("Compact selection picked unknown column '%s' of table '%s'", col[0], table_name)
+                return None
+        table_extract.append([question, table_name])
+        column_extract.extend(_tag_columns(table_name, [list(col) for col in entry[2]]))
+    if not column_extract:
+        return None
+    return table_extract, column_extract
+
+
+def _compact_result(response):
+    selection = _validate_compact_selection(response)
+    if selection is None:
+        COMPACT_SELECTIONS.labels("fallback").inc()
+        logger.info("Compact selection did not validate; falling back to the multi-call path")
+        return {"compact_status": "fallback"}
+    COMPACT_SELECTIONS.labels("ok").inc()
+    table_extract, column_extract = selection
+    return {"table_extract": table_extract, "column_extract": column_extract, "compact_status": "ok"}
+
+
+@timed_node("compact")
+def compact_node(state: overallstate):
     q = state['user_query']
-    lst = state['table_lst']
-    o = solve_subquestion(q, lst)
+    schema = _compact_schema(q, state['table_lst'])
+    if not _use_compact(schema):
+        COMPACT_SELECTIONS.labels("skipped").inc()
+        return {"compact_status": "skipped"}
+    try:
+        response = chain_compact_selection.invoke({"schema": schema, "user_query": q})
+    except Exception as e:
+        logger.error("Compact selection call failed: %s", e)
+        response = ''
+    return _compact_result(response)
+
+
+@timed_node("compact")
+async def acompact_node(state: overallstate):
+    q = state['user_query']
+    schema = _compact_schema(q, state['table_lst'])
+    if not _use_compact(schema):
+        COMPACT_SELECTIONS.labels("skipped").inc()
+        return {"compact_status": "skipped"}
+    try:
+        response = await chain_compact_selection.ainvoke({"schema": schema, "user_query": q})
+    except Exception as e:
+        logger.error("Compact selection call failed: %s", e)
+        response = ''
+    return _compact_result(response)
+
+
+def _selection_entry(state: overallstate):
+    return "subquestion" if SELECTION_MODE == "multi" else "compact"
+
+
+def _after_compact(state: overallstate):
+    return END if state.get('compact_status') == "ok" else "subquestion"
+
+
+def _parse_subquestions(o):
     # clean the output if it has markdown code blocks
     cleaned_o = o.replace('```json', '').replace('```', '').strip()
     try:
         parsed_o = ast.literal_eval(cleaned_o)
     except Exception as e:
-        logger.error(f"Failed to parse subquestion output: {o}. Error: {e}")
+        logger.error("Failed to parse subquestion output: %s. Error: %s", o, e)
         parsed_o = []
         
     return {"table_extract": parsed_o}
 
+@timed_node("subquestion")
+def sq_node(state: overallstate):
+    q = state['user_query']
+    lst = state['table_lst']
+    o = solve_subquestion(q, lst)
+    return _parse_subquestions(o)
+
+@timed_node("subquestion")
+async def asq_node(state: overallstate):
+    o = await asolve_subquestion(state['user_query'], state['table_lst'])
+    return _parse_subquestions(o)
+
+@timed_node("column_e")
 def column_node(state: overallstate):
     subq = state['table_extract']
     mq = state['user_query']
@@ -141,12 +371,22 @@ def column_node(state: overallstate):
     o = solve_column_selection(mq, subq)
     return {"column_extract": o}
 
+@timed_node("column_e")
+async def acolumn_node(state: overallstate):
+    subq = state['table_extract']
+    mq = state['user_query']
+    
+    o = await asolve_column_selection(mq, subq)
+    return {"column_extract": o}
+
 
 builder_final = StateGraph(overallstate)
-builder_final.add_node("subquestion", sq_node)
-builder_final.add_node("column_e", column_node)
+builder_final.add_node("compact", RunnableLambda(compact_node, afunc=acompact_node, name="compact"))
+builder_final.add_node("subquestion", RunnableLambda(sq_node, afunc=asq_node, name="subquestion"))
+builder_final.add_node("column_e", RunnableLambda(column_node, afunc=acolumn_node, name="column_e"))
 
-builder_final.add_edge(START, "subquestion")
+builder_final.add_conditional_edges(START, _selection_entry, ["compact", "subquestion"])
+builder_final.add_conditional_edges("compact", _after_compact, ["subquestion", END])
 builder_final.add_edge("subquestion", "column_e")
 
 builder_final.add_edge("column_e", END)
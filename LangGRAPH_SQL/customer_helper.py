@@ -1,18 +1,19 @@
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.runnables import RunnablePassthrough, RunnableMap, RunnableLambda
 import pickle
 import re
 from dotenv import load_dotenv
+from LangGRAPH_SQL.llm_cache import cached_model
+from LangGRAPH_SQL.llm_provider import lazy_chat_model
 load_dotenv()
 
 
 # Reasoning Model (Updated to 2.5)
-model_pro = ChatGoogleGenerativeAI(temperature=0, model='gemini-2.5-flash')
+model_pro = lazy_chat_model(temperature=0, model='gemini-2.5-flash')
 
 # Speed Model (Flash)
-model_flash = ChatGoogleGenerativeAI(temperature=0, model='gemini-2.5-flash')
+model_flash = lazy_chat_model(temperature=0, model='gemini-2.5-flash')
 
 # Aliasing for backward compatibility in the chain definitions
 model = model_pro
@@ -110,7 +111,7 @@ chain_subquestion = (
         "user_query": lambda x: x["user_query"]
     })
     | template_subquestion
-    | model
+    | cached_model(model, "chain_subquestion")
     | StrOutputParser()
 )
 
@@ -184,7 +185,57 @@ chain_column_extractor = (
         "main_question": lambda x: x["main_question"]
     })
     | template_column
-    | model
+    | cached_model(model, "chain_column_extractor")
+    | StrOutputParser()
+)
+
+
+################################ Compact: subquestions, tables and columns in one call ##########
+
+template_compact = ChatPromptTemplate.from_messages([
+    ("system", """
+You are an intelligent schema selector for a Text-to-SQL agent. In a single step you break the user question into subquestions, choose the one table that answers each of them and select the columns of that table needed to write the SQL query.
+"""),
+
+    ("human", '''
+You are given:
+- A user question
+- The schema: each table name with its description and its column list (column name: description, type, sample values)
+
+Instructions:
+1. Break the user question into minimal, specific subquestions. If several subquestions map to the same table, club them into one entry.
+2. For each entry choose exactly one table whose description clearly contains the needed information. A table that does not answer a subquestion may still be needed as a link (join) with another selected table. Ignore subquestions that no table can answer.
+3. For each chosen table select **only** the columns needed to write the SQL query:
+   - ALWAYS include the unique identifiers of the entity being queried and any column needed to join or group.
+   - When a value depends on several columns or repeated rows (quantities, prices, splits, installments), select all of them.
+   - If the question is about **spending, expenses, or budgets** and a descriptive column (like 'merchant', 'description', 'store_name', 'seller_name') is available, ALWAYS select it.
+   - NEVER select the `customer_unique_id` column.
+4. Use table and column names exactly as written in the schema.
+5. For each column, give its description from the schema plus what part of the question it answers, and mention that the column has many values apart from the samples.
+
+Output format:
+Return only a list of lists like below, with double-quoted strings and no other text. Each entry has exactly 3 elements: the subquestion, the table name and the list of [column name, description] pairs.
+[["<subquestion>", "<table name>", [["<column name 1>", "<description>"], ["<column name 2>", "<description>"]]]]
+
+If no table can answer the question:
+[]
+
+Schema:
+{schema}
+
+User question:
+{user_query}
+''')
+])
+
+
+chain_compact_selection = (
+    RunnableMap({
+        "schema": lambda x: x["schema"],
+        "user_query": lambda x: x["user_query"]
+    })
+    | template_compact
+    | cached_model(model, "chain_compact_selection")
     | StrOutputParser()
 )
 
@@ -243,7 +294,7 @@ chain_filter_extractor = (
         "query": lambda x: x["query"]
     })
     | template_filter_check
-    | model_llama
+    | cached_model(model_llama, "chain_filter_extractor")
     | StrOutputParser()
 )
 
@@ -317,7 +368,7 @@ chain_query_extractor = (
         "filters": lambda x: x["filters"]
     })
     | template_sql_query
-    | model
+    | cached_model(model, "chain_query_extractor")
     | StrOutputParser()
 )
 
@@ -382,6 +433,6 @@ chain_query_validator = (
         "all_table_info": lambda x: x["all_table_info"],
     })
     | template_validation
-    | model
+    | cached_model(model, "chain_query_validator")
     | StrOutputParser()
 )
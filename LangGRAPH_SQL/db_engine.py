@@ -0,0 +1,103 @@
+import os
+import logging
+import threading
+from urllib.parse import quote
+
+from sqlalchemy import create_engine, event
+from sqlalchemy.pool import QueuePool
+
+from LangGRAPH_SQL.async_utils import BLOCKING_WORKERS
+
+logger = logging.getLogger(__name__)
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+# FINANCE_DB_PATH points every component at another database (e.g. a generated benchmark ledger)
+DB_PATH = os.environ.get("FINANCE_DB_PATH", os.path.join(os.path.dirname(CURRENT_DIR), 'finance.db'))
+
+# Bytes of the database file SQLite may memory-map (0 disables mmap)
+SQLITE_MMAP_SIZE = int(os.environ.get("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))
+# Page cache per connection; negative values are KiB (SQLite convention), so -2000 = 2 MB.
+# With mmap on, pages are served from the OS cache anyway; a larger page cache
+# also raises the in-memory sort threshold, which made big GROUP BYs slower in
+# benchmarks/bench_sqlite_engine.py. Raise it for index-heavy point lookups.
+SQLITE_CACHE_SIZE = int(os.environ.get("SQLITE_CACHE_SIZE", -2000))
+# Where sorts/GROUP BY/DISTINCT spill: DEFAULT, FILE or MEMORY. MEMORY speeds up
+# DISTINCT but was ~3x slower on large GROUP BY aggregates in
+# benchmarks/bench_sqlite_engine.py, so it is opt-in.
+SQLITE_TEMP_STORE = os.environ.get("SQLITE_TEMP_STORE", "DEFAULT").upper()
+# How long a read waits on a writer's lock before failing
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get("SQLITE_BUSY_TIMEOUT_MS", 5000))
+# Pooled connections; defaults to the blocking executor's thread count so every
+# worker can hold one without waiting
+SQLITE_POOL_SIZE = int(os.environ.get("SQLITE_POOL_SIZE", BLOCKING_WORKERS))
+SQLITE_POOL_OVERFLOW = int(os.environ.get("SQLITE_POOL_OVERFLOW", 4))
+
+
+def read_pragmas(mmap_size: int = None, cache_size: int = None, temp_store: str = None):
+    """PRAGMA statements applied to every read-only connection."""
+    temp_store = (temp_store or SQLITE_TEMP_STORE).upper()
+    if temp_store not in ("DEFAULT", "FILE", "MEMORY"):
+        raise ValueError(f"Invalid SQLITE_TEMP_STORE '{temp_store}'. Use DEFAULT, FILE or MEMORY")
+    return [
+        "PRAGMA query_only = ON",
+        f"PRAGMA mmap_size = {SQLITE_MMAP_SIZE if mmap_size is None else int(mmap_size)}",
+        f"PRAGMA cache_size = {SQLITE_CACHE_SIZE if cache_size is None else int(cache_size)}",
+        f"PRAGMA temp_store = {temp_store}",
+        f"PRAGMA busy_timeout = {SQLITE_BUSY_TIMEOUT_MS}",
+    ]
+
+
+def apply_read_pragmas(dbapi_conn, mmap_size: int = None, cache_size: int = None, temp_store: str = None):
+    cursor = dbapi_conn.cursor()
+    try:
+        for pragma in read_pragmas(mmap_size, cache_size, temp_store):
+            cursor.execute(pragma)
+    finally:
+        cursor.close()
+
+
+def readonly_uri(db_path: str) -> str:
+    """`file:` URI that opens the database read-only (no journal/WAL writes from this side)."""
+    path = os.path.abspath(db_path).replace(os.sep, '/')
+    return f"file:{quote(path, safe='/:')}?mode=ro"
+
+
+def create_readonly_engine(db_path: str = DB_PATH, mmap_size: int = None, cache_size: int = None,
+                           temp_store: str = None, pool_size: int = None, max_overflow: int = None):
+    """
+    SQLAlchemy engine over a SQLite file opened in read-only URI mode.
+
+    Every pooled connection gets `query_only`, `mmap_size`, `cache_size`,
+    `temp_store` and a busy timeout on connect. Journal mode is left to
+    the writer (a read-only connection can't change it); with WAL, readers here
+    never block the writer and vice versa.
+    """
+    engine = create_engine(
+        f"sqlite:///{readonly_uri(db_path)}&uri=true",
+        poolclass=QueuePool,
+        pool_size=SQLITE_POOL_SIZE if pool_size is None else pool_size,
+        max_overflow=SQLITE_POOL_OVERFLOW if max_overflow is None else max_overflow,
+        connect_args={"check_same_thread": False},
+    )
+
+    @event.listens_for(engine, "connect")
+    def _on_connect(dbapi_conn, connection_record):
+        apply_read_pragmas(dbapi_conn, mmap_size, cache_size, temp_store)
+
+    return engine
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """Shared read-only engine for finance.db, used by the executor and the filter matcher."""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = create_readonly_engine()
+            logger.info("Read-only SQLite engine for %s (mmap=%s, cache_size=%s, temp_store=%s, pool=%s+%s)",
+                        DB_PATH, SQLITE_MMAP_SIZE, SQLITE_CACHE_SIZE, SQLITE_TEMP_STORE,
+                        SQLITE_POOL_SIZE, SQLITE_POOL_OVERFLOW)
+    return _engine
@@ -0,0 +1,72 @@
+import os
+import sqlite3
+import hashlib
+import logging
+import threading
+
+from LangGRAPH_SQL.db_engine import DB_PATH
+
+logger = logging.getLogger(__name__)
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+# Same resolution as kb_service: KB_PATH may select the JSON knowledge base
+KB_PATH = os.environ.get("KB_PATH", os.path.join(CURRENT_DIR, 'kb.pkl'))
+
+
+class DataVersionTracker:
+    """
+    Cheap change detection for a SQLite database file.
+
+    Combines the file's identity (inode, size, mtime) with SQLite's
+    `PRAGMA data_version`, read on a long-lived connection. data_version changes
+    whenever another connection commits to the database (including WAL writes
+    that don't touch the main file's mtime yet); the stat part catches the file
+    being replaced wholesale, e.g. by `database_generator_script.py`.
+    """
+
+    def __init__(self, db_path: str = DB_PATH):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn = None
+        self._inode = None
+
+    def _connect(self, inode):
+        if self._conn is not None:
+            self._conn.close()
+        self._conn = sqlite3.connect(f"file:{self.db_path}?mode=ro", uri=True, check_same_thread=False)
+        self._inode = inode
+
+    def version(self) -> str:
+        """Opaque string that changes whenever the database content may have changed."""
+        try:
+            st = os.stat(self.db_path)
+        except FileNotFoundError:
+            return "missing"
+        with self._lock:
+            if self._conn is None or self._inode != st.st_ino:
+                self._connect(st.st_ino)
+            data_version = self._conn.execute("PRAGMA data_version").fetchone()[0]
+        return f"{st.st_ino}:{st.st_size}:{st.st_mtime_ns}:{data_version}"
+
+
+_schema_hash_cache = {}
+
+
+def schema_hash(kb_path: str = KB_PATH) -> str:
+    """SHA-256 of the knowledge base file, recomputed only when its size/mtime change."""
+    try:
+        st = os.stat(kb_path)
+    except FileNotFoundError:
+        return "missing"
+    stamp = (st.st_size, st.st_mtime_ns)
+    cached = _schema_hash_cache.get(kb_path)
+    if cached and cached[0] == stamp:
+        return cached[1]
+    with open(kb_path, 'rb') as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+    _schema_hash_cache[kb_path] = (stamp, digest)
+    return digest
+
+
+# Shared tracker for finance.db
+data_version_tracker = DataVersionTracker()
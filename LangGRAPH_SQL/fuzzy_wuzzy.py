@@ -1,50 +1,131 @@
-import pandas as pd
-from sqlalchemy import create_engine,  text
+from sqlalchemy import text
 from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.types import Integer, Float, String
-from rapidfuzz import process, fuzz
-import opik
+from rapidfuzz import process, fuzz, utils
+import numpy as np
+from LangGRAPH_SQL.tracing import track
 
 import os
+import logging
 
-# Use SQLite connection to finance.db
-db_path = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'finance.db'))
-engine = create_engine(f'sqlite:///{db_path}')
+from LangGRAPH_SQL.value_index import ValueIndex
+from LangGRAPH_SQL.db_engine import get_engine, DB_PATH
 
+logger = logging.getLogger(__name__)
 
-def get_best_fuzzy_match(input_value, choices):
-
-    match, score, _ = process.extractOne(input_value, choices, scorer=fuzz.token_set_ratio)
-    return match, score
+# Use SQLite connection to finance.db (shared read-only engine)
+db_path = DB_PATH
+engine = get_engine()
 
+# Distinct values per (table, column), loaded once and refreshed when finance.db changes
+value_index = ValueIndex(engine)
 
-def get_values(table_name, column_name):
+# "batch" scores all values of a filter in one rapidfuzz.cdist call; "loop" is the old per-value path
+FUZZY_MATCH_MODE = os.environ.get("FUZZY_MATCH_MODE", "batch")
+# Matches scoring below this are reported as rejected instead of becoming filters
+FUZZY_MIN_SCORE = float(os.environ.get("FUZZY_MIN_SCORE", 60))
+FUZZY_TOP_K = int(os.environ.get("FUZZY_TOP_K", 3))
+# cdist worker threads (-1 = all cores)
+FUZZY_WORKERS = int(os.environ.get("FUZZY_WORKERS", -1))
 
-    # SQL query to get distinct values
-    query = f"SELECT DISTINCT {column_name} FROM {table_name}"
 
-    # Execute query and load results into DataFrame
-    df = pd.read_sql(query, con=engine)
+def get_best_fuzzy_match(input_value, choices):
 
-    # Optionally, convert to list if you want raw values
-    unique_values = df[column_name].dropna().tolist()
+    match, score, _ = process.extractOne(input_value, choices, scorer=fuzz.token_set_ratio)
+    return match, score
 
-    return unique_values
 
+def get_values(table_name, column_name):
 
-@opik.track()
-def call_match(val):
+    # Distinct values come from the in-memory index instead of a query per call
+    return list(value_index.get(table_name, column_name).values)
+
+
+def score_loop(entry, values, top_k=FUZZY_TOP_K, min_score=FUZZY_MIN_SCORE):
+    """Per-value `process.extract` over an index entry. Returns [[(match, score), ...], ...]."""
+    results = []
+    for value in values:
+        matches = process.extract(
+            utils.default_process(value), entry.processed,
+            scorer=fuzz.token_set_ratio, limit=top_k, score_cutoff=min_score
+        )
+        results.append([(entry.values[idx], score) for _, score, idx in matches])
+    return results
+
+
+def score_batch(entry, values, top_k=FUZZY_TOP_K, min_score=FUZZY_MIN_SCORE, workers=FUZZY_WORKERS):
+    """Score all `values` against an index entry with a single `process.cdist` call."""
+    if not values or not entry.processed:
+        return [[] for _ in values]
+    scores = process.cdist(
+        [utils.default_process(v) for v in values], entry.processed,
+        scorer=fuzz.token_set_ratio, score_cutoff=min_score, workers=workers
+    )
+    k = min(top_k, scores.shape[1])
+    # Unordered top-k per row, then sort just those k
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    results = []
+    for row, candidates in zip(scores, top):
+        ordered = candidates[np.argsort(-row[candidates], kind='stable')]
+        results.append([(entry.values[i], float(row[i])) for i in ordered if row[i] >= min_score])
+    return results
+
+
+def batch_match(table, column, values, top_k=FUZZY_TOP_K, min_score=FUZZY_MIN_SCORE, mode=None):
+    """Top-k (match, score) candidates for each requested value of `table.column`."""
+    entry = value_index.get(table, column)
+    if (mode or FUZZY_MATCH_MODE) == "loop":
+        return score_loop(entry, values, top_k, min_score)
+    return score_batch(entry, values, top_k, min_score)
+
+
+@track()
+def match_filters(val):
+    """
+    Resolve filter_check output to real column values.
+
+    Returns (matched, rejected). `matched` keeps the format consumed by
+    query_generation_node; `rejected` lists requested values with no candidate
+    at or above FUZZY_MIN_SCORE, so they are reported instead of becoming filters.
+    """
     final = []
+    rejected = []
     for lst in val[1:]:
         table = lst[0]
         column = lst[1]
         str_lst = [i.strip() for i in lst[2].split(',')]
 
-        unq_col_val = get_values(table, column)
-        unq_col_val = [str(i) for i in unq_col_val]
+        for subval, candidates in zip(str_lst, batch_match(table, column, str_lst)):
+            if candidates:
+                best_match = candidates[0][0]
+                final.append(["table name:"+table, "column_name:"+column, "filter_value:"+best_match])
+            else:
+                logger.warning("No value in %s.%s scores >= %s for '%s'; dropping filter", table, column, FUZZY_MIN_SCORE, subval)
+                rejected.append(["table name:"+table, "column_name:"+column, "requested_value:"+subval])
+
+    return final, rejected
 
-        for subval in str_lst:
-            best_match, score = get_best_fuzzy_match(subval, unq_col_val)
-            final.append(["table name:"+table, "column_name:"+column, "filter_value:"+best_match])
 
-    return final
\ No newline at end of file
+def call_match(val):
+    return match_filters(val)[0]
+
+
+def prefetch_filter_values(col_details):
+    """
+    Load the distinct values of the TEXT columns among the selected ones (the
+    candidates fuzzy matching will need) while other work is in flight.
+    `col_details` rows look like ["name of table:<table>", "<column>", ...].
+    """
+    try:
+        schema = value_index.schema()
+        columns = []
+        for row in col_details:
+            if len(row) < 2:
+                continue
+            table, column = str(row[0]).split(':', 1)[-1].strip(), str(row[1]).strip()
+            col_type = schema.get(table, {}).get(column, '')
+            if 'CHAR' in col_type or 'TEXT' in col_type:
+                columns.append((table, column))
+        value_index.warm_up(columns)
+    except Exception as e:
+        logger.warning("Filter value prefetch failed: %s", e)
@@ -1,5 +1,4 @@
 import pandas as pd
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.runnables import RunnableMap
@@ -8,8 +7,13 @@ import tqdm
 import time
 import pickle
 import os
+import sys
 from dotenv import load_dotenv
 
+# Allow running as a script from the project root (python LangGRAPH_SQL/generate_kb.py)
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from LangGRAPH_SQL.llm_provider import get_chat_model
+
 load_dotenv()
 
 # Finance Database Schema Description
@@ -34,7 +38,7 @@ def read_sql(table):
     return df_sample
 
 
-model = ChatGoogleGenerativeAI(temperature=0.4, model='gemini-2.5-flash')
+model = get_chat_model(temperature=0.4, model='gemini-2.5-flash')
 
 template = ChatPromptTemplate.from_messages([
     ("system", """
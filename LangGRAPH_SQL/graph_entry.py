@@ -1,45 +1,46 @@
 from langgraph.graph import StateGraph, START, END
-from LangGRAPH_SQL.rate_limiter_utils import rate_limiter
+from langchain_core.runnables import RunnableLambda
+from LangGRAPH_SQL.rate_limiter_utils import rate_limiter, estimate_tokens
 from typing import Dict, Any, TypedDict, Annotated, List, Optional
 from operator import add
-import pickle
 import os
 import re
+import uuid
 import logging
 import ast # Added for safe parsing
 import time
-import pandas as pd
-from sqlalchemy import create_engine, text
-from datetime import datetime
+import asyncio
+import contextvars
+from sqlalchemy import text
 from dotenv import load_dotenv
-import opik
-from opik.integrations.langchain import OpikTracer
-opik_tracer = OpikTracer()
+from LangGRAPH_SQL.log_config import configure_logging, log_context, LOG_FILE
+from LangGRAPH_SQL.tracing import track, tracer_callbacks
 
 load_dotenv()
 
-# Configure Logging
-LOG_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "logs")
-os.makedirs(LOG_DIR, exist_ok=True)
-LOG_FILE = os.path.join(LOG_DIR, f"sql_pipeline_{datetime.now().strftime('%Y-%m-%d_%H-%M-%S')}.log")
-
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s [%(levelname)s] %(message)s',
-    datefmt='%Y-%m-%d %H:%M:%S',
-    handlers=[
-        logging.FileHandler(LOG_FILE, encoding='utf-8'),
-        logging.StreamHandler()  # Also print to console
-    ]
-)
+# Configure Logging: JSON lines through a background writer (see log_config)
+configure_logging()
 logger = logging.getLogger(__name__)
 
 
 # Import components from existing scripts
-from LangGRAPH_SQL.router_agent import agent_2
+from LangGRAPH_SQL.router_agent import agent_2, aagent_2
 from LangGRAPH_SQL.customer_agent import graph_final
 from LangGRAPH_SQL.customer_helper import chain_filter_extractor, chain_query_extractor, chain_query_validator
-from LangGRAPH_SQL.fuzzy_wuzzy import call_match
+from LangGRAPH_SQL.fuzzy_wuzzy import match_filters, prefetch_filter_values
+from LangGRAPH_SQL.answer_cache import answer_cache, ANSWER_CACHE_ENABLED
+from LangGRAPH_SQL.kb_service import kb_service
+from LangGRAPH_SQL.schema_retriever import get_retriever
+from LangGRAPH_SQL.sql_validator import sql_validator, extract_sql, STATIC_SQL_VALIDATION
+from LangGRAPH_SQL.result_stream import fetch_page, format_markdown, keyset_column, RESULT_PAGE_SIZE
+from LangGRAPH_SQL.async_utils import run_blocking, get_executor
+from LangGRAPH_SQL.checkpoint_store import get_checkpointer
+from LangGRAPH_SQL.db_engine import get_engine, DB_PATH
+from LangGRAPH_SQL.query_guard import QueryTimeoutError
+from LangGRAPH_SQL.index_advisor import index_advisor
+from LangGRAPH_SQL.intent_library import intent_library, IntentMatch
+from LangGRAPH_SQL.metrics import (timed_node, PIPELINE_LATENCY, RUNS_IN_FLIGHT, SQL_LATENCY, SQL_ROWS,
+                                   SPECULATIVE_GENERATIONS, SPECULATIVE_SAVED, INTENT_MATCHES)
 
 # Configuration and Initialization
 # Simplified for Finance DB
@@ -47,31 +48,23 @@ d_store = {
     "finance": ['transactions', 'budgets', 'recurring_subscriptions']
 }
 
+# Opt-in: generate the SQL for the no-filter case while filter_check runs (and
+# prefetch the fuzzy-match values). The SQL is used as is when no filters are
+# needed and thrown away otherwise; the extra call still goes through the rate limiter.
+SPECULATIVE_GENERATION = os.environ.get("SPECULATIVE_GENERATION", "0") not in ("0", "false", "False")
+
+# Answer the common question shapes from the intent library's SQL templates,
+# without any LLM call; anything it is not confident about takes the LLM path.
+INTENT_MATCHING = os.environ.get("INTENT_MATCHING", "1") not in ("0", "false", "False")
+
 # Get current directory to load relative files
 CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
 
-# Load Knowledge Base with defensive checking
-kb_path = os.path.join(CURRENT_DIR, 'kb.pkl')
-if not os.path.exists(kb_path):
-    raise FileNotFoundError(
-        f"CRITICAL: Knowledge Base file not found at '{kb_path}'.\n"
-        f"Please ensure 'kb.pkl' exists in the LangGRAPH_SQL directory.\n"
-        f"This file contains the database schema metadata required for SQL generation."
-    )
-
-try:
-    with open(kb_path, 'rb') as f:
-        loaded_dict = pickle.load(f)
-    logger.info(f"Successfully loaded knowledge base from {kb_path}")
-except Exception as e:
-    raise RuntimeError(
-        f"CRITICAL: Failed to load knowledge base from '{kb_path}'.\n"
-        f"Error: {str(e)}\n"
-        f"The file may be corrupted. Try regenerating kb.pkl."
-    )
+# Load Knowledge Base with defensive checking (fails fast if kb.pkl is missing or corrupt)
+loaded_dict = kb_service.get()
 
 # SQLite Engine for Finance DB with defensive checking
-db_path = os.path.join(os.path.dirname(CURRENT_DIR), 'finance.db')
+db_path = DB_PATH
 if not os.path.exists(db_path):
     raise FileNotFoundError(
         f"CRITICAL: Database file not found at '{db_path}'.\n"
@@ -80,11 +73,12 @@ if not os.path.exists(db_path):
     )
 
 try:
-    engine = create_engine(f'sqlite:///{db_path}')
+    # Shared read-only engine (mode=ro, query_only, mmap/cache pragmas, pooled)
+    engine = get_engine()
     # Test the connection
     with engine.connect() as conn:
         conn.execute(text("SELECT 1"))
-    logger.info(f"Successfully connected to database at {db_path}")
+    logger.info("Successfully connected to database at %s", db_path)
 except Exception as e:
     raise RuntimeError(
         f"CRITICAL: Failed to connect to database at '{db_path}'.\n"
@@ -102,8 +96,15 @@ class FinalState(TypedDict):
     filtered_col: str
     filter_extractor: List[Any]
     fuzz_match: List[Any]
+    fuzz_rejected: List[Any]
     sql_query: str
+    validation_issues: Optional[List[str]]
     final_query: str
+    result_sql: Optional[str]
+    next_page_token: Optional[str]
+    execution_error: Optional[Dict[str, Any]]
+    speculative_sql: Optional[str]
+    intent: Optional[Dict[str, Any]]
 
 def remove_duplicates(f: Dict[str, Any]) -> List[Any]:
     s = set()
@@ -119,38 +120,116 @@ def remove_duplicates(f: Dict[str, Any]) -> List[Any]:
     return final
 
 # --- Nodes ---
+#
+# Every node has a sync version (used by `invoke`) and an async version (used by
+# `ainvoke`/`astream` in the server). The async versions await the chains'
+# `ainvoke` and the async rate limiter, and move the remaining blocking work
+# (SQLite, fuzzy matching) to the bounded executor in async_utils.
+
+def _parse_router_output(o):
+    # clean the output if it has markdown code blocks
+    cleaned_o = o.replace('```json', '').replace('```', '').strip()
+    try:
+        parsed_o = ast.literal_eval(cleaned_o)
+    except Exception as e:
+        logger.error("Failed to parse router output: %s. Error: %s", o, e, exc_info=True)
+        parsed_o = [] # Fallback to empty list or default
+    return {"router_out": parsed_o}
 
-@opik.track()
+@track()
+@timed_node("router")
 def router_node(state: FinalState):
     start_time = time.time()
     q = state['user_query']
-    logger.info(f"Router Node: Starting execution")
-    logger.info(f"User Query: '{q}'")
-    
+    logger.debug("Router Node: Starting execution")
+    logger.info("User Query: '%s'", q)
+
     try:
-        rate_limiter.check_and_wait()
+        rate_limiter.acquire(estimate_tokens(q))
         o = agent_2(q)
-        # clean the output if it has markdown code blocks
-        cleaned_o = o.replace('```json', '').replace('```', '').strip()
-        try:
-            parsed_o = ast.literal_eval(cleaned_o)
-        except Exception as e:
-            logger.error(f"Failed to parse router output: {o}. Error: {e}", exc_info=True)
-            parsed_o = [] # Fallback to empty list or default
-            
-        res = {"router_out": parsed_o}
-        logger.info(f"Router Node: Routed to {res['router_out']}")
-        logger.info(f"[SUCCESS] Router Node: Completed in {time.time() - start_time:.2f}s")
+        res = _parse_router_output(o)
+        logger.info("Router Node: Routed to %s", res['router_out'])
+        logger.info("[SUCCESS] Router Node: Completed in %.2fs", time.time() - start_time)
         return res
     except Exception as e:
-        logger.error(f"[ERROR] Router Node failed: {str(e)}", exc_info=True)
+        logger.error("[ERROR] Router Node failed: %s", e, exc_info=True)
         raise
 
+@track()
+@timed_node("router")
+async def arouter_node(state: FinalState):
+    start_time = time.time()
+    q = state['user_query']
+    logger.debug("Router Node: Starting execution")
+    logger.info("User Query: '%s'", q)
+
+    try:
+        await rate_limiter.aacquire(estimate_tokens(q))
+        o = await aagent_2(q)
+        res = _parse_router_output(o)
+        logger.info("Router Node: Routed to %s", res['router_out'])
+        logger.info("[SUCCESS] Router Node: Completed in %.2fs", time.time() - start_time)
+        return res
+    except Exception as e:
+        logger.error("[ERROR] Router Node failed: %s", e, exc_info=True)
+        raise
+
+def _intent_result(match: IntentMatch, start_time):
+    INTENT_MATCHES.labels(match.intent or "none", match.outcome).inc()
+    if not match.matched:
+        logger.info("Intent Node: No template match (%s, best %s at %.2f), using the LLM pipeline",
+                    match.outcome, match.intent, match.confidence)
+        return {"intent": match.to_dict()}
+    logger.info("Intent Node: Matched '%s' (confidence %.2f, slots %s)", match.intent, match.confidence, match.slots)
+    logger.info("[SUCCESS] Intent Node: Completed in %.3fs", time.time() - start_time)
+    return {"intent": match.to_dict(), "final_query": match.sql}
+
+def _intent_error(e):
+    # The templates are a shortcut; a failure here must not fail the run
+    INTENT_MATCHES.labels("none", "error").inc()
+    logger.error("[ERROR] Intent Node failed, using the LLM pipeline: %s", e, exc_info=True)
+    return {"intent": None}
+
+@track()
+@timed_node("intent")
+def intent_node(state: FinalState):
+    start_time = time.time()
+    if not INTENT_MATCHING:
+        return {"intent": None}
+    try:
+        return _intent_result(intent_library.classify(state['user_query']), start_time)
+    except Exception as e:
+        return _intent_error(e)
+
+@track()
+@timed_node("intent")
+async def aintent_node(state: FinalState):
+    start_time = time.time()
+    if not INTENT_MATCHING:
+        return {"intent": None}
+    try:
+        # Slot values come from the value index, which may have to load them from SQLite
+        return _intent_result(await run_blocking(intent_library.classify, state['user_query']), start_time)
+    except Exception as e:
+        return _intent_error(e)
+
+def intent_condition(state: FinalState):
+    intent = state.get('intent')
+    if intent and intent.get('outcome') == "matched":
+        return "matched"
+    return "llm"
+
 def route_request(state: FinalState):
     routes = state['router_out']
-    logger.info(f"Routing to agents: {routes}")
+    logger.info("Routing to agents: %s", routes)
     return routes
 
+def validation_condition(state: FinalState):
+    # An empty issue list means the static validator accepted the query
+    if state.get('validation_issues') == []:
+        return "fast"
+    return "llm"
+
 def filter_condition(state: FinalState):
     if len(state.get('filter_extractor', [])) <= 1: # Adjusting logic based on observed behavior
         # Note: router output check logic might vary based on how 'yes/no' is returned
@@ -159,210 +238,429 @@ def filter_condition(state: FinalState):
     else:
         return "yes"
 
-@opik.track()
+@track()
+@timed_node("finance")
 def finance_node(state: FinalState):
     start_time = time.time()
     q = state['user_query']
-    logger.info("Finance Node: Starting table/column extraction")
-    
+    logger.debug("Finance Node: Starting table/column extraction")
+
     try:
         sub = graph_final.invoke({"user_query": q, "table_lst": d_store['finance']})
         res = {"order_out": sub}
-        logger.info(f"Finance Node: Extracted {len(sub.get('column_extract', []))} columns")
-        logger.info(f"[SUCCESS] Finance Node: Completed in {time.time() - start_time:.2f}s")
+        logger.info("Finance Node: Extracted %s columns", len(sub.get('column_extract', [])))
+        logger.info("[SUCCESS] Finance Node: Completed in %.2fs", time.time() - start_time)
         return res
     except Exception as e:
-        logger.error(f"[ERROR] Finance Node failed: {str(e)}", exc_info=True)
+        logger.error("[ERROR] Finance Node failed: %s", e, exc_info=True)
         raise
 
-@opik.track()
+@track()
+@timed_node("finance")
+async def afinance_node(state: FinalState):
+    start_time = time.time()
+    q = state['user_query']
+    logger.debug("Finance Node: Starting table/column extraction")
+
+    try:
+        sub = await graph_final.ainvoke({"user_query": q, "table_lst": d_store['finance']})
+        res = {"order_out": sub}
+        logger.info("Finance Node: Extracted %s columns", len(sub.get('column_extract', [])))
+        logger.info("[SUCCESS] Finance Node: Completed in %.2fs", time.time() - start_time)
+        return res
+    except Exception as e:
+        logger.error("[ERROR] Finance Node failed: %s", e, exc_info=True)
+        raise
+
+def _filter_columns(state: FinalState):
+    f = {}
+    for key in ['order_out', 'cust_out', 'product_out']:
+        if key in state and state[key]:
+            f[key] = state[key]
+    return remove_duplicates(f)
+
+def _parse_filter_response(response, col_details):
+    # clean the output if it has markdown code blocks
+    cleaned_response = response.replace('```json', '').replace('```', '').strip()
+
+    try:
+        parsed_response = ast.literal_eval(cleaned_response)
+    except:
+        parsed_response = ["no"]
+        logger.warning("Filter Check Node: Failed to parse response: %s, using default 'no'", response, exc_info=True)
+
+    return {'filter_extractor': parsed_response, 'filtered_col': str(col_details)}
+
+def _speculative_inputs(state: FinalState, col_details):
+    # Exactly what query_generator sends when filter_condition says "no"
+    return _generation_inputs({**state, 'filtered_col': str(col_details), 'fuzz_match': None})
+
+def _speculative_generation(inputs):
+    start = time.perf_counter()
+    final_query = chain_query_extractor.invoke(inputs, config={"callbacks": tracer_callbacks()})
+    return final_query, time.perf_counter() - start
+
+async def _aspeculative_generation(inputs):
+    start = time.perf_counter()
+    final_query = await chain_query_extractor.ainvoke(inputs, config={"callbacks": tracer_callbacks()})
+    return final_query, time.perf_counter() - start
+
+def _use_speculation(res, outcome, filter_elapsed):
+    """Attach a finished speculative generation to the filter_check result if filters are not needed."""
+    try:
+        final_query, generation_elapsed = outcome()
+    except Exception as e:
+        SPECULATIVE_GENERATIONS.labels("failed").inc()
+        logger.warning("Filter Check Node: Speculative SQL generation failed, query_generator will retry: %s", e)
+        return res
+    SPECULATIVE_GENERATIONS.labels("used").inc()
+    # Run one after the other the two calls take filter + generation; overlapped, the longer of the two
+    saved = min(filter_elapsed, generation_elapsed)
+    SPECULATIVE_SAVED.observe(saved)
+    logger.info("Filter Check Node: No filters needed, using speculative SQL (saved %.2fs)", saved)
+    return {**res, 'speculative_sql': final_query}
+
+@track()
+@timed_node("filter_check")
 def filter_check_node(state: FinalState):
     start_time = time.time()
     q = state['user_query']
-    logger.info("Filter Check Node: Starting filter analysis")
-    
+    logger.debug("Filter Check Node: Starting filter analysis")
+
     try:
-        f = {}
-        for key in ['order_out', 'cust_out', 'product_out']:
-            if key in state and state[key]:
-                f[key] = state[key]
-                
-        col_details = remove_duplicates(f)
-        logger.info(f"Filter Check Node: Analyzing {len(col_details)} columns")
-        rate_limiter.check_and_wait()
+        col_details = _filter_columns(state)
+        logger.debug("Filter Check Node: Analyzing %s columns", len(col_details))
+        speculation = None
+        if SPECULATIVE_GENERATION:
+            executor = get_executor()
+            speculation = executor.submit(contextvars.copy_context().run, _speculative_generation,
+                                          _speculative_inputs(state, col_details))
+            executor.submit(contextvars.copy_context().run, prefetch_filter_values, col_details)
+        filter_start = time.perf_counter()
         response = chain_filter_extractor.invoke(
             {"columns": str(col_details), "query": q},
-            config={"callbacks": [opik_tracer]}
+            config={"callbacks": tracer_callbacks()}
         )
-        # clean the output if it has markdown code blocks
-        cleaned_response = response.replace('```json', '').replace('```', '').strip()
-        
-        try:
-            parsed_response = ast.literal_eval(cleaned_response)
-        except:
-            parsed_response = ["no"]
-            logger.warning(f"Filter Check Node: Failed to parse response: {response}, using default 'no'", exc_info=True)
-            
-        res = {'filter_extractor': parsed_response, 'filtered_col': str(col_details)}
-        logger.info(f"Filter Check Node: Filter needed = {len(parsed_response) > 1}")
-        logger.info(f"[SUCCESS] Filter Check Node: Completed in {time.time() - start_time:.2f}s")
+        filter_elapsed = time.perf_counter() - filter_start
+        res = _parse_filter_response(response, col_details)
+        if speculation is not None:
+            if filter_condition(res) == "no":
+                res = _use_speculation(res, speculation.result, filter_elapsed)
+            else:
+                # A running call cannot be stopped; its result is simply never read
+                speculation.cancel()
+                SPECULATIVE_GENERATIONS.labels("wasted").inc()
+        logger.info("Filter Check Node: Filter needed = %s", len(res['filter_extractor']) > 1)
+        logger.info("[SUCCESS] Filter Check Node: Completed in %.2fs", time.time() - start_time)
         return res
     except Exception as e:
-        logger.error(f"[ERROR] Filter Check Node failed: {str(e)}", exc_info=True)
+        logger.error("[ERROR] Filter Check Node failed: %s", e, exc_info=True)
         raise
 
-@opik.track()
+# Fire-and-forget prefetches; referenced here so they are not garbage collected mid-flight
+_background_tasks = set()
+
+@track()
+@timed_node("filter_check")
+async def afilter_check_node(state: FinalState):
+    start_time = time.time()
+    q = state['user_query']
+    logger.debug("Filter Check Node: Starting filter analysis")
+
+    speculation = None
+    try:
+        col_details = _filter_columns(state)
+        logger.debug("Filter Check Node: Analyzing %s columns", len(col_details))
+        if SPECULATIVE_GENERATION:
+            speculation = asyncio.ensure_future(_aspeculative_generation(_speculative_inputs(state, col_details)))
+            prefetch = asyncio.ensure_future(run_blocking(prefetch_filter_values, col_details))
+            _background_tasks.add(prefetch)
+            prefetch.add_done_callback(_background_tasks.discard)
+        filter_start = time.perf_counter()
+        response = await chain_filter_extractor.ainvoke(
+            {"columns": str(col_details), "query": q},
+            config={"callbacks": tracer_callbacks()}
+        )
+        filter_elapsed = time.perf_counter() - filter_start
+        res = _parse_filter_response(response, col_details)
+        if speculation is not None:
+            if filter_condition(res) == "no":
+                await asyncio.wait([speculation])
+                res = _use_speculation(res, speculation.result, filter_elapsed)
+            else:
+                speculation.cancel()
+                SPECULATIVE_GENERATIONS.labels("wasted").inc()
+        logger.info("Filter Check Node: Filter needed = %s", len(res['filter_extractor']) > 1)
+        logger.info("[SUCCESS] Filter Check Node: Completed in %.2fs", time.time() - start_time)
+        return res
+    except Exception as e:
+        logger.error("[ERROR] Filter Check Node failed: %s", e, exc_info=True)
+        raise
+    finally:
+        # Failed or cancelled (client gone) before the speculation was settled
+        if speculation is not None and not speculation.done():
+            speculation.cancel()
+
+def _fuzz_result(lst, rejected, start_time):
+    logger.info("Fuzz Match Node: Matched %s filter values", len(lst))
+    if rejected:
+        logger.warning("Fuzz Match Node: %s filter values had no close match: %s", len(rejected), rejected)
+    logger.info("[SUCCESS] Fuzz Match Node: Completed in %.2fs", time.time() - start_time)
+    return {"fuzz_match": lst, "fuzz_rejected": rejected}
+
+@track()
+@timed_node("fuzz_filter")
 def fuzz_match_node(state: FinalState):
     start_time = time.time()
     val = state['filter_extractor']
-    logger.info("Fuzz Match Node: Starting fuzzy matching for filters")
-    
+    logger.debug("Fuzz Match Node: Starting fuzzy matching for filters")
+
+    try:
+        lst, rejected = match_filters(val)
+        return _fuzz_result(lst, rejected, start_time)
+    except Exception as e:
+        logger.error("[ERROR] Fuzz Match Node failed: %s", e, exc_info=True)
+        raise
+
+@track()
+@timed_node("fuzz_filter")
+async def afuzz_match_node(state: FinalState):
+    start_time = time.time()
+    val = state['filter_extractor']
+    logger.debug("Fuzz Match Node: Starting fuzzy matching for filters")
+
     try:
-        lst = call_match(val)
-        logger.info(f"Fuzz Match Node: Matched {len(lst)} filter values")
-        logger.info(f"[SUCCESS] Fuzz Match Node: Completed in {time.time() - start_time:.2f}s")
-        return {"fuzz_match": lst}
+        # Value lookups hit SQLite and scoring is CPU-bound: keep both off the loop
+        lst, rejected = await run_blocking(match_filters, val)
+        return _fuzz_result(lst, rejected, start_time)
     except Exception as e:
-        logger.error(f"[ERROR] Fuzz Match Node failed: {str(e)}", exc_info=True)
+        logger.error("[ERROR] Fuzz Match Node failed: %s", e, exc_info=True)
         raise
 
-@opik.track()
+def _generation_inputs(state: FinalState):
+    # A new run on a reused thread resets fuzz_match to None; prompt it as if unset
+    filters = state.get('fuzz_match')
+    return {"columns": state['filtered_col'], "query": state['user_query'], "filters": '' if filters is None else filters}
+
+def _speculative_sql(state: FinalState):
+    # Generated by filter_check from the same inputs; only valid without filters
+    if state.get('speculative_sql') is not None and not state.get('fuzz_match'):
+        logger.debug("Query Generation Node: Using the speculative SQL from filter_check")
+        return state['speculative_sql']
+    return None
+
+def _static_validation(final_query, fuzz_match):
+    res = {"sql_query": final_query, "validation_issues": None}
+
+    # Deterministic local checks; a clean query skips the LLM validator
+    if STATIC_SQL_VALIDATION:
+        check = sql_validator.validate(final_query, fuzz_match)
+        res["validation_issues"] = check.issues
+        if check.ok:
+            res["final_query"] = check.sql
+            logger.info("Query Generation Node: Static validation passed, skipping LLM validator "
+                        "(fast path rate %.0f%%, %s)", sql_validator.fast_path_rate() * 100, sql_validator.stats)
+        else:
+            logger.info("Query Generation Node: Static validation failed, using LLM validator: %s", check.issues)
+    return res
+
+@track()
+@timed_node("query_generator")
 def query_generation_node(state: FinalState):
     start_time = time.time()
-    q = state['user_query']
-    tab_cols = state['filtered_col']
-    filters = state.get('fuzz_match', '')
-    logger.info("Query Generation Node: Generating SQL query")
-    
+    logger.debug("Query Generation Node: Generating SQL query")
+
     try:
-        rate_limiter.check_and_wait()
-        final_query = chain_query_extractor.invoke(
-            {"columns": tab_cols, "query": q, "filters": filters},
-            config={"callbacks": [opik_tracer]}
-        )
-        logger.info(f"Query Generation Node: Generated query (first 100 chars): {final_query[:100]}...")
-        logger.info(f"[SUCCESS] Query Generation Node: Completed in {time.time() - start_time:.2f}s")
-        return {"sql_query": final_query}
+        final_query = _speculative_sql(state)
+        if final_query is None:
+            final_query = chain_query_extractor.invoke(
+                _generation_inputs(state),
+                config={"callbacks": tracer_callbacks()}
+            )
+        logger.debug("Query Generation Node: Generated query (first 100 chars): %.100s...", final_query)
+        res = _static_validation(final_query, state.get('fuzz_match'))
+        logger.info("[SUCCESS] Query Generation Node: Completed in %.2fs", time.time() - start_time)
+        return res
+    except Exception as e:
+        logger.error("[ERROR] Query Generation Node failed: %s", e, exc_info=True)
+        raise
+
+@track()
+@timed_node("query_generator")
+async def aquery_generation_node(state: FinalState):
+    start_time = time.time()
+    logger.debug("Query Generation Node: Generating SQL query")
+
+    try:
+        final_query = _speculative_sql(state)
+        if final_query is None:
+            final_query = await chain_query_extractor.ainvoke(
+                _generation_inputs(state),
+                config={"callbacks": tracer_callbacks()}
+            )
+        logger.debug("Query Generation Node: Generated query (first 100 chars): %.100s...", final_query)
+        # The static validator compiles the query on a SQLite connection
+        res = await run_blocking(_static_validation, final_query, state.get('fuzz_match'))
+        logger.info("[SUCCESS] Query Generation Node: Completed in %.2fs", time.time() - start_time)
+        return res
     except Exception as e:
-        logger.error(f"[ERROR] Query Generation Node failed: {str(e)}", exc_info=True)
+        logger.error("[ERROR] Query Generation Node failed: %s", e, exc_info=True)
         raise
 
-@opik.track()
+def _validation_inputs(state: FinalState):
+    # Schema for the hallucination check: full KB, or the relevant slice once it
+    # outgrows SCHEMA_TOKEN_BUDGET (tables referenced by the SQL are always kept)
+    all_table_info = get_retriever().schema_slice(state['user_query'], state['sql_query'])
+    return {
+        "columns": state['filtered_col'],
+        "user_query": state['user_query'],
+        "filters": state.get('fuzz_match'),
+        "sql_query": state['sql_query'],
+        "all_table_info": all_table_info
+    }
+
+def _clean_validated_query(o):
+    # PERMANENT FIX: Extract SQL code block if present
+    def clean_sql_output(text):
+        # Regex to find content inside ```sql ... ``` (case insensitive)
+        match = re.search(r"```sql\s*(.*?)\s*```", text, re.DOTALL | re.IGNORECASE)
+        if match:
+            return match.group(1).strip()
+        # Fallback: check for just ``` ... ```
+        match_generic = re.search(r"```\s*(.*?)\s*```", text, re.DOTALL)
+        if match_generic:
+            return match_generic.group(1).strip()
+        return text.strip()
+
+    cleaned_query = clean_sql_output(o)
+
+    if cleaned_query != o.strip():
+         logger.warning("Query Validation Node: Cleaned markdown formatting from SQL output.")
+    return cleaned_query
+
+@track()
+@timed_node("query_validation")
 def query_validation_node(state: FinalState):
     start_time = time.time()
-    logger.info("Query Validation Node: Validating SQL query")
-    
+    logger.debug("Query Validation Node: Validating SQL query")
+
     try:
-        # Load KB for validation context
-        import pickle
-        import os
-        # kb.pkl is generated in LangGRAPH_SQL folder
-        kb_path = os.path.join('LangGRAPH_SQL', 'kb.pkl')
-        with open(kb_path, 'rb') as f:
-            kb = pickle.load(f)
-
-        rate_limiter.check_and_wait()
-        o = chain_query_validator.invoke({
-            "columns": state['filtered_col'], 
-            "user_query": state['user_query'], 
-            "filters": state.get('fuzz_match'), 
-            "sql_query": state['sql_query'],
-            "all_table_info": str(kb) # Pass full schema
-        }, config={"callbacks": [opik_tracer]})
-        
-        # PERMANENT FIX: Extract SQL code block if present
-        import re
-        def clean_sql_output(text):
-            # Regex to find content inside ```sql ... ``` (case insensitive)
-            match = re.search(r"```sql\s*(.*?)\s*```", text, re.DOTALL | re.IGNORECASE)
-            if match:
-                return match.group(1).strip()
-            # Fallback: check for just ``` ... ```
-            match_generic = re.search(r"```\s*(.*?)\s*```", text, re.DOTALL)
-            if match_generic:
-                return match_generic.group(1).strip()
-            return text.strip()
-
-        cleaned_query = clean_sql_output(o)
-        
-        if cleaned_query != o.strip():
-             logger.warning("Query Validation Node: Cleaned markdown formatting from SQL output.")
+        o = chain_query_validator.invoke(_validation_inputs(state), config={"callbacks": tracer_callbacks()})
+        cleaned_query = _clean_validated_query(o)
 
-        logger.info(f"Query Validation Node: Query validated successfully")
-        logger.info(f"[SUCCESS] Query Validation Node: Completed in {time.time() - start_time:.2f}s")
+        logger.info("Query Validation Node: Query validated successfully")
+        logger.info("[SUCCESS] Query Validation Node: Completed in %.2fs", time.time() - start_time)
         return {'final_query': cleaned_query}
     except Exception as e:
-        logger.error(f"[ERROR] Query Validation Node failed: {str(e)}", exc_info=True)
+        logger.error("[ERROR] Query Validation Node failed: %s", e, exc_info=True)
         raise
 
-@opik.track()
-def safe_executor_node(state: FinalState):
-    """
-    Executes the validated SQL query safely.
-    """
+@track()
+@timed_node("query_validation")
+async def aquery_validation_node(state: FinalState):
     start_time = time.time()
-    query = state['final_query']
-    logger.info("Safe Executor Node: Starting SQL execution")
-    
-    import re
-    # Aggressive cleaning of the SQL query
-    # 1. Extract block from ```sql ... ``` or ```mysql ... ```
-    sql_match = re.search(r'```(?:sql|mysql)?\n(.*?)\n```', query, re.DOTALL | re.IGNORECASE)
-    if sql_match:
-        sql_to_run = sql_match.group(1)
-    else:
-        sql_to_run = query
+    logger.debug("Query Validation Node: Validating SQL query")
 
-    # 2. Strip "mysql" word if it appears at the start (common 2.5 flash quirk)
-    sql_to_run = re.sub(r'(?i)^\s*mysql\s*', '', sql_to_run)
-    
-    # 3. If there is still conversational text, try to find the first WITH/SELECT
-    # This is a fallback if the regex above failed or if there were no code blocks
-    match_start = re.search(r'(?i)\b(WITH|SELECT)\b', sql_to_run)
-    if match_start:
-         sql_to_run = sql_to_run[match_start.start():]
-
-    # 4. Final Cleanup
-    sql_to_run = sql_to_run.replace('```', '').strip()
-    
-    logger.info(f"Executing SQL: {sql_to_run[:200]}...")
+    try:
+        o = await chain_query_validator.ainvoke(_validation_inputs(state), config={"callbacks": tracer_callbacks()})
+        cleaned_query = _clean_validated_query(o)
 
+        logger.info("Query Validation Node: Query validated successfully")
+        logger.info("[SUCCESS] Query Validation Node: Completed in %.2fs", time.time() - start_time)
+        return {'final_query': cleaned_query}
+    except Exception as e:
+        logger.error("[ERROR] Query Validation Node failed: %s", e, exc_info=True)
+        raise
+
+def _execute_query(query: str):
+    start_time = time.time()
+    logger.debug("Safe Executor Node: Starting SQL execution")
+
+    # Aggressive cleaning of the SQL query (code fences, 'mysql' prefix, chatter)
+    sql_to_run = extract_sql(query)
+
+    logger.debug("Executing SQL: %.200s...", sql_to_run)
+    sql_start = time.perf_counter()
     try:
-        with engine.connect() as connection:
-            # Execute and fetch limit (e.g., 50 rows)
-            result = connection.execute(text(sql_to_run))
-            columns = result.keys()
-            rows = result.fetchmany(50)
-            
-            if not rows:
-                logger.warning("Safe Executor Node: Query executed but returned no results")
-                return {"sql_query": "No results found for this query."}
-            
-            # Format as Markdown Table
-            md_table = f"| {' | '.join(columns)} |\n"
-            md_table += f"| {' | '.join(['---'] * len(columns))} |\n"
-            for row in rows:
-                md_table += f"| {' | '.join(map(str, row))} |\n"
-            
-            logger.info(f"Safe Executor Node: Successfully retrieved {len(rows)} rows")
-            logger.info(f"[SUCCESS] Safe Executor Node: Completed in {time.time() - start_time:.2f}s")
-            return {"sql_query": md_table}
+        # Only the first page goes into the graph state; the rest is reachable
+        # through next_page_token (see result_stream / POST /results/stream)
+        try:
+            key_column = keyset_column(engine, sql_to_run)
+        except Exception as e:
+            logger.warning("Could not detect a keyset column, paging by offset: %s", e)
+            key_column = None
+        page = fetch_page(engine, sql_to_run, page_size=RESULT_PAGE_SIZE, key_column=key_column)
+        SQL_LATENCY.labels("ok").observe(time.perf_counter() - sql_start)
+        SQL_ROWS.observe(len(page.rows))
+
+        if not page.rows:
+            logger.warning("Safe Executor Node: Query executed but returned no results")
+            return {"sql_query": "No results found for this query.", "result_sql": sql_to_run, "next_page_token": None}
+
+        # Format as Markdown Table
+        md_table = format_markdown(page.columns, page.rows)
+        if page.next_token:
+            md_table += f"\n_Showing the first {len(page.rows)} rows; more rows are available._\n"
+
+        logger.info("Safe Executor Node: Successfully retrieved %s rows (more available: %s)", len(page.rows), page.next_token is not None)
+        logger.info("[SUCCESS] Safe Executor Node: Completed in %.2fs", time.time() - start_time)
+        return {"sql_query": md_table, "result_sql": sql_to_run, "next_page_token": page.next_token}
+    except QueryTimeoutError as e:
+        SQL_LATENCY.labels("timeout").observe(time.perf_counter() - sql_start)
+        # Runaway query (cross join, correlated subquery...) or a known repeat offender
+        logger.error("[ERROR] Safe Executor Node: %s (fingerprint %s, %.2fs)", e, e.fingerprint, time.time() - start_time)
+        return {"sql_query": f"Error during execution: {e}", "next_page_token": None,
+                "execution_error": e.to_dict()}
     except Exception as e:
-        logger.error(f"[ERROR] Safe Executor Node failed during SQL execution: {str(e)}", exc_info=True)
-        return {"sql_query": f"Error during execution: {str(e)}"}
+        SQL_LATENCY.labels("error").observe(time.perf_counter() - sql_start)
+        logger.error("[ERROR] Safe Executor Node failed during SQL execution: %s", e, exc_info=True)
+        return {"sql_query": f"Error during execution: {str(e)}", "next_page_token": None}
+    finally:
+        # EXPLAIN QUERY PLAN once per query shape for the index advisor, on its own thread
+        try:
+            index_advisor.submit(sql_to_run)
+        except Exception as e:
+            logger.warning("Index advisor could not queue query: %s", e)
+
+@track()
+@timed_node("safe_executor")
+def safe_executor_node(state: FinalState):
+    """
+    Executes the validated SQL query safely.
+    """
+    return _execute_query(state['final_query'])
+
+@track()
+@timed_node("safe_executor")
+async def asafe_executor_node(state: FinalState):
+    """
+    Async variant of `safe_executor_node`; the SQLite work runs on the blocking executor.
+    """
+    return await run_blocking(_execute_query, state['final_query'])
 
 # --- Graph Construction ---
 
 builder_final = StateGraph(FinalState)
 
-builder_final.add_node("finance", finance_node)
-builder_final.add_node("filter_check", filter_check_node)
-builder_final.add_node("fuzz_filter", fuzz_match_node)
-builder_final.add_node("query_generator", query_generation_node)
-builder_final.add_node("query_validation", query_validation_node)
-builder_final.add_node("safe_executor", safe_executor_node)
-
-builder_final.add_edge(START, "finance") # Bypassing router for now as it's a specialized finance bot
+builder_final.add_node("intent", RunnableLambda(intent_node, afunc=aintent_node, name="intent"))
+builder_final.add_node("finance", RunnableLambda(finance_node, afunc=afinance_node, name="finance"))
+builder_final.add_node("filter_check", RunnableLambda(filter_check_node, afunc=afilter_check_node, name="filter_check"))
+builder_final.add_node("fuzz_filter", RunnableLambda(fuzz_match_node, afunc=afuzz_match_node, name="fuzz_filter"))
+builder_final.add_node("query_generator", RunnableLambda(query_generation_node, afunc=aquery_generation_node, name="query_generator"))
+builder_final.add_node("query_validation", RunnableLambda(query_validation_node, afunc=aquery_validation_node, name="query_validation"))
+builder_final.add_node("safe_executor", RunnableLambda(safe_executor_node, afunc=asafe_executor_node, name="safe_executor"))
+
+builder_final.add_edge(START, "intent")
+# A confident template match already has its SQL; everything else goes through
+# the LLM stages (bypassing the router for now as it's a specialized finance bot)
+builder_final.add_conditional_edges(
+    "intent",
+    intent_condition,
+    {
+        "matched": "safe_executor",
+        "llm": "finance"
+    }
+)
 builder_final.add_edge("finance", "filter_check")
 
 builder_final.add_conditional_edges(
@@ -375,40 +673,153 @@ builder_final.add_conditional_edges(
 )
 
 builder_final.add_edge("fuzz_filter", "query_generator")
-builder_final.add_edge("query_generator", "query_validation")
+builder_final.add_conditional_edges(
+    "query_generator",
+    validation_condition,
+    {
+        "fast": "safe_executor",
+        "llm": "query_validation"
+    }
+)
 builder_final.add_edge("query_validation", "safe_executor")
 builder_final.add_edge("safe_executor", END)
 
-# Compile the graph
-sql_pipeline_app = builder_final.compile()
+# Compile the graph. With a checkpointer every completed node is persisted per
+# thread_id, so a failed or interrupted run can continue from where it stopped.
+sql_pipeline_app = builder_final.compile(checkpointer=get_checkpointer())
 
-def run_sql_pipeline(query: str) -> str:
+# Keys produced by a run; cleared when a thread starts a new question so a
+# previous run's filters/SQL can't leak into the next one
+RUN_STATE_KEYS = [k for k in FinalState.__annotations__ if k != 'user_query']
+
+def pipeline_input(query: str) -> Dict[str, Any]:
+    """Graph input for a new question on a (possibly reused) thread."""
+    return {"user_query": query, **{k: None for k in RUN_STATE_KEYS}}
+
+def pipeline_config(thread_id: str = None) -> Dict[str, Any]:
+    return {"callbacks": tracer_callbacks(), "configurable": {"thread_id": thread_id or str(uuid.uuid4())}}
+
+def _compact_thread(thread_id: str):
+    # Keeps the latest checkpoint, which is all `resume_sql_pipeline` needs
+    if sql_pipeline_app.checkpointer is not None:
+        sql_pipeline_app.checkpointer.compact_thread(thread_id)
+
+def run_sql_pipeline(query: str, thread_id: str = None) -> str:
     """
     Entry point for the SQL generation and execution pipeline.
+
+    Pass `thread_id` to keep the run's checkpoints under a known thread (see
+    `resume_sql_pipeline`); otherwise a fresh thread is used.
     """
-    pipeline_start = time.time()
-    logger.info("="*70)
-    logger.info("SQL PIPELINE STARTED")
-    logger.info("="*70)
-    logger.info(f"User Query: '{query}'")
-    logger.info(f"Log File: {LOG_FILE}")
+    # Nobody else knows an ad-hoc thread's id: its history is compacted after the run
+    ad_hoc = thread_id is None
+    thread_id = thread_id or str(uuid.uuid4())
+    with log_context(run_id=str(uuid.uuid4()), thread_id=thread_id):
+        pipeline_start = time.time()
+        logger.debug("="*70)
+        logger.info("SQL PIPELINE STARTED")
+        logger.debug("="*70)
+        logger.info("User Query: '%s'", query)
+        logger.debug("Log File: %s", LOG_FILE)
+
+        if ANSWER_CACHE_ENABLED:
+            cached = answer_cache.get(query)
+            if cached is not None:
+                logger.info("[SUCCESS] PIPELINE served from answer cache in %.3fs (%s)", time.time() - pipeline_start, answer_cache.stats())
+                PIPELINE_LATENCY.labels("cache").observe(time.time() - pipeline_start)
+                return cached
     
-    try:
-        result = sql_pipeline_app.invoke({"user_query": query}, config={"callbacks": [opik_tracer]})
-        execution_time = time.time() - pipeline_start
+        try:
+            with RUNS_IN_FLIGHT.track():
+                result = sql_pipeline_app.invoke(pipeline_input(query), config=pipeline_config(thread_id))
+            execution_time = time.time() - pipeline_start
+            PIPELINE_LATENCY.labels("ok").observe(execution_time)
         
-        logger.info("="*70)
-        logger.info(f"[SUCCESS] PIPELINE COMPLETED in {execution_time:.2f}s")
-        logger.info("="*70)
+            logger.debug("="*70)
+            logger.info("[SUCCESS] PIPELINE COMPLETED in %.2fs", execution_time)
+            logger.debug("="*70)
         
-        return result.get('sql_query', "Failed to retrieve data.")
-    except Exception as e:
-        execution_time = time.time() - pipeline_start
-        logger.error("="*70)
-        logger.error(f"[FAILURE] PIPELINE FAILED after {execution_time:.2f}s")
-        logger.error("="*70)
-        logger.error(f"Error: {str(e)}", exc_info=True)
-        return f"Error in SQL pipeline: {str(e)}"
+            answer = result.get('sql_query', "Failed to retrieve data.")
+            # Only cache real answers; errors may be transient
+            if ANSWER_CACHE_ENABLED and not answer.startswith(("Error", "Failed")):
+                answer_cache.put(query, answer)
+            return answer
+        except Exception as e:
+            execution_time = time.time() - pipeline_start
+            PIPELINE_LATENCY.labels("error").observe(execution_time)
+            logger.debug("="*70)
+            logger.error("[FAILURE] PIPELINE FAILED after %.2fs", execution_time)
+            logger.debug("="*70)
+            logger.error("Error: %s", e, exc_info=True)
+            return f"Error in SQL pipeline: {str(e)}"
+        finally:
+            if ad_hoc:
+                _compact_thread(thread_id)
+
+async def arun_sql_pipeline(query: str, thread_id: str = None) -> str:
+    """
+    Async entry point: same pipeline as `run_sql_pipeline` without blocking the event loop.
+    """
+    # Nobody else knows an ad-hoc thread's id: its history is compacted after the run
+    ad_hoc = thread_id is None
+    thread_id = thread_id or str(uuid.uuid4())
+    with log_context(run_id=str(uuid.uuid4()), thread_id=thread_id):
+        pipeline_start = time.time()
+        logger.debug("="*70)
+        logger.info("SQL PIPELINE STARTED (async)")
+        logger.debug("="*70)
+        logger.info("User Query: '%s'", query)
+
+        if ANSWER_CACHE_ENABLED:
+            cached = await run_blocking(answer_cache.get, query)
+            if cached is not None:
+                logger.info("[SUCCESS] PIPELINE served from answer cache in %.3fs (%s)", time.time() - pipeline_start, answer_cache.stats())
+                PIPELINE_LATENCY.labels("cache").observe(time.time() - pipeline_start)
+                return cached
+
+        try:
+            with RUNS_IN_FLIGHT.track():
+                result = await sql_pipeline_app.ainvoke(pipeline_input(query), config=pipeline_config(thread_id))
+            PIPELINE_LATENCY.labels("ok").observe(time.time() - pipeline_start)
+            logger.debug("="*70)
+            logger.info("[SUCCESS] PIPELINE COMPLETED in %.2fs", time.time() - pipeline_start)
+            logger.debug("="*70)
+
+            answer = result.get('sql_query', "Failed to retrieve data.")
+            if ANSWER_CACHE_ENABLED and not answer.startswith(("Error", "Failed")):
+                await run_blocking(answer_cache.put, query, answer)
+            return answer
+        except Exception as e:
+            PIPELINE_LATENCY.labels("error").observe(time.time() - pipeline_start)
+            logger.debug("="*70)
+            logger.error("[FAILURE] PIPELINE FAILED after %.2fs", time.time() - pipeline_start)
+            logger.debug("="*70)
+            logger.error("Error: %s", e, exc_info=True)
+            return f"Error in SQL pipeline: {str(e)}"
+        finally:
+            if ad_hoc:
+                _compact_thread(thread_id)
+
+def resume_sql_pipeline(thread_id: str) -> str:
+    """
+    Continue a failed or interrupted run from its last completed node.
+
+    Only the nodes that had not finished are executed again; earlier LLM stages
+    are restored from the checkpoint.
+    """
+    with log_context(run_id=str(uuid.uuid4()), thread_id=thread_id):
+        config = pipeline_config(thread_id)
+        snapshot = sql_pipeline_app.get_state(config)
+        if not snapshot.next:
+            logger.info("Resume: thread %s has nothing left to run", thread_id)
+            return snapshot.values.get('sql_query') or "Failed to retrieve data."
+        logger.info("Resume: thread %s continues at %s", thread_id, list(snapshot.next))
+        try:
+            result = sql_pipeline_app.invoke(None, config=config)
+            return result.get('sql_query', "Failed to retrieve data.")
+        except Exception as e:
+            logger.error("[FAILURE] Resumed run on thread %s failed: %s", thread_id, e, exc_info=True)
+            return f"Error in SQL pipeline: {str(e)}"
 
 if __name__ == "__main__":
     # Test call
@@ -0,0 +1,504 @@
+import os
+import re
+import json
+import time
+import queue
+import sqlite3
+import logging
+import tempfile
+import threading
+import argparse
+
+from LangGRAPH_SQL.db_engine import DB_PATH, readonly_uri, apply_read_pragmas
+from LangGRAPH_SQL.query_guard import fingerprint, QueryGuard, QueryTimeoutError
+
+logger = logging.getLogger(__name__)
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_PLAN_DB_PATH = os.path.join(os.path.dirname(CURRENT_DIR), '.cache', 'query_plans.db')
+
+INDEX_ADVISOR_ENABLED = os.environ.get("INDEX_ADVISOR_ENABLED", "1") not in ("0", "false", "False")
+INDEX_ADVISOR_DB_PATH = os.environ.get("INDEX_ADVISOR_DB_PATH", DEFAULT_PLAN_DB_PATH)
+# Create recommended indexes on finance.db without asking (after measuring them on a copy)
+INDEX_ADVISOR_AUTO_APPLY = os.environ.get("INDEX_ADVISOR_AUTO_APPLY", "0") not in ("0", "false", "False")
+# Executions of supporting queries before an index is auto-applied
+INDEX_ADVISOR_MIN_QUERIES = int(os.environ.get("INDEX_ADVISOR_MIN_QUERIES", 3))
+# Measured speedup an index must reach to be auto-applied
+INDEX_ADVISOR_MIN_SPEEDUP = float(os.environ.get("INDEX_ADVISOR_MIN_SPEEDUP", 1.5))
+# Executed queries waiting to be recorded; beyond this they are dropped (counted in stats)
+INDEX_ADVISOR_QUEUE_SIZE = 1000
+# Wider candidates are still recommended, just not as covering indexes
+MAX_INDEX_COLUMNS = 6
+
+# Same deadline / VM-step budget as production queries, but without offender
+# tracking: a timed-out measurement must not get real queries rejected, and a
+# production offender must still be measurable on the scratch copy
+_measure_guard = QueryGuard(offender_threshold=0)
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS query_plans (
+    fingerprint TEXT PRIMARY KEY,
+    sql TEXT NOT NULL,
+    plan TEXT NOT NULL,
+    issues TEXT NOT NULL,
+    candidates TEXT NOT NULL,
+    executions INTEGER NOT NULL DEFAULT 0,
+    first_seen REAL NOT NULL,
+    last_seen REAL NOT NULL
+);
+"""
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_IDENT = r'(?:"?\w+"?\s*\.\s*)?"?(\w+)"?'
+_EQ_RE = re.compile(_IDENT + r"\s*(?:(?<![!<>])=|\bIN\s*\(|\bIS\b(?!\s+NOT))", re.IGNORECASE)
+_RANGE_RE = re.compile(_IDENT + r"\s*(?:<=|>=|<(?!>)|(?<!<)>|\bBETWEEN\b|\bLIKE\s+'[^'%_]+%')", re.IGNORECASE)
+_ORDER_RE = re.compile(r"\b(?:GROUP|ORDER)\s+BY\s+(.*?)(?=\bHAVING\b|\bORDER\s+BY\b|\bLIMIT\b|\bUNION\b|\)|;|$)",
+                       re.IGNORECASE | re.DOTALL)
+
+
+# --- Plan and query analysis ---
+
+def explain_plan(conn: sqlite3.Connection, sql: str):
+    """`EXPLAIN QUERY PLAN` detail lines for `sql`."""
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}")]
+
+
+def plan_issues(plan):
+    """
+    Patterns in a query plan an index can remove: full table scans
+    (`SCAN t` without an index) and temp b-trees built for GROUP BY / ORDER BY / DISTINCT.
+    """
+    issues = []
+    for detail in plan:
+        scan = re.match(r"SCAN (?:TABLE )?(\w+)(?: AS \w+)?$", detail)
+        if scan:
+            issues.append({"type": "full_scan", "table": scan.group(1).lower(), "detail": detail})
+        elif detail.startswith("USE TEMP B-TREE"):
+            issues.append({"type": "temp_btree", "table": None, "detail": detail})
+    return issues
+
+
+def read_columns(conn: sqlite3.Connection, sql: str):
+    """`{table: [columns]}` read by `sql`, as reported by SQLite's authorizer while compiling it."""
+    reads = {}
+
+    def authorizer(action, arg1, arg2, db_name, trigger):
+        if action == sqlite3.SQLITE_READ and arg1 and arg2:
+            cols = reads.setdefault(arg1.lower(), [])
+            if arg2.lower() not in cols:
+                cols.append(arg2.lower())
+        return sqlite3.SQLITE_OK
+
+    conn.set_authorizer(authorizer)
+    try:
+        conn.execute(f"EXPLAIN {sql}").fetchall()
+    finally:
+        conn.set_authorizer(None)
+    return reads
+
+
+def classify_columns(sql: str):
+    """Column names used in equality predicates, range predicates and GROUP/ORDER BY lists."""
+    body = _STRING_RE.sub("?", sql)
+    eq = [c.lower() for c in _EQ_RE.findall(body)]
+    rng = [c.lower() for c in _RANGE_RE.findall(body)]
+    order = []
+    for clause in _ORDER_RE.findall(body):
+        for term in clause.split(','):
+            m = re.fullmatch(r"\s*" + _IDENT + r"(?:\s+(?:ASC|DESC))?\s*", term, re.IGNORECASE)
+            if m:
+                order.append(m.group(1).lower())
+    return list(dict.fromkeys(eq)), list(dict.fromkeys(rng)), list(dict.fromkeys(order))
+
+
+def candidate_indexes(sql: str, reads: dict, issues):
+    """
+    One candidate per table with a plan issue: equality columns first, then the
+    first range column (or the GROUP/ORDER BY columns when there is no range),
+    then the other columns the query reads so the index covers it.
+    """
+    eq, rng, order = classify_columns(sql)
+    sorts = any(i["type"] == "temp_btree" for i in issues)
+    scanned = {i["table"] for i in issues if i["type"] == "full_scan"}
+    candidates = []
+    for table, cols in reads.items():
+        if table not in scanned and not sorts:
+            continue
+        key = [c for c in eq if c in cols]
+        key += [c for c in (rng[:1] if any(c in cols for c in rng) else order) if c in cols and c not in key]
+        rest = [c for c in cols if c not in key and c != 'id']
+        covering = len(key) + len(rest) <= MAX_INDEX_COLUMNS
+        columns = key + rest if covering else key
+        if columns:
+            candidates.append({"table": table, "columns": columns, "covering": covering})
+    return candidates
+
+
+def quote_identifier(name: str) -> str:
+    """SQLite identifier quoting: wrap in double quotes, doubling embedded ones."""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def index_name(table: str, columns) -> str:
+    return re.sub(r"\W", "_", f"idx_advisor_{table}_{'_'.join(columns)}")
+
+
+def existing_indexes(conn: sqlite3.Connection, table: str):
+    """Column lists of the indexes already defined on `table`."""
+    indexes = []
+    for row in conn.execute(f'PRAGMA index_list("{table}")'):
+        indexes.append([r[2].lower() for r in conn.execute(f'PRAGMA index_info("{row[1]}")') if r[2]])
+    return indexes
+
+
+# --- Advisor ---
+
+class IndexAdvisor:
+    """
+    Records the query plan of every executed query and recommends indexes.
+
+    The first execution of each query shape (see `query_guard.fingerprint`) is
+    explained on a read-only connection; its SCAN / TEMP B-TREE patterns and the
+    candidate index that would remove them are stored in `.cache/query_plans.db`,
+    so the CLI report sees what the server executed. Candidates are ranked by how
+    often their queries ran, with an expected speedup from table statistics and,
+    on request, a measured speedup from timing the queries on a scratch copy of
+    the database with and without the index.
+
+    The executor hands queries over with `submit`: recording happens on a
+    background thread after the query ran, so it adds nothing to the user's
+    latency and an advisor failure cannot fail the query.
+    """
+
+    def __init__(self, db_path: str = DB_PATH, plan_db_path: str = INDEX_ADVISOR_DB_PATH,
+                 enabled: bool = INDEX_ADVISOR_ENABLED, auto_apply: bool = INDEX_ADVISOR_AUTO_APPLY):
+        self.db_path = db_path
+        self.plan_db_path = plan_db_path
+        self.enabled = enabled
+        self.auto_apply = auto_apply
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._explained = set()
+        self._store = None
+        self._auto_applying = False
+        self._measured_out = set()  # auto-apply candidates that did not pay off
+        self._pending = queue.Queue(maxsize=INDEX_ADVISOR_QUEUE_SIZE)
+        self._recorder = None
+        self.stats = {"recorded": 0, "explained": 0, "applied": 0, "dropped": 0}
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(readonly_uri(self.db_path), uri=True, check_same_thread=False)
+            apply_read_pragmas(conn)
+            self._local.conn = conn
+        return conn
+
+    def _plans(self):
+        if self._store is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.plan_db_path)), exist_ok=True)
+            store = sqlite3.connect(self.plan_db_path, check_same_thread=False)
+            store.execute("PRAGMA journal_mode=WAL")
+            store.execute("PRAGMA synchronous=NORMAL")
+            store.executescript(_SCHEMA)
+            self._store = store
+        return self._store
+
+    def submit(self, sql: str):
+        """Queue an executed query for `record` on the advisor's background thread. Never blocks."""
+        if not self.enabled or not sql:
+            return
+        with self._lock:
+            if self._recorder is None:
+                self._recorder = threading.Thread(target=self._record_loop, name="index-advisor-recorder",
+                                                  daemon=True)
+                self._recorder.start()
+        try:
+            self._pending.put_nowait(sql)
+        except queue.Full:
+            with self._lock:
+                self.stats["dropped"] += 1
+
+    def _record_loop(self):
+        while True:
+            sql = self._pending.get()
+            try:
+                self.record(sql)
+            except Exception as e:
+                logger.warning("Index advisor could not record query plan: %s", e)
+            finally:
+                self._pending.task_done()
+
+    def flush(self):
+        """Block until every submitted query is recorded."""
+        self._pending.join()
+
+    def record(self, sql: str):
+        """Count an execution of `sql`, explaining it the first time its shape is seen."""
+        if not self.enabled or not sql:
+            return
+        fp = fingerprint(sql)
+        now = time.time()
+        with self._lock:
+            self.stats["recorded"] += 1
+            fresh = fp not in self._explained
+            self._explained.add(fp)
+        try:
+            if fresh:
+                conn = self._connection()
+                plan = explain_plan(conn, sql)
+                issues = plan_issues(plan)
+                candidates = candidate_indexes(sql, read_columns(conn, sql), issues) if issues else []
+                with self._lock:
+                    self.stats["explained"] += 1
+                    self._plans().execute(
+                        "INSERT INTO query_plans (fingerprint, sql, plan, issues, candidates, executions, first_seen, last_seen) "
+                        "VALUES (?, ?, ?, ?, ?, 1, ?, ?) ON CONFLICT(fingerprint) DO UPDATE SET "
+                        "sql = excluded.sql, plan = excluded.plan, issues = excluded.issues, "
+                        "candidates = excluded.candidates, executions = executions + 1, last_seen = excluded.last_seen",
+                        (fp, sql, json.dumps(plan), json.dumps(issues), json.dumps(candidates), now, now))
+                    self._plans().commit()
+            else:
+                with self._lock:
+                    self._plans().execute("UPDATE query_plans SET executions = executions + 1, last_seen = ? "
+                                          "WHERE fingerprint = ?", (now, fp))
+                    self._plans().commit()
+        except sqlite3.Error as e:
+            # The advisor must never get in the way of answering the question
+            logger.warning("Index advisor could not record query plan: %s", e)
+            return
+        if self.auto_apply:
+            self._maybe_auto_apply()
+
+    def queries(self):
+        with self._lock:
+            rows = self._plans().execute(
+                "SELECT fingerprint, sql, plan, issues, candidates, executions FROM query_plans "
+                "ORDER BY executions DESC").fetchall()
+        return [{"fingerprint": r[0], "sql": r[1], "plan": json.loads(r[2]), "issues": json.loads(r[3]),
+                 "candidates": json.loads(r[4]), "executions": r[5]} for r in rows]
+
+    def recommendations(self, estimate: bool = True):
+        """
+        Candidate indexes merged across queries, most-executed first. A candidate
+        whose columns are a prefix of another candidate (or of an existing index)
+        is folded into it.
+        """
+        conn = self._connection()
+        merged = {}
+        for query in self.queries():
+            for cand in query["candidates"]:
+                key = (cand["table"], tuple(cand["columns"]))
+                rec = merged.setdefault(key, {"table": cand["table"], "columns": cand["columns"],
+                                              "covering": cand["covering"], "queries": [], "executions": 0})
+                rec["queries"].append(query)
+                rec["executions"] += query["executions"]
+
+        recs = sorted(merged.values(), key=lambda r: -len(r["columns"]))
+        kept = []
+        for rec in recs:
+            cols = rec["columns"]
+            if any(idx[:len(cols)] == cols for idx in existing_indexes(conn, rec["table"])):
+                continue
+            wider = next((k for k in kept if k["table"] == rec["table"] and k["columns"][:len(cols)] == cols), None)
+            if wider is not None:
+                wider["queries"].extend(rec["queries"])
+                wider["executions"] += rec["executions"]
+                continue
+            kept.append(rec)
+
+        for rec in kept:
+            rec["name"] = index_name(rec["table"], rec["columns"])
+            rec["sql"] = (f'CREATE INDEX IF NOT EXISTS {quote_identifier(rec["name"])} ON {quote_identifier(rec["table"])} '
+                          f'({", ".join(quote_identifier(c) for c in rec["columns"])})')
+            rec["issues"] = sorted({i["detail"] for q in rec["queries"] for i in q["issues"]})
+            if estimate:
+                rec["expected_speedup"] = round(self._expected_speedup(conn, rec), 1)
+        return sorted(kept, key=lambda r: (-r["executions"], -r.get("expected_speedup", 0)))
+
+    @staticmethod
+    def _expected_speedup(conn: sqlite3.Connection, rec) -> float:
+        """
+        Rough rows-read estimate: the table scan versus an index search narrowed by
+        1/distinct per equality column and 1/4 per range column (SQLite's own
+        default), times the width saved when the index covers the query. Queries
+        are weighted by how often they ran.
+        """
+        table = rec["table"]
+        total_rows = conn.execute(f'SELECT COUNT(*) FROM "{table}"').fetchone()[0] or 1
+        table_width = len(conn.execute(f'PRAGMA table_info("{table}")').fetchall()) or 1
+        width = max(table_width / len(rec["columns"]), 1.0) if rec["covering"] else 1.0
+        before = after = 0.0
+        for query in rec["queries"]:
+            eq, rng, _ = classify_columns(query["sql"])
+            rows = float(total_rows)
+            for col in rec["columns"]:
+                if col in eq:
+                    distinct = conn.execute(f'SELECT COUNT(DISTINCT "{col}") FROM "{table}"').fetchone()[0] or 1
+                    rows /= distinct
+                elif col in rng:
+                    rows /= 4
+                    break
+                else:
+                    break
+            before += total_rows * query["executions"]
+            after += max(rows, 1.0) / width * query["executions"]
+        return before / after if after else 1.0
+
+    def measure(self, recs, repeats: int = 3):
+        """
+        Time each recommendation's queries on a scratch copy of the database with
+        and without its index; sets `measured_speedup` and `uses_index` in place.
+        A side that hits the query deadline is not a time: the recommendation is
+        marked `inconclusive` and gets no measured speedup.
+        """
+        if not recs:
+            return recs
+        with tempfile.TemporaryDirectory() as tmp:
+            scratch = os.path.join(tmp, "advisor.db")
+            src = sqlite3.connect(readonly_uri(self.db_path), uri=True)
+            dst = sqlite3.connect(scratch)
+            src.backup(dst)
+            src.close()
+            for rec in recs:
+                queries = [q["sql"] for q in rec["queries"]]
+                before = self._time_queries(dst, queries, repeats)
+                dst.execute(rec["sql"])
+                dst.execute("ANALYZE")
+                after = self._time_queries(dst, queries, repeats)
+                rec["uses_index"] = all(any(rec["name"] in d for d in explain_plan(dst, q)) for q in queries)
+                dst.execute(f'DROP INDEX IF EXISTS {quote_identifier(rec["name"])}')
+                # A run that hit the deadline has no meaningful time: the measurement is inconclusive
+                rec["inconclusive"] = before is None or after is None
+                rec["before_ms"] = None if before is None else round(before * 1000, 2)
+                rec["after_ms"] = None if after is None else round(after * 1000, 2)
+                rec["measured_speedup"] = round(before / after, 1) if before and after else None
+            dst.close()
+        return recs
+
+    @staticmethod
+    def _time_queries(conn: sqlite3.Connection, queries, repeats: int):
+        """Sum of the best-of-`repeats` times of `queries`, or None if any of them timed out."""
+        total = 0.0
+        for sql in queries:
+            best = None
+            for _ in range(repeats):
+                start = time.perf_counter()
+                try:
+                    with _measure_guard.guard(conn, sql):
+                        conn.execute(sql).fetchall()
+                except QueryTimeoutError:
+                    return None
+                elapsed = time.perf_counter() - start
+                best = elapsed if best is None else min(best, elapsed)
+            total += best or 0.0
+        return total
+
+    def apply(self, recs):
+        """
+        Create the indexes on the real database and refresh statistics.
+
+        This is the only writer of finance.db, which the pipeline otherwise opens
+        read-only: it uses a writable connection, and the new indexes and ANALYZE
+        move the database's data_version, so the answer cache and the value index
+        are invalidated. Reached from the CLI (--apply), INDEX_ADVISOR_AUTO_APPLY or
+        the token-protected POST /admin/index-advisor/apply.
+        """
+        if not recs:
+            return []
+        conn = sqlite3.connect(self.db_path)
+        try:
+            for rec in recs:
+                logger.info("Index advisor: %s", rec["sql"])
+                conn.execute(rec["sql"])
+            conn.execute("ANALYZE")
+            conn.commit()
+        finally:
+            conn.close()
+        with self._lock:
+            self.stats["applied"] += len(recs)
+            # Plans change with the new indexes: re-explain on next execution
+            self._explained.clear()
+            self._plans().execute("DELETE FROM query_plans")
+            self._plans().commit()
+        return [rec["name"] for rec in recs]
+
+    def _maybe_auto_apply(self):
+        with self._lock:
+            if self._auto_applying:
+                return
+            self._auto_applying = True
+
+        def run():
+            try:
+                ready = [r for r in self.recommendations(estimate=False)
+                         if r["executions"] >= INDEX_ADVISOR_MIN_QUERIES and r["name"] not in self._measured_out]
+                if not ready:
+                    return
+                good = [r for r in self.measure(ready)
+                        if r.get("uses_index") and (r.get("measured_speedup") or 0) >= INDEX_ADVISOR_MIN_SPEEDUP]
+                self._measured_out.update(r["name"] for r in ready if r not in good)
+                if good:
+                    self.apply(good)
+            except Exception as e:
+                logger.error("Index advisor auto-apply failed: %s", e, exc_info=True)
+            finally:
+                self._auto_applying = False
+
+        threading.Thread(target=run, name="index-advisor", daemon=True).start()
+
+    def report(self, measure: bool = False, apply: bool = False) -> dict:
+        recs = self.recommendations()
+        if measure or apply:
+            self.measure(recs)
+        applied = self.apply([r for r in recs if r.get("uses_index") and not r.get("inconclusive")]) if apply else []
+        return {
+            "recommendations": [{k: v for k, v in r.items() if k != "queries"}
+                                | {"queries": [q["sql"] for q in r["queries"]]} for r in recs],
+            "applied": applied,
+            "stats": dict(self.stats),
+        }
+
+
+def format_report(report: dict) -> str:
+    lines = []
+    recs = report["recommendations"]
+    if not recs:
+        lines.append("No index recommendations: no recorded query scans a table or sorts in a temp b-tree.")
+    for i, rec in enumerate(recs, 1):
+        measured = rec.get("measured_speedup")
+        lines.append(f"{i}. {rec['sql']}")
+        lines.append(f"   executions: {rec['executions']}   covering: {rec['covering']}   "
+                     f"expected: {rec['expected_speedup']}x"
+                     + (f"   measured: {measured}x ({rec['before_ms']}ms -> {rec['after_ms']}ms)"
+                        if measured is not None else "")
+                     + ("   measured: inconclusive (timed out)" if rec.get("inconclusive") else ""))
+        for issue in rec["issues"]:
+            lines.append(f"   plan: {issue}")
+        for sql in rec["queries"][:3]:
+            lines.append(f"   query: {' '.join(sql.split())[:120]}")
+    if report["applied"]:
+        lines.append(f"Applied: {', '.join(report['applied'])}")
+    return "\n".join(lines)
+
+
+index_advisor = IndexAdvisor()
+
+
+if __name__ == "__main__":
+    # Index recommendations for the queries recorded by the server:
+    #   python -m LangGRAPH_SQL.index_advisor [--measure] [--apply] [--json] [--sql-file FILE]
+    parser = argparse.ArgumentParser(description="EXPLAIN QUERY PLAN based index advisor for finance.db")
+    parser.add_argument("--measure", action="store_true", help="time the queries on a scratch copy with/without each index")
+    parser.add_argument("--apply", action="store_true", help="create the recommended indexes that the planner uses")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument("--sql-file", help="record the statements in this file (one per line) before reporting")
+    args = parser.parse_args()
+
+    if args.sql_file:
+        with open(args.sql_file, encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    index_advisor.record(line.strip())
+    result = index_advisor.report(measure=args.measure, apply=args.apply)
+    print(json.dumps(result, indent=2) if args.json else format_report(result))
@@ -0,0 +1,488 @@
+import os
+import re
+import logging
+import calendar
+from datetime import date, timedelta
+
+from rapidfuzz import process, fuzz, utils
+
+from LangGRAPH_SQL.answer_cache import normalize_question
+from LangGRAPH_SQL.fuzzy_wuzzy import value_index
+
+logger = logging.getLogger(__name__)
+
+# Share of the question's words a template must account for (its vocabulary,
+# filler words, extracted slots) before its SQL is run without the LLM pipeline.
+# 1.0: a single word no template understands sends the question to the LLM.
+INTENT_MIN_CONFIDENCE = float(os.environ.get("INTENT_MIN_CONFIDENCE", 1.0))
+# rapidfuzz ratio a phrase needs to become a category/merchant slot value
+INTENT_SLOT_MIN_SCORE = float(os.environ.get("INTENT_SLOT_MIN_SCORE", 85))
+INTENT_DEFAULT_TOP_N = int(os.environ.get("INTENT_DEFAULT_TOP_N", 5))
+
+# Words that carry no meaning for any template
+_FILLER = {
+    'i', 'me', 'my', 'mine', 'we', 'our', 'the', 'a', 'an', 'of', 'in', 'on', 'at', 'for', 'to',
+    'from', 'by', 'with', 'and', 'is', 'am', 'are', 'was', 'were', 'be', 'been', 'do', 'does',
+    'did', 'have', 'has', 'had', 'what', 'which', 'how', 'much', 'many', 'show', 'list', 'give',
+    'tell', 'get', 'please', 'can', 'could', 'you', 'all', 'their', 'those', 'that', 'it', 'there',
+    'any', 'so', 'far', 'during', 'where', 'whats', 's', 'hi', 'hey', 'just', 'up', 'till', 'now',
+}
+# A template cannot express these; the question goes to the LLM pipeline
+_VETO = {'not', 'no', 'except', 'excluding', 'exclude', 'without', 'besides', 'other', 'others', 'but'}
+
+_SPEND_WORDS = {'spend', 'spent', 'spending', 'spendings', 'expense', 'expenses', 'money', 'paid', 'pay', 'cost'}
+
+_MONTHS = {name.lower(): i for i, name in enumerate(calendar.month_name) if name}
+_MONTHS.update({name.lower(): i for i, name in enumerate(calendar.month_abbr) if name})
+_MONTHS['sept'] = 9
+# "may" is only a month after a preposition ("in May"), never on its own
+_MONTH_RE = re.compile(
+    r"\b(?:(?:in|during|for|of)\s+may|" + "|".join(sorted((m for m in _MONTHS if m != 'may'), key=len, reverse=True))
+    + r")\b(?:\s+(\d{4}))?"
+)
+_RELATIVE_RE = re.compile(r"\b(this|current|last|previous)\s+(month|year|week)\b")
+_ROLLING_RE = re.compile(r"\b(?:last|past)\s+(\d+)\s+(day|week|month|year)s?\b|\bpast\s+(day|week|month|year)\b")
+_YEAR_RE = re.compile(r"\b(?:in|during|for)\s+(\d{4})\b")
+_DAY_RE = re.compile(r"\b(today|yesterday)\b")
+# normalize_question has already dropped leading zeros ("2026-01-05" -> "2026-1-5")
+_RANGE_RE = re.compile(r"\b(?:between|from)\s+(\d{4}-\d{1,2}-\d{1,2})\s+(?:and|to|until)\s+(\d{4}-\d{1,2}-\d{1,2})\b")
+_TOP_N_RE = re.compile(r"\b(?:top|first|biggest|largest|highest)\s+(\d+)\b|\b(\d+)\s+(?:top|biggest|largest|highest|most)\b")
+
+# Slot name -> (table, column) whose distinct values come from the value index
+SLOT_COLUMNS = {
+    "category": ("transactions", "category"),
+    "merchant": ("transactions", "merchant"),
+}
+
+
+def _month_start(d: date) -> date:
+    return d.replace(day=1)
+
+
+def _add_months(d: date, months: int) -> date:
+    """First day of the month `months` away from `d`'s month."""
+    month = d.month - 1 + months
+    return date(d.year + month // 12, month % 12 + 1, 1)
+
+
+def _shift_months(d: date, months: int) -> date:
+    """Same day `months` away, clamped to the end of shorter months."""
+    first = _add_months(d, months)
+    return first.replace(day=min(d.day, calendar.monthrange(first.year, first.month)[1]))
+
+
+def _parse_date(text: str) -> date:
+    return date(*(int(part) for part in text.split('-')))
+
+
+def _quote(value: str) -> str:
+    return "'" + str(value).replace("'", "''") + "'"
+
+
+class Period:
+    """Half-open date range [start, end); `months` is set when it is exactly one calendar month."""
+
+    def __init__(self, start: date, end: date, label: str):
+        self.start = start
+        self.end = end
+        self.label = label
+        self.months = 1 if start.day == 1 and end == _add_months(start, 1) else None
+
+    def to_dict(self):
+        return {"label": self.label, "start": self.start.isoformat(), "end": self.end.isoformat()}
+
+
+def _extract_period(text: str, today: date):
+    """First date expression in `text` -> (Period, (start, end) char span), or (None, None)."""
+    found = []
+
+    m = _RELATIVE_RE.search(text)
+    if m:
+        which, unit = m.groups()
+        back = 1 if which in ('last', 'previous') else 0
+        if unit == 'month':
+            start = _add_months(_month_start(today), -back)
+            found.append((m.span(), Period(start, _add_months(start, 1), m.group(0))))
+        elif unit == 'year':
+            start = date(today.year - back, 1, 1)
+            found.append((m.span(), Period(start, date(start.year + 1, 1, 1), m.group(0))))
+        else:
+            found.append((m.span(), Period(today - timedelta(days=7 if back else today.weekday()),
+                                           today + timedelta(days=1), m.group(0))))
+
+    m = _ROLLING_RE.search(text)
+    if m:
+        n, unit = (int(m.group(1)), m.group(2)) if m.group(1) else (1, m.group(3))
+        if unit in ('month', 'year'):
+            start = _shift_months(today, -n * (12 if unit == 'year' else 1))
+        else:
+            start = today - timedelta(days=n * (7 if unit == 'week' else 1))
+        found.append((m.span(), Period(start, today + timedelta(days=1), m.group(0))))
+
+    m = _MONTH_RE.search(text)
+    if m:
+        name = m.group(0).split()[-2 if m.group(1) else -1]
+        month = _MONTHS[name]
+        if m.group(1):
+            year = int(m.group(1))
+        else:
+            # The most recent such month that has started
+            year = today.year if month <= today.month else today.year - 1
+        start = date(year, month, 1)
+        found.append((m.span(), Period(start, _add_months(start, 1), m.group(0))))
+
+    m = _YEAR_RE.search(text)
+    if m:
+        year = int(m.group(1))
+        found.append((m.span(), Period(date(year, 1, 1), date(year + 1, 1, 1), m.group(0))))
+
+    m = _DAY_RE.search(text)
+    if m:
+        day = today - timedelta(days=1 if m.group(1) == 'yesterday' else 0)
+        found.append((m.span(), Period(day, day + timedelta(days=1), m.group(0))))
+
+    m = _RANGE_RE.search(text)
+    if m:
+        try:
+            start, last = _parse_date(m.group(1)), _parse_date(m.group(2))
+            if start <= last:
+                found.append((m.span(), Period(start, last + timedelta(days=1), m.group(0))))
+        except ValueError:
+            pass
+
+    if not found:
+        return None, None
+    # The longest expression wins ("january 2026" over "in 2026"); others stay unexplained
+    span, period = max(found, key=lambda f: f[0][1] - f[0][0])
+    return period, span
+
+
+class ExtractedSlots:
+    """Slot values found in a question and the character spans they account for."""
+
+    def __init__(self):
+        self.values = {}
+        self.spans = {}
+
+    def add(self, name, value, span):
+        self.values[name] = value
+        self.spans[name] = span
+
+    def to_dict(self):
+        return {k: (v.to_dict() if isinstance(v, Period) else v) for k, v in self.values.items()}
+
+
+class Intent:
+    """
+    One question shape: the words that must appear (`required`, every regex
+    must match), the words it accounts for (`vocabulary`), the slots its
+    template accepts and `render(slots, text)`, which returns the SQL or None
+    when the slots cannot be expressed by the template.
+    """
+
+    def __init__(self, name, required, vocabulary, slots, render):
+        self.name = name
+        self.required = [re.compile(r) for r in required]
+        self.vocabulary = set(vocabulary)
+        self.slots = set(slots)
+        self.render = render
+
+    def applies(self, text: str) -> bool:
+        return all(r.search(text) for r in self.required)
+
+
+def _spend_conditions(slots, prefix=''):
+    conditions = []
+    category = slots.get('category')
+    # Income rows are not spending unless explicitly asked for
+    conditions.append(f"{prefix}category = {_quote(category)}" if category else f"{prefix}category != 'Income'")
+    if slots.get('merchant'):
+        conditions.append(f"{prefix}merchant = {_quote(slots['merchant'])}")
+    period = slots.get('period')
+    if period:
+        conditions.append(f"{prefix}date >= '{period.start.isoformat()}' AND {prefix}date < '{period.end.isoformat()}'")
+    return " AND ".join(conditions)
+
+
+def _top_merchants_sql(slots, text):
+    n = slots.get('n')
+    if n is None:
+        # The noun's number decides: "the top merchant" is one row, "top merchants" a list
+        singular = re.search(r"\b(merchant|shop|store|place|vendor)\b", text)
+        plural = re.search(r"\b(merchants|shops|stores|places|vendors)\b", text)
+        if singular and plural:
+            return None
+        n = 1 if singular else INTENT_DEFAULT_TOP_N
+    if not 1 <= n <= 100:
+        return None
+    return (
+        "SELECT merchant, ROUND(SUM(amount), 2) AS total_spent, COUNT(*) AS transactions\n"
+        "FROM transactions\n"
+        f"WHERE {_spend_conditions(slots)}\n"
+        "GROUP BY merchant\n"
+        "ORDER BY total_spent DESC\n"
+        f"LIMIT {int(n)}"
+    )
+
+
+def _spend_by_category_sql(slots, text):
+    return (
+        "SELECT category, ROUND(SUM(amount), 2) AS total_spent, COUNT(*) AS transactions\n"
+        "FROM transactions\n"
+        f"WHERE {_spend_conditions(slots)}\n"
+        "GROUP BY category\n"
+        "ORDER BY total_spent DESC"
+    )
+
+
+def _total_spend_sql(slots, text):
+    return (
+        "SELECT ROUND(COALESCE(SUM(amount), 0), 2) AS total_spent, COUNT(*) AS transactions\n"
+        "FROM transactions\n"
+        f"WHERE {_spend_conditions(slots)}"
+    )
+
+
+def _budget_status_sql(slots, text):
+    period = slots.get('period')
+    # Budgets are monthly limits; other ranges need the LLM to decide how to compare
+    if period is not None and period.months != 1:
+        return None
+    if period is None:
+        start = _month_start(slots['today'])
+        period = Period(start, _add_months(start, 1), "this month")
+        slots['period'] = period
+    where = f"\nWHERE b.category = {_quote(slots['category'])}" if slots.get('category') else ""
+    having = ("\nHAVING spent > b.monthly_limit"
+              if re.search(r"\b(which|what)\b", text) and re.search(r"\b(over|exceed\w*|above)\b", text) else "")
+    return (
+        "SELECT b.category, b.monthly_limit, ROUND(COALESCE(SUM(t.amount), 0), 2) AS spent,\n"
+        "       ROUND(COALESCE(SUM(t.amount), 0) - b.monthly_limit, 2) AS over_by\n"
+        "FROM budgets b\n"
+        "LEFT JOIN transactions t ON t.category = b.category\n"
+        f"    AND t.date >= '{period.start.isoformat()}' AND t.date < '{period.end.isoformat()}'"
+        f"{where}\n"
+        "GROUP BY b.category, b.monthly_limit"
+        f"{having}\n"
+        "ORDER BY over_by DESC"
+    )
+
+
+def _subscriptions_sql(slots, text):
+    return (
+        "SELECT service_name, expected_amount\n"
+        "FROM recurring_subscriptions\n"
+        "ORDER BY expected_amount DESC"
+    )
+
+
+def _subscription_changes_sql(slots, text):
+    increases = re.search(r"\b(increase\w*|up|rais\w*|hike\w*|higher|more)\b", text)
+    return (
+        "SELECT s.service_name, s.expected_amount, t.date AS last_charged_on, t.amount AS last_charge,\n"
+        "       ROUND(t.amount - s.expected_amount, 2) AS difference\n"
+        "FROM recurring_subscriptions s\n"
+        "JOIN transactions t ON t.id = (\n"
+        "    SELECT id FROM transactions WHERE merchant = s.service_name ORDER BY date DESC, id DESC LIMIT 1\n"
+        ")\n"
+        + ("WHERE t.amount > s.expected_amount\n" if increases else "")
+        + "ORDER BY difference DESC"
+    )
+
+
+_RANKING = {'top', 'most', 'biggest', 'largest', 'highest', 'first'}
+_SUBSCRIPTION = {'subscription', 'subscriptions', 'recurring', 'service', 'services'}
+
+INTENTS = [
+    Intent(
+        "top_merchants",
+        required=[r"\b(merchants?|shops?|stores?|places?|vendors?)\b", r"\b(top|most|biggest|largest|highest|first)\b"],
+        vocabulary=_RANKING | _SPEND_WORDS | {
+            'merchant', 'merchants', 'shop', 'shops', 'store', 'stores', 'place', 'places', 'vendor',
+            'vendors', 'amount', 'total',
+        },
+        slots=("n", "period", "category"),
+        render=_top_merchants_sql,
+    ),
+    Intent(
+        "spend_by_category",
+        required=[r"\bcategor(y|ies)\b", r"\b(by|per|each|breakdown|split)\b"],
+        vocabulary=_SPEND_WORDS | {'category', 'categories', 'per', 'each', 'breakdown', 'split', 'total', 'totals'},
+        slots=("period",),
+        render=_spend_by_category_sql,
+    ),
+    Intent(
+        "total_spend",
+        required=[r"\b(spen[dt]|spending|expenses?|paid)\b"],
+        vocabulary=_SPEND_WORDS | {'total', 'overall', 'altogether', 'sum'},
+        slots=("period", "category", "merchant"),
+        render=_total_spend_sql,
+    ),
+    Intent(
+        "budget_status",
+        required=[r"\bbudgets?\b"],
+        vocabulary=_SPEND_WORDS | {
+            'budget', 'budgets', 'over', 'under', 'within', 'exceed', 'exceeded', 'exceeding', 'above', 'limit',
+            'limits', 'status', 'stay', 'stayed', 'went', 'go', 'gone', 'category', 'categories', 'monthly',
+            'remaining', 'left', 'their', 'vs', 'versus', 'against',
+        },
+        slots=("period", "category"),
+        render=_budget_status_sql,
+    ),
+    Intent(
+        "subscriptions",
+        required=[r"\bsubscriptions?\b"],
+        vocabulary=_SUBSCRIPTION | {'expected', 'amount', 'amounts', 'active', 'monthly', 'price', 'prices',
+                                    'current', 'cost', 'costs'},
+        slots=(),
+        render=_subscriptions_sql,
+    ),
+    Intent(
+        "subscription_price_changes",
+        required=[r"\b(subscriptions?|recurring)\b",
+                  r"\b(increase\w*|went up|gone up|go up|rais\w*|hike\w*|chang\w*|higher|more than|compar\w*|vs|"
+                  r"versus|actual\w*|charged)\b"],
+        vocabulary=_SUBSCRIPTION | _SPEND_WORDS | {
+            'price', 'prices', 'increase', 'increases', 'increased', 'increasing', 'went', 'gone', 'go', 'up',
+            'raise', 'raised', 'raises', 'hike', 'hikes', 'hiked', 'change', 'changes', 'changed', 'higher',
+            'more', 'than', 'expected', 'expect', 'compare', 'compared', 'comparison', 'vs', 'versus', 'actual',
+            'actually', 'charged', 'charge', 'charges', 'amount', 'amounts', 'costs',
+        },
+        slots=(),
+        render=_subscription_changes_sql,
+    ),
+]
+
+# Words some template accounts for; never taken as the start of a category/merchant value
+_TEMPLATE_WORDS = _FILLER | set().union(*(i.vocabulary for i in INTENTS))
+
+
+class IntentMatch:
+    """Outcome of classifying one question; `sql` is set only for a confident, renderable match."""
+
+    def __init__(self, intent=None, confidence=0.0, slots=None, sql=None, outcome="no_intent"):
+        self.intent = intent
+        self.confidence = confidence
+        self.slots = slots or {}
+        self.sql = sql
+        self.outcome = outcome
+
+    @property
+    def matched(self) -> bool:
+        return self.sql is not None
+
+    def to_dict(self):
+        return {"intent": self.intent, "confidence": round(self.confidence, 3), "slots": self.slots,
+                "outcome": self.outcome}
+
+    def __repr__(self):
+        return f"IntentMatch(intent={self.intent!r}, confidence={self.confidence:.2f}, outcome={self.outcome!r})"
+
+
+class IntentLibrary:
+    """
+    Local classifier over parameterized SQL templates for the common question shapes.
+
+    Slots (top N, date range, category, merchant) are pulled out of the question
+    first; category and merchant phrases are resolved against the distinct
+    values in the fuzzy value index, so only real column values ever reach the
+    SQL. Every template whose required words are present is then scored by the
+    share of the question's words it accounts for (vocabulary, filler, the spans
+    of the slots it accepts). A question with words no template explains (a
+    negation, an extra condition, "average", ...) scores below
+    INTENT_MIN_CONFIDENCE and is left to the LLM pipeline.
+    """
+
+    def __init__(self, intents=INTENTS, index=value_index, min_confidence=None):
+        self.intents = intents
+        self.index = index
+        self.min_confidence = INTENT_MIN_CONFIDENCE if min_confidence is None else min_confidence
+
+    def _value_slots(self, text, tokens, taken, slots):
+        """Fuzzy-match runs of non-template words against category/merchant values."""
+        entries = {slot: self.index.get(table, column) for slot, (table, column) in SLOT_COLUMNS.items()}
+        candidates = []
+        for size in (3, 2, 1):
+            for i in range(len(tokens) - size + 1):
+                window = tokens[i:i + size]
+                if any(t[0] in _TEMPLATE_WORDS or taken(t) for t in window):
+                    continue
+                span = (window[0][1], window[-1][2])
+                phrase = utils.default_process(text[span[0]:span[1]])
+                if len(phrase) < 3:
+                    continue
+                for slot, entry in entries.items():
+                    best = process.extractOne(phrase, entry.processed, scorer=fuzz.ratio,
+                                              score_cutoff=INTENT_SLOT_MIN_SCORE)
+                    if best is not None:
+                        candidates.append((size, best[1], slot, entry.values[best[2]], span))
+
+        used = []
+        # Longest, then closest phrase first; a slot takes a single value
+        for size, score, slot, value, span in sorted(candidates, key=lambda c: (-c[0], -c[1])):
+            if slot in slots.values or any(s < span[1] and span[0] < e for s, e in used):
+                continue
+            # "the Food category" / "the Amazon store": the noun belongs to the value
+            following = re.match(r"\s+(?:category|merchant|store|shop)\b", text[span[1]:])
+            if following:
+                span = (span[0], span[1] + following.end())
+            slots.add(slot, value, span)
+            used.append(span)
+
+    def extract_slots(self, text: str, tokens, today: date) -> ExtractedSlots:
+        """Slots of a normalized question; `tokens` are its (word, start, end) triples."""
+        slots = ExtractedSlots()
+
+        period, span = _extract_period(text, today)
+        if period is not None:
+            slots.add('period', period, span)
+        m = _TOP_N_RE.search(text)
+        if m:
+            group = 1 if m.group(1) else 2
+            slots.add('n', int(m.group(group)), m.span(group))
+
+        def taken(token):
+            return any(s <= token[1] and token[2] <= e for s, e in slots.spans.values())
+
+        self._value_slots(text, tokens, taken, slots)
+        return slots
+
+    def _score(self, intent, tokens, slots) -> float:
+        spans = [slots.spans[name] for name in slots.values if name in intent.slots]
+        explained = 0
+        for word, start, end in tokens:
+            if word in _VETO:
+                return 0.0
+            if word in _FILLER or word in intent.vocabulary or any(s <= start and end <= e for s, e in spans):
+                explained += 1
+        return explained / len(tokens) if tokens else 0.0
+
+    def classify(self, question: str, today: date = None) -> IntentMatch:
+        text = normalize_question(question)
+        today = today or date.today()
+        candidates = [i for i in self.intents if i.applies(text)]
+        if not candidates:
+            return IntentMatch()
+
+        tokens = [(m.group(0), m.start(), m.end()) for m in re.finditer(r"[a-z0-9]+(?:-[0-9]+)*", text)]
+        slots = self.extract_slots(text, tokens, today)
+        scored = sorted(((self._score(i, tokens, slots), n, i) for n, i in enumerate(candidates)),
+                        key=lambda s: (-s[0], s[1]))
+        confidence, _, intent = scored[0]
+        accepted = {k: v for k, v in slots.values.items() if k in intent.slots}
+        if confidence < self.min_confidence:
+            return IntentMatch(intent.name, confidence, slots.to_dict(), outcome="low_confidence")
+        if len(scored) > 1 and scored[1][0] == confidence:
+            # Two templates explain the question equally well
+            return IntentMatch(intent.name, confidence, slots.to_dict(), outcome="ambiguous")
+
+        params = {**accepted, 'today': today}
+        sql = intent.render(params, text)
+        if sql is None:
+            return IntentMatch(intent.name, confidence, slots.to_dict(), outcome="unsupported")
+        # Defaults filled in by the template (e.g. the budget month) are reported too
+        used = {k: (v.to_dict() if isinstance(v, Period) else v) for k, v in params.items() if k != 'today'}
+        return IntentMatch(intent.name, confidence, used, sql, outcome="matched")
+
+
+intent_library = IntentLibrary()
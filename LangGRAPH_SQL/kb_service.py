@@ -0,0 +1,167 @@
+import os
+import sys
+import json
+import time
+import pickle
+import hashlib
+import logging
+import threading
+from types import MappingProxyType
+from collections.abc import Mapping
+
+logger = logging.getLogger(__name__)
+
+CURRENT_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_KB_PATH = os.path.join(CURRENT_DIR, 'kb.pkl')
+
+# Version tag written into kb.json; bump when the layout changes
+KB_JSON_FORMAT_VERSION = 1
+
+
+def _freeze(value):
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+class KnowledgeBase(Mapping):
+    """
+    Immutable snapshot of the knowledge base.
+
+    Behaves like the original `{table: [description, [[column text], ...]]}` dict
+    (lists become tuples), and pre-computes the string forms that go into prompts
+    so they are built once per KB version rather than once per request.
+    """
+
+    def __init__(self, raw: dict, version: str, source: str):
+        self._tables = _freeze(raw)
+        self.version = version
+        self.source = source
+        # str() of the original (list-based) objects, so prompts are byte-identical
+        self.schema_text = str(raw)
+        self._column_text = {t: str(v[1]) if len(v) > 1 else '[]' for t, v in raw.items()}
+        self._table_items = {t: f"{t!r}: {v!r}" for t, v in raw.items()}
+
+    def __getitem__(self, table_name):
+        return self._tables[table_name]
+
+    def __iter__(self):
+        return iter(self._tables)
+
+    def __len__(self):
+        return len(self._tables)
+
+    def description(self, table_name: str) -> str:
+        return self._tables[table_name][0]
+
+    def column_text(self, table_name: str) -> str:
+        """Column descriptions of a table as sent to the column selector."""
+        return self._column_text[table_name]
+
+    def schema_text_for(self, tables) -> str:
+        """`schema_text` restricted to `tables` (same formatting, KB order)."""
+        wanted = set(tables)
+        return "{" + ", ".join(item for t, item in self._table_items.items() if t in wanted) + "}"
+
+    def table_descriptions(self, tables) -> dict:
+        return {t: self._tables[t][0] for t in tables}
+
+    def to_dict(self) -> dict:
+        """Plain, mutable copy in the original list-based layout."""
+        return {t: [v[0], [list(c) for c in v[1]]] if len(v) > 1 else list(v) for t, v in self._tables.items()}
+
+
+def _read_raw(path: str):
+    with open(path, 'rb') as f:
+        data = f.read()
+    if path.endswith('.json'):
+        payload = json.loads(data)
+        if payload.get("format_version") != KB_JSON_FORMAT_VERSION:
+            raise ValueError(f"Unsupported kb.json format_version: {payload.get('format_version')}")
+        raw = payload["tables"]
+    else:
+        raw = pickle.loads(data)
+    return raw, hashlib.sha256(data).hexdigest()
+
+
+def save_json(kb, path: str):
+    """Write a knowledge base (dict or KnowledgeBase) in the versioned JSON format."""
+    tables = kb.to_dict() if isinstance(kb, KnowledgeBase) else kb
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({"format_version": KB_JSON_FORMAT_VERSION, "tables": tables}, f, ensure_ascii=False, indent=1)
+    os.replace(tmp_path, path)
+
+
+class KnowledgeBaseService:
+    """
+    Loads the knowledge base once and hands the same immutable snapshot to every node.
+
+    The file is re-stat'ed at most every `check_interval` seconds; when its
+    size/mtime change its content hash is compared and, if different, a new
+    snapshot is loaded without restarting the process. A failed reload (e.g. a
+    half-written file) keeps serving the previous snapshot.
+    """
+
+    def __init__(self, path: str = None, check_interval: float = 1.0):
+        self.path = path or os.environ.get("KB_PATH", DEFAULT_KB_PATH)
+        self.check_interval = check_interval
+        self._lock = threading.Lock()
+        self._kb = None
+        self._stamp = None
+        self._last_check = 0.0
+
+    def _load(self, stamp):
+        raw, digest = _read_raw(self.path)
+        if self._kb is not None and digest == self._kb.version:
+            self._stamp = stamp
+            return
+        self._kb = KnowledgeBase(raw, digest, self.path)
+        self._stamp = stamp
+        logger.info("Successfully loaded knowledge base from %s (version %s, %d tables)", self.path, digest[:12], len(raw))
+
+    def get(self) -> KnowledgeBase:
+        now = time.monotonic()
+        if self._kb is not None and now - self._last_check < self.check_interval:
+            return self._kb
+        with self._lock:
+            self._last_check = now
+            try:
+                st = os.stat(self.path)
+            except FileNotFoundError:
+                if self._kb is not None:
+                    logger.error("Knowledge base file disappeared from '%s'; keeping loaded version", self.path)
+                    return self._kb
+                raise FileNotFoundError(
+                    f"CRITICAL: Knowledge Base file not found at '{self.path}'.\n"
+                    f"Please ensure 'kb.pkl' exists in the LangGRAPH_SQL directory.\n"
+                    f"This file contains the database schema metadata required for SQL generation."
+                )
+            stamp = (st.st_size, st.st_mtime_ns)
+            if stamp != self._stamp:
+                try:
+                    self._load(stamp)
+                except Exception as e:
+                    if self._kb is not None:
+                        logger.error("Failed to reload knowledge base, keeping previous version: %s", e)
+                        return self._kb
+                    raise RuntimeError(
+                        f"CRITICAL: Failed to load knowledge base from '{self.path}'.\n"
+                        f"Error: {str(e)}\n"
+                        f"The file may be corrupted. Try regenerating kb.pkl."
+                    )
+            return self._kb
+
+
+# Shared service instance used by every node
+kb_service = KnowledgeBaseService()
+
+
+if __name__ == "__main__":
+    # Convert the pickle knowledge base to the versioned JSON format:
+    #   python -m LangGRAPH_SQL.kb_service [output_path]
+    out_path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(CURRENT_DIR, 'kb.json')
+    save_json(kb_service.get(), out_path)
+    print(f"Knowledge base written to {out_path}. Set KB_PATH={out_path} to load it.")
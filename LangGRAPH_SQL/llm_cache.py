@@ -0,0 +1,266 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import logging
+import threading
+
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+
+from LangGRAPH_SQL.rate_limiter_utils import rate_limiter, estimate_tokens
+from LangGRAPH_SQL.async_utils import run_blocking
+from LangGRAPH_SQL.metrics import metrics, LLM_CALLS, LLM_LATENCY, LLM_PROMPT_TOKENS, LLM_COMPLETION_TOKENS
+
+logger = logging.getLogger(__name__)
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_DIR = os.path.join(PROJECT_ROOT, '.cache')
+
+# Emit a hit-rate summary to the logs every N lookups
+STATS_LOG_INTERVAL = 20
+
+
+class LLMResponseCache:
+    """
+    Content-addressed, on-disk cache of LLM completions.
+
+    Keys are SHA-256 hashes of (model, temperature, rendered prompt). Storage is a
+    WAL-mode SQLite file, so several uvicorn worker processes can share it safely.
+    Total stored size is bounded by `max_bytes`; least recently used entries are
+    evicted first.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 256 * 1024 * 1024, enabled: bool = True, bypass=()):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.enabled = enabled
+        self.bypass = set(bypass)
+        self._lock = threading.Lock()
+        self._conn = None
+        self._stats = {}
+        self._lookups = 0
+        self._puts_since_evict = 0
+
+    def _connection(self):
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    chain TEXT NOT NULL,
+                    model TEXT NOT NULL,
+                    response TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_responses_last_access ON responses(last_access)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    @staticmethod
+    def make_key(prompt_text: str, model_name: str, temperature) -> str:
+        payload = json.dumps([model_name, temperature, prompt_text], ensure_ascii=False)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def is_active(self, chain_name: str) -> bool:
+        return self.enabled and chain_name not in self.bypass
+
+    def set_bypass(self, chain_name: str, bypass: bool = True):
+        """Turn caching off (or back on) for a single chain at runtime."""
+        if bypass:
+            self.bypass.add(chain_name)
+        else:
+            self.bypass.discard(chain_name)
+
+    def _record(self, chain_name: str, hit: bool):
+        stats = self._stats.setdefault(chain_name, {"hits": 0, "misses": 0})
+        stats["hits" if hit else "misses"] += 1
+        self._lookups += 1
+        if self._lookups % STATS_LOG_INTERVAL == 0:
+            self.log_stats()
+
+    def get(self, key: str, chain_name: str):
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+            if row is not None:
+                conn.execute("UPDATE responses SET last_access = ? WHERE key = ?", (time.time(), key))
+                conn.commit()
+            self._record(chain_name, row is not None)
+        return row[0] if row else None
+
+    def put(self, key: str, chain_name: str, model_name: str, response: str):
+        size = len(response.encode('utf-8'))
+        with self._lock:
+            conn = self._connection()
+            now = time.time()
+            conn.execute(
+                "INSERT OR REPLACE INTO responses (key, chain, model, response, size, created_at, last_access) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (key, chain_name, model_name, response, size, now, now)
+            )
+            conn.commit()
+            self._puts_since_evict += 1
+            if self._puts_since_evict >= 50:
+                self._evict(conn)
+
+    def _evict(self, conn):
+        """Drop least recently used entries until the cache fits in `max_bytes`."""
+        self._puts_since_evict = 0
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        freed, victims = 0, []
+        for key, size in conn.execute("SELECT key, size FROM responses ORDER BY last_access"):
+            victims.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        conn.executemany("DELETE FROM responses WHERE key = ?", victims)
+        conn.commit()
+        logger.info("LLM cache: evicted %s entries (%s bytes)", len(victims), freed)
+
+    def stats(self) -> dict:
+        with self._lock:
+            result = {}
+            for chain_name, s in self._stats.items():
+                total = s["hits"] + s["misses"]
+                result[chain_name] = dict(s, hit_rate=s["hits"] / total if total else 0.0)
+            return result
+
+    def log_stats(self):
+        for chain_name, s in sorted(self._stats.items()):
+            total = s["hits"] + s["misses"]
+            logger.info("LLM cache [%s]: %d/%d hits (%.0f%%)",
+                        chain_name, s["hits"], total, 100 * s["hits"] / total if total else 0.0)
+
+
+def _model_identity(model):
+    name = getattr(model, 'model', None) or getattr(model, 'model_name', None) or type(model).__name__
+    return str(name).replace('models/', ''), getattr(model, 'temperature', None)
+
+
+def _model_mode(model) -> str:
+    """LLM_MODE a chain's model runs in (its own `mode`, else the environment's)."""
+    return str(getattr(model, 'mode', None) or os.environ.get("LLM_MODE", "live")).lower()
+
+
+def _token_usage(prompt_text: str, message):
+    """(prompt, completion) tokens reported by the provider, else a ~4 chars/token estimate (fake/replay modes)."""
+    usage = getattr(message, 'usage_metadata', None) or {}
+    prompt_tokens = usage.get('input_tokens')
+    completion_tokens = usage.get('output_tokens')
+    if prompt_tokens is None:
+        prompt_tokens = len(prompt_text) // 4
+    if completion_tokens is None:
+        completion_tokens = len(str(message.content)) // 4
+    return prompt_tokens, completion_tokens
+
+
+def cached_model(model, chain_name: str):
+    """
+    Wrap a chat model so a chain's LLM step goes through the response cache.
+
+    Drop-in replacement for `model` inside a `prompt | model | parser` chain.
+    On a miss the shared rate limiter is consulted before calling the provider;
+    cache hits cost neither quota nor network time. Calls, latency and token
+    counts are recorded per chain in the metrics registry.
+
+    Models in `record` or `replay` mode skip the cache: a hit would keep the
+    prompt from reaching the cassette, and a recording made with a warm cache
+    would then fail to replay. The mode is checked on every call, so switching
+    it after the chain is built takes effect.
+    """
+    ok_calls, failed_calls, cache_calls = (LLM_CALLS.labels(chain_name, outcome) for outcome in ("ok", "error", "cache"))
+    latency = LLM_LATENCY.labels(chain_name)
+    prompt_tokens, completion_tokens = LLM_PROMPT_TOKENS.labels(chain_name), LLM_COMPLETION_TOKENS.labels(chain_name)
+
+    def _record_call(prompt_text, message, elapsed):
+        ok_calls.inc()
+        latency.observe(elapsed)
+        sent, received = _token_usage(prompt_text, message)
+        prompt_tokens.inc(sent)
+        completion_tokens.inc(received)
+
+    def _prepare(prompt):
+        model_name, temperature = _model_identity(model)
+        prompt_text = prompt.to_string()
+        return model_name, prompt_text, llm_cache.make_key(prompt_text, model_name, temperature)
+
+    def _cache_active():
+        return _model_mode(model) not in ("record", "replay") and llm_cache.is_active(chain_name)
+
+    def _invoke(prompt, config):
+        model_name, prompt_text, key = _prepare(prompt)
+        active = _cache_active()
+        if active:
+            cached = llm_cache.get(key, chain_name)
+            if cached is not None:
+                cache_calls.inc()
+                return AIMessage(content=cached)
+        rate_limiter.acquire(estimate_tokens(prompt_text), model=model_name)
+        start = time.perf_counter()
+        try:
+            message = model.invoke(prompt, config)
+        except Exception:
+            failed_calls.inc()
+            raise
+        _record_call(prompt_text, message, time.perf_counter() - start)
+        if active and isinstance(message.content, str):
+            llm_cache.put(key, chain_name, model_name, message.content)
+        return message
+
+    async def _ainvoke(prompt, config):
+        model_name, prompt_text, key = _prepare(prompt)
+        active = _cache_active()
+        if active:
+            # SQLite I/O under the cache lock: keep it off the event loop
+            cached = await run_blocking(llm_cache.get, key, chain_name)
+            if cached is not None:
+                cache_calls.inc()
+                return AIMessage(content=cached)
+        await rate_limiter.aacquire(estimate_tokens(prompt_text), model=model_name)
+        start = time.perf_counter()
+        try:
+            message = await model.ainvoke(prompt, config)
+        except Exception:
+            failed_calls.inc()
+            raise
+        _record_call(prompt_text, message, time.perf_counter() - start)
+        if active and isinstance(message.content, str):
+            await run_blocking(llm_cache.put, key, chain_name, model_name, message.content)
+        return message
+
+    return RunnableLambda(_invoke, afunc=_ainvoke, name=f"{chain_name}_model")
+
+
+llm_cache = LLMResponseCache(
+    path=os.environ.get("LLM_CACHE_PATH", os.path.join(CACHE_DIR, 'llm_cache.sqlite')),
+    max_bytes=int(os.environ.get("LLM_CACHE_MAX_BYTES", 256 * 1024 * 1024)),
+    enabled=os.environ.get("LLM_CACHE_ENABLED", "1") not in ("0", "false", "False"),
+    bypass=[c.strip() for c in os.environ.get("LLM_CACHE_BYPASS", "").split(",") if c.strip()],
+)
+
+
+def _collect_cache_stats():
+    samples = llm_cache.stats()
+    return [
+        ("llm_cache_hits_total", "counter", "LLM response cache hits per chain",
+         [({"chain": chain}, s["hits"]) for chain, s in sorted(samples.items())]),
+        ("llm_cache_misses_total", "counter", "LLM response cache misses per chain",
+         [({"chain": chain}, s["misses"]) for chain, s in sorted(samples.items())]),
+        ("llm_cache_hit_ratio", "gauge", "LLM response cache hit ratio per chain",
+         [({"chain": chain}, s["hit_rate"]) for chain, s in sorted(samples.items())]),
+    ]
+
+
+metrics.register_collector(_collect_cache_stats)
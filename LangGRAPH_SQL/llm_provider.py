@@ -0,0 +1,345 @@
+import os
+import json
+import math
+import time
+import random
+import asyncio
+import logging
+import threading
+from typing import Any, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, BaseMessage, get_buffer_string
+from langchain_core.outputs import ChatGeneration, ChatResult
+from langchain_core.runnables import Runnable
+
+from LangGRAPH_SQL.llm_cache import LLMResponseCache, CACHE_DIR
+
+logger = logging.getLogger(__name__)
+
+# live   - call the provider (Gemini)
+# record - call the provider and append every prompt->response pair to the cassette
+# replay - answer from the cassette only; no network, no API key
+# fake   - canned responses with synthetic latency
+LLM_MODE = os.environ.get("LLM_MODE", "live").lower()
+LLM_CASSETTE_PATH = os.environ.get("LLM_CASSETTE_PATH", os.path.join(CACHE_DIR, 'llm_cassette.jsonl'))
+# What replay does with a prompt that is not in the cassette: "error" or "fake"
+LLM_REPLAY_MISS = os.environ.get("LLM_REPLAY_MISS", "error").lower()
+# Sleep for the latency measured while recording (otherwise replay is instant)
+LLM_REPLAY_LATENCY = os.environ.get("LLM_REPLAY_LATENCY", "0") not in ("0", "false", "False")
+# Fake-model latency: "0.8", "uniform:0.3,1.5", "normal:0.8,0.2" or "lognormal:0.8,0.5" (median, sigma)
+LLM_FAKE_LATENCY = os.environ.get("LLM_FAKE_LATENCY", "0")
+LLM_FAKE_SEED = os.environ.get("LLM_FAKE_SEED")
+# Optional JSON file of [{"match": "<prompt substring>", "response": "..."}], checked before the defaults
+LLM_FAKE_RESPONSES = os.environ.get("LLM_FAKE_RESPONSES")
+
+MODES = ("live", "record", "replay", "fake")
+
+# Canned answers for the prompts in this repo, matched by a phrase from each system prompt
+DEFAULT_FAKE_RESPONSES = [
+    ("intelligent router", "['orders']"),
+    ("subquestion generator", '[["total spend per merchant", "transactions"]]'),
+    ("schema selector", '[["total spend per merchant", "transactions", [["merchant", "Merchant name, TEXT"], '
+                        '["amount", "Transaction amount, DECIMAL"], ["category", "Spending category, TEXT"]]]]'),
+    ("data column selector", '[["merchant", "Merchant name, TEXT"], ["amount", "Transaction amount, DECIMAL"], '
+                             '["category", "Spending category, TEXT"]]'),
+    ("determine whether filters", '["no"]'),
+    ("SQLite query generator", "```sql\nSELECT merchant, SUM(amount) AS total FROM transactions "
+                               "WHERE category != 'Income' GROUP BY merchant ORDER BY total DESC LIMIT 5;\n```"),
+    ("SQLite query validator", "```sql\nSELECT merchant, SUM(amount) AS total FROM transactions "
+                               "WHERE category != 'Income' GROUP BY merchant ORDER BY total DESC LIMIT 5;\n```"),
+    ("data annotator", '["Synthetic table description", [["column: synthetic description, TEXT, sample"]]]'),
+]
+# CrewAI agents parse ReAct-style output, so the fallback is a final answer
+FAKE_FALLBACK_RESPONSE = "Thought: I now know the final answer\nFinal Answer: Synthetic response (LLM_MODE=fake)."
+
+
+def parse_latency(spec: str):
+    """Turn a latency spec into a `sampler(rng) -> seconds` function."""
+    spec = (spec or "0").strip()
+    kind, _, args = spec.partition(':')
+    try:
+        if not args:
+            value = float(kind)
+            return lambda rng: value
+        params = [float(p) for p in args.split(',')]
+        if kind == "uniform":
+            return lambda rng: rng.uniform(params[0], params[1])
+        if kind == "normal":
+            return lambda rng: max(0.0, rng.gauss(params[0], params[1]))
+        if kind == "lognormal":
+            mu = math.log(params[0])
+            return lambda rng: rng.lognormvariate(mu, params[1])
+    except (ValueError, IndexError):
+        pass
+    raise ValueError(f"Invalid LLM_FAKE_LATENCY '{spec}'. Use '<seconds>', 'uniform:a,b', "
+                     f"'normal:mean,sd' or 'lognormal:median,sigma'")
+
+
+class Cassette:
+    """
+    Append-only JSONL file of recorded prompt->response pairs.
+
+    Entries are keyed like the LLM response cache (model, temperature, rendered
+    prompt), so a cassette recorded from one run replays exactly for the same
+    questions, KB and prompts. The last recording of a key wins.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._entries = None
+
+    def _load(self):
+        if self._entries is None:
+            entries = {}
+            if os.path.exists(self.path):
+                with open(self.path, encoding='utf-8') as f:
+                    for line in f:
+                        if line.strip():
+                            entry = json.loads(line)
+                            entries[entry["key"]] = entry
+            self._entries = entries
+            logger.info("LLM cassette %s: %d recorded responses", self.path, len(entries))
+        return self._entries
+
+    def get(self, key: str):
+        with self._lock:
+            return self._load().get(key)
+
+    def append(self, entry: dict):
+        with self._lock:
+            self._load()[entry["key"]] = entry
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+
+    def __len__(self):
+        with self._lock:
+            return len(self._load())
+
+
+class FakeResponder:
+    """Canned responses chosen by prompt substring, with sampled latency."""
+
+    def __init__(self, latency: str = LLM_FAKE_LATENCY, seed=LLM_FAKE_SEED, responses_path: str = LLM_FAKE_RESPONSES):
+        self.sample_latency = parse_latency(latency)
+        self._rng = random.Random(None if seed is None else int(seed))
+        self._lock = threading.Lock()
+        self.rules = list(DEFAULT_FAKE_RESPONSES)
+        if responses_path:
+            with open(responses_path, encoding='utf-8') as f:
+                self.rules = [(r["match"], r["response"]) for r in json.load(f)] + self.rules
+
+    def respond(self, prompt_text: str) -> str:
+        for match, response in self.rules:
+            if match in prompt_text:
+                return response
+        return FAKE_FALLBACK_RESPONSE
+
+    def latency(self) -> float:
+        with self._lock:
+            return self.sample_latency(self._rng)
+
+
+cassette = Cassette(LLM_CASSETTE_PATH)
+fake_responder = FakeResponder()
+
+
+class _Offline:
+    """Mode dispatch shared by the LangChain and CrewAI wrappers."""
+
+    def __init__(self, mode: str, model: str, temperature):
+        self.mode = mode
+        self.model = model
+        self.temperature = temperature
+
+    def key(self, prompt_text: str) -> str:
+        return LLMResponseCache.make_key(prompt_text, self.model, self.temperature)
+
+    def lookup(self, prompt_text: str):
+        """`(response, delay)` for replay/fake modes."""
+        if self.mode == "replay":
+            entry = cassette.get(self.key(prompt_text))
+            if entry is not None:
+                return entry["response"], entry.get("latency", 0.0) if LLM_REPLAY_LATENCY else 0.0
+            if LLM_REPLAY_MISS != "fake":
+                raise KeyError(
+                    f"CRITICAL: No recorded response for this prompt in {cassette.path} "
+                    f"(model={self.model}). Record it with LLM_MODE=record or set LLM_REPLAY_MISS=fake."
+                )
+            logger.warning("LLM replay miss for %s; answering with the fake model", self.model)
+        return fake_responder.respond(prompt_text), fake_responder.latency()
+
+    def record(self, prompt_text: str, response: str, latency: float):
+        cassette.append({"key": self.key(prompt_text), "model": self.model, "temperature": self.temperature,
+                         "prompt": prompt_text, "response": response, "latency": round(latency, 4),
+                         "recorded_at": time.time()})
+
+
+class OfflineChatModel(BaseChatModel):
+    """
+    LangChain chat model for the record / replay / fake modes.
+
+    In record mode it wraps the live model and writes each exchange to the
+    cassette; otherwise it never touches the network. `model` and `temperature`
+    mirror the live model so cache and cassette keys are identical across modes.
+    """
+
+    model: str
+    temperature: Optional[float] = None
+    mode: str = "fake"
+    live: Any = None
+
+    @property
+    def _llm_type(self) -> str:
+        return f"offline-{self.mode}"
+
+    def _offline(self) -> _Offline:
+        return _Offline(self.mode, self.model, self.temperature)
+
+    def _generate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs) -> ChatResult:
+        prompt_text = get_buffer_string(messages)
+        if self.mode == "record":
+            start = time.perf_counter()
+            message = self.live.invoke(messages, stop=stop, **kwargs)
+            self._offline().record(prompt_text, message.content, time.perf_counter() - start)
+            return ChatResult(generations=[ChatGeneration(message=message)])
+        response, delay = self._offline().lookup(prompt_text)
+        if delay > 0:
+            time.sleep(delay)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=response))])
+
+    async def _agenerate(self, messages: List[BaseMessage], stop=None, run_manager=None, **kwargs) -> ChatResult:
+        prompt_text = get_buffer_string(messages)
+        if self.mode == "record":
+            start = time.perf_counter()
+            message = await self.live.ainvoke(messages, stop=stop, **kwargs)
+            self._offline().record(prompt_text, message.content, time.perf_counter() - start)
+            return ChatResult(generations=[ChatGeneration(message=message)])
+        response, delay = self._offline().lookup(prompt_text)
+        if delay > 0:
+            await asyncio.sleep(delay)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=response))])
+
+
+def _check_mode(mode: str) -> str:
+    mode = (mode or LLM_MODE).lower()
+    if mode not in MODES:
+        raise ValueError(f"Invalid LLM_MODE '{mode}'. Choose one of {MODES}")
+    return mode
+
+
+def get_chat_model(model: str = 'gemini-2.5-flash', temperature: float = 0, mode: str = None, **kwargs):
+    """
+    Chat model for a chain, according to LLM_MODE. `live` returns the plain
+    ChatGoogleGenerativeAI; the other modes return an OfflineChatModel.
+    """
+    mode = _check_mode(mode)
+    live = None
+    if mode in ("live", "record"):
+        from langchain_google_genai import ChatGoogleGenerativeAI
+        live = ChatGoogleGenerativeAI(temperature=temperature, model=model, **kwargs)
+        if mode == "live":
+            return live
+    return OfflineChatModel(model=model, temperature=temperature, mode=mode, live=live)
+
+
+class LazyChatModel(Runnable):
+    """
+    Chat model built by `get_chat_model` on first use rather than at import,
+    so importing a chain module does not load the provider SDK (~1.5s for
+    langchain_google_genai) or need an API key. `model` and `temperature` are
+    known up front, so cache and cassette keys do not depend on it being built.
+    """
+
+    def __init__(self, model: str, temperature: float, mode: str = None, **kwargs):
+        self.model = model
+        self.temperature = temperature
+        self._mode = mode
+        self._kwargs = kwargs
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def mode(self) -> str:
+        return _check_mode(self._mode)
+
+    def get(self):
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = get_chat_model(model=self.model, temperature=self.temperature,
+                                                  mode=self._mode, **self._kwargs)
+        return self._client
+
+    def invoke(self, input, config=None, **kwargs):
+        return self.get().invoke(input, config, **kwargs)
+
+    async def ainvoke(self, input, config=None, **kwargs):
+        return await self.get().ainvoke(input, config, **kwargs)
+
+    def stream(self, input, config=None, **kwargs):
+        return self.get().stream(input, config, **kwargs)
+
+    def astream(self, input, config=None, **kwargs):
+        return self.get().astream(input, config, **kwargs)
+
+
+_lazy_models = []
+
+
+def lazy_chat_model(model: str = 'gemini-2.5-flash', temperature: float = 0, mode: str = None, **kwargs) -> LazyChatModel:
+    """`get_chat_model` deferred to the first call; `warm_up_models` builds them all ahead of time."""
+    lazy = LazyChatModel(model, temperature, mode, **kwargs)
+    _lazy_models.append(lazy)
+    return lazy
+
+
+def warm_up_models():
+    for lazy in _lazy_models:
+        lazy.get()
+
+
+_crew_llm_class = None
+
+
+def get_crew_llm(model: str = "gemini/gemini-2.5-flash", temperature: float = 0, mode: str = None, **kwargs):
+    """CrewAI LLM according to LLM_MODE; `live` returns CrewAI's native (LiteLLM) `LLM`."""
+    global _crew_llm_class
+    mode = _check_mode(mode)
+    from crewai import LLM, BaseLLM
+
+    if mode == "live":
+        return LLM(model=model, temperature=temperature, **kwargs)
+
+    if _crew_llm_class is None:
+        class OfflineCrewLLM(BaseLLM):
+            def __init__(self, model, temperature=None, mode="fake", live=None, **kw):
+                super().__init__(model=model, temperature=temperature)
+                self._offline = _Offline(mode, model, temperature)
+                self._live = live
+
+            def call(self, messages, tools=None, callbacks=None, available_functions=None, **kw):
+                if isinstance(messages, str):
+                    prompt_text = messages
+                else:
+                    prompt_text = "\n".join(f"{m.get('role', 'user')}: {m.get('content', '')}" for m in messages)
+                if self._offline.mode == "record":
+                    start = time.perf_counter()
+                    response = self._live.call(messages, tools=tools, callbacks=callbacks,
+                                               available_functions=available_functions, **kw)
+                    self._offline.record(prompt_text, response, time.perf_counter() - start)
+                    return response
+                response, delay = self._offline.lookup(prompt_text)
+                if delay > 0:
+                    time.sleep(delay)
+                return response
+
+            def supports_function_calling(self) -> bool:
+                return False
+
+        _crew_llm_class = OfflineCrewLLM
+
+    live = LLM(model=model, temperature=temperature, **kwargs) if mode == "record" else None
+    return _crew_llm_class(model=model, temperature=temperature, mode=mode, live=live)
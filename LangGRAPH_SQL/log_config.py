@@ -0,0 +1,325 @@
+import os
+import sys
+import json
+import time
+import zlib
+import queue
+import atexit
+import random
+import logging
+import contextvars
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+LOG_DIR = os.environ.get("LOG_DIR", os.path.join(PROJECT_ROOT, "logs"))
+# One JSON-lines file rotated by size. With several worker processes give each
+# its own LOG_FILE (or log to the console only): rotation is per process.
+LOG_FILE = os.environ.get("LOG_FILE", os.path.join(LOG_DIR, "sql_pipeline.jsonl"))
+LOG_MAX_BYTES = int(os.environ.get("LOG_MAX_BYTES", 20 * 1024 * 1024))
+LOG_BACKUP_COUNT = int(os.environ.get("LOG_BACKUP_COUNT", 5))
+# Console output: "text" (human readable), "json" or "off"
+LOG_CONSOLE = os.environ.get("LOG_CONSOLE", "text").lower()
+# Records waiting for the writer thread; when full, new records are dropped (and counted)
+LOG_QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", 10_000))
+# Per-node levels, e.g. "fuzz_filter=DEBUG,safe_executor=WARNING"
+LOG_NODE_LEVELS = os.environ.get("LOG_NODE_LEVELS", "")
+# Fraction of runs whose DEBUG/INFO lines are kept: "0.1", or per node "1.0,filter_check=0.05".
+# Sampling is decided per run_id, so a sampled run keeps all of its lines; warnings are never sampled.
+LOG_SAMPLE_RATE = os.environ.get("LOG_SAMPLE_RATE", "1.0")
+
+TEXT_FORMAT = '%(asctime)s [%(levelname)s] %(message)s'
+TEXT_DATEFMT = '%Y-%m-%d %H:%M:%S'
+
+run_id_var = contextvars.ContextVar("log_run_id", default=None)
+thread_id_var = contextvars.ContextVar("log_thread_id", default=None)
+node_var = contextvars.ContextVar("log_node", default=None)
+
+_CONTEXT_VARS = {"run_id": run_id_var, "thread_id": thread_id_var, "node": node_var}
+_LAZY_ARG_TYPES = (str, int, float, bool, type(None))
+
+
+class log_context:
+    """
+    Bind run_id / thread_id / node to every record logged inside the block,
+    including from LangGraph nodes and `run_blocking` calls (contextvars are
+    copied into their threads and tasks).
+    """
+
+    def __init__(self, **values):
+        unknown = set(values) - set(_CONTEXT_VARS)
+        if unknown:
+            raise TypeError(f"Unknown log context fields: {sorted(unknown)}")
+        self.values = values
+        self._tokens = []
+
+    def __enter__(self):
+        self._tokens = [(_CONTEXT_VARS[k], _CONTEXT_VARS[k].set(v)) for k, v in self.values.items()]
+        return self
+
+    def __exit__(self, *exc):
+        for var, token in reversed(self._tokens):
+            try:
+                var.reset(token)
+            except ValueError:
+                # Exited from another context (e.g. an async generator closed by
+                # a different task); that context never saw the values anyway
+                pass
+        return False
+
+
+def bind_log_context(**values):
+    """
+    Set log context fields without a block to reset them. Only for contexts
+    that end with their task, e.g. one request handled by the ASGI server.
+    """
+    log_context(**values).__enter__()
+
+
+def parse_node_setting(spec: str, convert):
+    """'default,node=value,...' -> (default or None, {node: value})."""
+    default, per_node = None, {}
+    for part in (p.strip() for p in (spec or "").split(",")):
+        if not part:
+            continue
+        if "=" in part:
+            node, value = part.split("=", 1)
+            per_node[node.strip()] = convert(value.strip())
+        else:
+            default = convert(part)
+    return default, per_node
+
+
+def _level(value: str) -> int:
+    level = logging.getLevelName(value.upper())
+    if not isinstance(level, int):
+        raise ValueError(f"Invalid log level '{value}'")
+    return level
+
+
+class ContextFilter(logging.Filter):
+    """
+    Stamps records with the run/thread/node from the log context and applies
+    the per-node level and sampling rules. Runs in the logging thread, before
+    the record is queued, so dropped records cost nothing downstream.
+    """
+
+    def __init__(self, level: int, node_levels=None, sample_rate: float = 1.0, node_rates=None):
+        super().__init__()
+        self.level = level
+        self.node_levels = node_levels or {}
+        self.sample_rate = sample_rate
+        self.node_rates = node_rates or {}
+        self.sampled_out = 0
+
+    @staticmethod
+    def _in_sample(run_id, rate: float) -> bool:
+        if run_id is None:
+            return random.random() < rate
+        return (zlib.crc32(run_id.encode()) & 0xFFFF) < rate * 0x10000
+
+    def filter(self, record):
+        node = node_var.get()
+        record.run_id = run_id_var.get()
+        record.thread_id = thread_id_var.get()
+        record.node = node
+        if record.levelno < self.node_levels.get(node, self.level):
+            return False
+        if record.levelno < logging.WARNING:
+            rate = self.node_rates.get(node, self.sample_rate)
+            if rate < 1.0 and not self._in_sample(record.run_id, rate):
+                self.sampled_out += 1
+                return False
+        return True
+
+
+class LazyQueueHandler(QueueHandler):
+    """
+    QueueHandler that leaves message formatting to the writer thread when it
+    is safe to: %-style arguments that are immutable scalars are formatted
+    later, anything else (dicts, lists, state objects) is formatted now so the
+    line reflects the value at logging time. Never blocks; a full queue drops
+    the record and counts it.
+    """
+
+    def __init__(self, q):
+        super().__init__(q)
+        self.dropped = 0
+
+    def prepare(self, record):
+        # This handler sits on the root logger, the last stop for a record, so
+        # the record can be prepared in place instead of copied
+        if record.args and not (isinstance(record.args, tuple)
+                                and all(isinstance(a, _LAZY_ARG_TYPES) for a in record.args)):
+            record.msg = record.getMessage()
+            record.args = None
+        if record.exc_info:
+            # Tracebacks hold frames; render them while they are still accurate
+            record.exc_text = record.exc_text or logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: ts, level, logger, msg, run_id, thread_id, node, exc."""
+
+    def format(self, record):
+        entry = {
+            "ts": time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(record.created)) + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key in ("run_id", "thread_id", "node"):
+            value = getattr(record, key, None)
+            if value is not None:
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _StreamHandler(logging.StreamHandler):
+    """StreamHandler without the flush after every record; the listener flushes when idle."""
+
+    def emit(self, record):
+        try:
+            self.stream.write(self.format(record) + self.terminator)
+        except Exception:
+            self.handleError(record)
+
+
+class _RotatingFileHandler(RotatingFileHandler):
+    """
+    Size-rotated file that tracks its own size. The base class formats every
+    record twice and stats the file to decide whether to roll over.
+    """
+
+    def _open(self):
+        stream = super()._open()
+        self._size = os.path.getsize(self.baseFilename)
+        return stream
+
+    def emit(self, record):
+        try:
+            line = self.format(record) + self.terminator
+            if self.stream is None:
+                self.stream = self._open()
+            if self.maxBytes > 0 and self._size + len(line) > self.maxBytes and self._size > 0:
+                self.doRollover()
+            self.stream.write(line)
+            self._size += len(line)
+        except Exception:
+            self.handleError(record)
+
+
+class _BatchingListener(QueueListener):
+    """QueueListener that flushes its handlers once the queue runs dry rather than per record."""
+
+    def dequeue(self, block):
+        if block and self.queue.empty():
+            for handler in self.handlers:
+                handler.flush()
+        return self.queue.get(block)
+
+
+_listener = None
+_queue_handler = None
+_context_filter = None
+_collector_registered = False
+
+
+def configure_logging(force: bool = False):
+    """
+    Route all logging through a bounded queue to a background writer thread
+    (rotating JSON file + console). Idempotent; `force` rebuilds the handlers
+    (used by benchmarks after changing the settings).
+    """
+    global _listener, _queue_handler, _context_filter, _collector_registered
+    if _listener is not None:
+        if not force:
+            return
+        shutdown_logging()
+
+    level = _level(LOG_LEVEL)
+    default_node_level, node_levels = parse_node_setting(LOG_NODE_LEVELS, _level)
+    sample_rate, node_rates = parse_node_setting(LOG_SAMPLE_RATE, float)
+    if default_node_level is not None:
+        level = default_node_level
+
+    handlers = []
+    if LOG_FILE:
+        os.makedirs(os.path.dirname(os.path.abspath(LOG_FILE)), exist_ok=True)
+        file_handler = _RotatingFileHandler(LOG_FILE, maxBytes=LOG_MAX_BYTES, backupCount=LOG_BACKUP_COUNT,
+                                           encoding='utf-8', delay=True)
+        file_handler.setFormatter(JsonFormatter())
+        handlers.append(file_handler)
+    if LOG_CONSOLE != "off":
+        console = _StreamHandler(sys.stderr)
+        console.setFormatter(JsonFormatter() if LOG_CONSOLE == "json" else logging.Formatter(TEXT_FORMAT, TEXT_DATEFMT))
+        handlers.append(console)
+
+    _context_filter = ContextFilter(level, node_levels, 1.0 if sample_rate is None else sample_rate, node_rates)
+    _queue_handler = LazyQueueHandler(queue.Queue(LOG_QUEUE_SIZE))
+    _queue_handler.addFilter(_context_filter)
+
+    # Neither format uses caller, process or task fields: skip collecting them
+    # for every record (see "Optimization" in the logging HOWTO)
+    logging._srcfile = None
+    logging.logProcesses = False
+    logging.logMultiprocessing = False
+    logging.logAsyncioTasks = False
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_queue_handler)
+    # Loggers must let through the most verbose level any node asks for;
+    # ContextFilter applies the real per-node threshold
+    root.setLevel(min([level, *node_levels.values()]))
+
+    _listener = _BatchingListener(_queue_handler.queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(shutdown_logging)
+
+    if not _collector_registered:
+        from LangGRAPH_SQL.metrics import metrics
+        metrics.register_collector(_collect_logging_stats)
+        _collector_registered = True
+
+
+def shutdown_logging():
+    """Flush the queue and stop the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        for handler in _listener.handlers:
+            handler.close()
+        logging.getLogger().removeHandler(_queue_handler)
+        _listener = None
+
+
+def logging_stats() -> dict:
+    if _queue_handler is None:
+        return {"queued": 0, "dropped": 0, "sampled_out": 0}
+    return {"queued": _queue_handler.queue.qsize(), "dropped": _queue_handler.dropped,
+            "sampled_out": _context_filter.sampled_out}
+
+
+def _collect_logging_stats():
+    s = logging_stats()
+    return [
+        ("log_queue_depth", "gauge", "Log records waiting for the writer thread", [({}, s["queued"])]),
+        ("log_records_dropped_total", "counter", "Log records dropped because the queue was full", [({}, s["dropped"])]),
+        ("log_records_sampled_out_total", "counter", "DEBUG/INFO records skipped by LOG_SAMPLE_RATE",
+         [({}, s["sampled_out"])]),
+    ]
@@ -0,0 +1,446 @@
+import os
+import time
+import bisect
+import inspect
+import functools
+import threading
+
+from LangGRAPH_SQL.log_config import node_var
+
+# 0 turns every inc/observe into a no-op (the /metrics endpoint then only shows collectors)
+METRICS_ENABLED = os.environ.get("METRICS_ENABLED", "1") not in ("0", "false", "False")
+METRICS_PREFIX = os.environ.get("METRICS_PREFIX", "langgraph_sql_")
+
+# Seconds; covers sub-millisecond parsers up to slow LLM calls and rate-limit waits
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+ROW_BUCKETS = (0, 1, 10, 100, 1_000, 10_000, 100_000, 1_000_000)
+
+
+def _merge_into(target: dict, shard: dict):
+    """Add one shard's values to `target`: {key: number or list of histogram cells}."""
+    # dict()/list() copies are atomic under the GIL; a concurrent write lands
+    # in this scrape or the next one
+    for key, value in dict(shard).items():
+        if isinstance(value, list):
+            cells = target.get(key)
+            if cells is None:
+                target[key] = list(value)
+            else:
+                for i, v in enumerate(list(value)):
+                    cells[i] += v
+        else:
+            target[key] = target.get(key, 0) + value
+
+
+class MetricsRegistry:
+    """
+    In-process metrics with Prometheus text exposition.
+
+    Every thread writes to its own shard (a plain dict reached through
+    `threading.local`), so recording takes no lock and never contends with
+    other threads; the only synchronized step is registering a thread's shard
+    the first time it records anything. A scrape copies and sums the shards.
+    Shards of finished threads are folded into a single retired shard (on the
+    next registration or scrape), so counters never go backwards and
+    short-lived worker threads don't accumulate shards.
+
+    Values that other components already count (cache hit/miss counters, guard
+    stats...) are exported through collectors, which are only called on scrape.
+    """
+
+    def __init__(self, prefix: str = METRICS_PREFIX, enabled: bool = METRICS_ENABLED):
+        self.prefix = prefix
+        self.enabled = enabled
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards = []  # (thread, values) of threads that recorded something
+        self._retired = {}  # sum of the shards of finished threads
+        self._metrics = {}
+        self._collectors = []
+
+    def _shard(self) -> dict:
+        try:
+            return self._local.values
+        except AttributeError:
+            values = self._local.values = {}
+            with self._lock:
+                self._fold_finished()
+                self._shards.append((threading.current_thread(), values))
+            return values
+
+    def _fold_finished(self):
+        """Merge the shards of threads that have exited into `_retired` (lock held)."""
+        live = []
+        for thread, values in self._shards:
+            if thread.is_alive():
+                live.append((thread, values))
+            else:
+                # The owner is gone, so nothing writes to this shard any more
+                _merge_into(self._retired, values)
+        self._shards = live
+
+    def _register(self, metric):
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric) or existing.labelnames != metric.labelnames:
+                    raise ValueError(f"Metric '{metric.name}' is already registered with a different type or labels")
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames=()):
+        return self._register(Counter(self, self.prefix + name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames=()):
+        return self._register(Gauge(self, self.prefix + name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self._register(Histogram(self, self.prefix + name, documentation, labelnames, buckets))
+
+    def register_collector(self, collector):
+        """
+        Add a scrape-time callback returning `(name, type, help, samples)` tuples,
+        where `samples` is a list of `(labels_dict, value)`. Names get the registry prefix.
+        """
+        with self._lock:
+            self._collectors.append(collector)
+
+    def _merged(self) -> dict:
+        """Sum of all thread shards: {key: number or list of histogram cells}."""
+        with self._lock:
+            self._fold_finished()
+            shards = [values for _, values in self._shards]
+            merged = {}
+            _merge_into(merged, self._retired)
+        for shard in shards:
+            _merge_into(merged, shard)
+        return merged
+
+    def snapshot(self) -> dict:
+        """Current values as plain data: {metric: {label_values: value or {"buckets", "sum", "count"}}}."""
+        merged = self._merged()
+        with self._lock:
+            metrics = list(self._metrics.values())
+        result = {}
+        for metric in metrics:
+            series = {}
+            for (name, label_values), value in merged.items():
+                if name == metric.name:
+                    series[label_values] = metric.summarize(value)
+            result[metric.name] = series
+        return result
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+        merged = self._merged()
+        with self._lock:
+            metrics = list(self._metrics.values())
+            collectors = list(self._collectors)
+
+        by_metric = {}
+        for (name, label_values), value in merged.items():
+            by_metric.setdefault(name, []).append((label_values, value))
+
+        lines = []
+        for metric in metrics:
+            lines.append(f"# HELP {metric.name} {_escape_help(metric.documentation)}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            series = sorted(by_metric.get(metric.name, []), key=lambda s: s[0])
+            if not series and not metric.labelnames and metric.kind != "histogram":
+                series = [((), 0)]
+            for label_values, value in series:
+                lines.extend(metric.expose(label_values, value))
+
+        for collector in collectors:
+            try:
+                families = list(collector())
+            except Exception as e:
+                lines.append(f"# collector {getattr(collector, '__name__', collector)} failed: {_escape_help(str(e))}")
+                continue
+            for name, kind, documentation, samples in families:
+                name = self.prefix + name
+                lines.append(f"# HELP {name} {_escape_help(documentation)}")
+                lines.append(f"# TYPE {name} {kind}")
+                for labels, value in samples:
+                    lines.append(f"{name}{_format_labels(labels.keys(), labels.values())} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        """Zero every recorded value (used by benchmarks)."""
+        with self._lock:
+            for _, shard in self._shards:
+                shard.clear()
+            self._retired.clear()
+
+
+class _Metric:
+    kind = "untyped"
+
+    def __init__(self, registry: MetricsRegistry, name: str, documentation: str, labelnames=()):
+        self.registry = registry
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children = {}
+        self._default = None
+
+    def labels(self, *values):
+        """Child series for the given label values (cached; keep a reference on hot paths)."""
+        if len(values) != len(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {values}")
+        values = tuple(str(v) for v in values)
+        child = self._children.get(values)
+        if child is None:
+            child = self._children.setdefault(values, self._child((self.name, values)))
+        return child
+
+    def _unlabeled(self):
+        if self._default is None:
+            if self.labelnames:
+                raise ValueError(f"{self.name} has labels {self.labelnames}; use .labels(...)")
+            self._default = self._child((self.name, ()))
+        return self._default
+
+    def summarize(self, value):
+        return value
+
+    def expose(self, label_values, value):
+        return [f"{self.name}{_format_labels(self.labelnames, label_values)} {_format_value(value)}"]
+
+
+class _CounterChild:
+    __slots__ = ("registry", "key")
+
+    def __init__(self, registry, key):
+        self.registry = registry
+        self.key = key
+
+    def inc(self, amount: float = 1):
+        if self.registry.enabled:
+            shard = self.registry._shard()
+            shard[self.key] = shard.get(self.key, 0) + amount
+
+
+class _GaugeChild(_CounterChild):
+    __slots__ = ()
+
+    def dec(self, amount: float = 1):
+        self.inc(-amount)
+
+    def track(self):
+        """Context manager: +1 while the block runs (e.g. in-flight runs)."""
+        return _Tracked(self)
+
+
+class _Tracked:
+    __slots__ = ("gauge",)
+
+    def __init__(self, gauge):
+        self.gauge = gauge
+
+    def __enter__(self):
+        self.gauge.inc()
+        return self
+
+    def __exit__(self, *exc):
+        self.gauge.dec()
+        return False
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, *exc):
+        return self.__exit__(*exc)
+
+
+class Counter(_Metric):
+    """Monotonic counter; name it `..._total`."""
+    kind = "counter"
+
+    def _child(self, key):
+        return _CounterChild(self.registry, key)
+
+    def inc(self, amount: float = 1):
+        self._unlabeled().inc(amount)
+
+
+class Gauge(_Metric):
+    """Up/down value. Per-thread deltas are summed, so inc and dec may happen on different threads."""
+    kind = "gauge"
+
+    def _child(self, key):
+        return _GaugeChild(self.registry, key)
+
+    def inc(self, amount: float = 1):
+        self._unlabeled().inc(amount)
+
+    def dec(self, amount: float = 1):
+        self._unlabeled().dec(amount)
+
+    def track(self):
+        return self._unlabeled().track()
+
+
+class _HistogramChild:
+    __slots__ = ("registry", "key", "buckets")
+
+    def __init__(self, registry, key, buckets):
+        self.registry = registry
+        self.key = key
+        self.buckets = buckets
+
+    def observe(self, value: float):
+        if self.registry.enabled:
+            shard = self.registry._shard()
+            cells = shard.get(self.key)
+            if cells is None:
+                # One count per bucket, then +Inf, then the running sum
+                cells = shard[self.key] = [0] * (len(self.buckets) + 2)
+            cells[bisect.bisect_left(self.buckets, value)] += 1
+            cells[-1] += value
+
+    def time(self):
+        """Context manager observing the duration of the block in seconds."""
+        return _Timer(self)
+
+
+class _Timer:
+    __slots__ = ("child", "start")
+
+    def __init__(self, child):
+        self.child = child
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.child.observe(time.perf_counter() - self.start)
+        return False
+
+
+class Histogram(_Metric):
+    """Cumulative-bucket histogram (`_bucket`, `_sum`, `_count` series)."""
+    kind = "histogram"
+
+    def __init__(self, registry, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(registry, name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _child(self, key):
+        return _HistogramChild(self.registry, key, self.buckets)
+
+    def observe(self, value: float):
+        self._unlabeled().observe(value)
+
+    def time(self):
+        return self._unlabeled().time()
+
+    def summarize(self, cells):
+        return {"buckets": dict(zip(self.buckets + (float("inf"),), cells[:-1])),
+                "sum": cells[-1], "count": sum(cells[:-1])}
+
+    def expose(self, label_values, cells):
+        lines, cumulative = [], 0
+        for bound, count in zip(self.buckets + (float("inf"),), cells[:-1]):
+            cumulative += count
+            labels = _format_labels(self.labelnames + ("le",), label_values + (_format_value(bound),))
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+        labels = _format_labels(self.labelnames, label_values)
+        lines.append(f"{self.name}_sum{labels} {_format_value(cells[-1])}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+def _escape_help(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("\n", "\\n")
+
+
+def _format_labels(names, values) -> str:
+    if not names:
+        return ""
+    pairs = []
+    for name, value in zip(names, values):
+        value = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        pairs.append(f'{name}="{value}"')
+    return "{" + ",".join(pairs) + "}"
+
+
+def _format_value(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value)
+
+
+metrics = MetricsRegistry()
+
+# --- Pipeline metrics (recorded across modules, exposed on GET /metrics) ---
+NODE_LATENCY = metrics.histogram("node_duration_seconds", "Graph node latency", ("node", "status"))
+PIPELINE_LATENCY = metrics.histogram("pipeline_duration_seconds", "End-to-end pipeline run latency", ("status",))
+RUNS_IN_FLIGHT = metrics.gauge("runs_in_flight", "Pipeline runs currently executing")
+LLM_CALLS = metrics.counter("llm_calls_total", "LLM chain calls by outcome (ok, error, cache)", ("chain", "outcome"))
+LLM_LATENCY = metrics.histogram("llm_call_duration_seconds", "Provider call latency (cache hits excluded)", ("chain",))
+LLM_PROMPT_TOKENS = metrics.counter("llm_prompt_tokens_total", "Prompt tokens sent to the provider", ("chain",))
+LLM_COMPLETION_TOKENS = metrics.counter("llm_completion_tokens_total", "Completion tokens returned by the provider",
+                                        ("chain",))
+RATE_LIMIT_WAIT = metrics.histogram("rate_limiter_wait_seconds", "Time spent waiting for LLM rate-limit budget",
+                                    ("model",))
+SQL_LATENCY = metrics.histogram("sql_execution_seconds", "Generated SQL execution time (first page)", ("outcome",))
+SQL_ROWS = metrics.histogram("sql_rows_returned", "Rows returned in the first result page", buckets=ROW_BUCKETS)
+COMPACT_SELECTIONS = metrics.counter("compact_selection_total",
+                                     "Compact-mode table/column selections by outcome (ok, fallback, skipped)",
+                                     ("outcome",))
+SPECULATIVE_GENERATIONS = metrics.counter("speculative_generations_total",
+                                          "Speculative SQL generations by outcome (used, wasted, failed)", ("outcome",))
+SPECULATIVE_SAVED = metrics.histogram("speculative_saved_seconds",
+                                      "Latency saved per used speculative SQL generation (overlap with filter_check)")
+INTENT_MATCHES = metrics.counter("intent_matches_total",
+                                 "Intent library classifications by best template and outcome (matched, "
+                                 "low_confidence, ambiguous, unsupported, no_intent, error)", ("intent", "outcome"))
+
+
+def timed_node(name: str):
+    """
+    Decorator recording a graph node's latency in NODE_LATENCY, labelled by
+    node and status (ok / error), and tagging the node's log records with its
+    name (see log_config). Works for both sync and async node functions.
+    """
+
+    def decorate(func):
+        ok, error = NODE_LATENCY.labels(name, "ok"), NODE_LATENCY.labels(name, "error")
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                token = node_var.set(name)
+                start = time.perf_counter()
+                try:
+                    result = await func(*args, **kwargs)
+                except BaseException:
+                    error.observe(time.perf_counter() - start)
+                    raise
+                finally:
+                    node_var.reset(token)
+                ok.observe(time.perf_counter() - start)
+                return result
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            token = node_var.set(name)
+            start = time.perf_counter()
+            try:
+                result = func(*args, **kwargs)
+            except BaseException:
+                error.observe(time.perf_counter() - start)
+                raise
+            finally:
+                node_var.reset(token)
+            ok.observe(time.perf_counter() - start)
+            return result
+        return wrapper
+
+    return decorate
@@ -0,0 +1,189 @@
+import os
+import re
+import time
+import hashlib
+import logging
+import sqlite3
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Wall-clock budget for producing one result page/batch (0 disables)
+SQL_TIMEOUT_SECONDS = float(os.environ.get("SQL_TIMEOUT_SECONDS", 10))
+# SQLite VM instructions a query may execute per page/batch (0 disables)
+SQL_MAX_VM_STEPS = int(os.environ.get("SQL_MAX_VM_STEPS", 0))
+# Rows a single streamed result may return in total (0 disables)
+SQL_MAX_ROWS = int(os.environ.get("SQL_MAX_ROWS", 1_000_000))
+# A query shape that timed out this many times within SQL_OFFENDER_TTL is rejected up front
+SQL_OFFENDER_THRESHOLD = int(os.environ.get("SQL_OFFENDER_THRESHOLD", 2))
+SQL_OFFENDER_TTL = float(os.environ.get("SQL_OFFENDER_TTL", 3600))
+
+# The progress handler runs every N VM instructions; small enough to react within
+# milliseconds, large enough that the clock check is noise
+PROGRESS_INTERVAL = 1000
+
+_STRING_RE = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_RE = re.compile(r"\b\d+(?:\.\d+)?\b")
+
+
+def fingerprint(sql: str) -> str:
+    """Shape of a query with literals and whitespace normalized, e.g. for offender tracking."""
+    shape = _STRING_RE.sub("?", sql or "")
+    shape = _NUMBER_RE.sub("?", shape)
+    shape = re.sub(r"\s+", " ", shape).strip().rstrip(";").lower()
+    return hashlib.sha1(shape.encode('utf-8')).hexdigest()[:16]
+
+
+class QueryTimeoutError(Exception):
+    """A query was stopped (or refused) by the execution guard."""
+
+    def __init__(self, reason: str, fingerprint: str, elapsed: float = 0.0, steps: int = 0, limit=None):
+        self.reason = reason  # deadline | vm_steps | row_budget | rejected
+        self.fingerprint = fingerprint
+        self.elapsed = elapsed
+        self.steps = steps
+        self.limit = limit
+        messages = {
+            "deadline": f"Query exceeded the {limit}s execution deadline",
+            "vm_steps": f"Query exceeded the budget of {limit} SQLite VM steps",
+            "row_budget": f"Query returned more than {limit} rows",
+            "rejected": "Query rejected: the same query shape repeatedly timed out",
+        }
+        super().__init__(messages.get(reason, reason))
+
+    def to_dict(self) -> dict:
+        return {
+            "error": "query_timeout",
+            "reason": self.reason,
+            "message": str(self),
+            "fingerprint": self.fingerprint,
+            "elapsed_seconds": round(self.elapsed, 3),
+            "vm_steps": self.steps,
+            "limit": self.limit,
+        }
+
+
+class _Deadline:
+    """Progress-handler state for one query on one connection."""
+
+    def __init__(self, timeout: float, max_steps: int):
+        self.timeout = timeout
+        self.max_steps = max_steps
+        self.steps = 0
+        self.tripped = None
+        self.started = time.monotonic()
+        self.elapsed = 0.0
+
+    def reset(self):
+        """Start a new budget window (called before each fetch of a streamed result)."""
+        self.steps = 0
+        self.started = time.monotonic()
+
+    def __call__(self):
+        self.steps += PROGRESS_INTERVAL
+        if self.max_steps and self.steps > self.max_steps:
+            self.tripped = "vm_steps"
+        elif self.timeout and time.monotonic() - self.started > self.timeout:
+            self.tripped = "deadline"
+        if self.tripped:
+            self.elapsed = time.monotonic() - self.started
+            return 1  # non-zero makes SQLite abort with "interrupted"
+        return 0
+
+
+class QueryGuard:
+    """
+    Execution limits for generated SQL, enforced inside SQLite.
+
+    A progress handler installed on the connection aborts the statement once it
+    runs past the deadline or VM-step budget; the resulting "interrupted" error
+    is turned into a QueryTimeoutError. Timeouts are counted per query
+    fingerprint, and a shape that keeps timing out is rejected before it runs.
+    """
+
+    def __init__(self, timeout: float = SQL_TIMEOUT_SECONDS, max_steps: int = SQL_MAX_VM_STEPS,
+                 max_rows: int = SQL_MAX_ROWS, offender_threshold: int = SQL_OFFENDER_THRESHOLD,
+                 offender_ttl: float = SQL_OFFENDER_TTL):
+        self.timeout = timeout
+        self.max_steps = max_steps
+        self.max_rows = max_rows
+        self.offender_threshold = offender_threshold
+        self.offender_ttl = offender_ttl
+        self._lock = threading.Lock()
+        self._offenders = {}  # fingerprint -> [timestamps of timeouts]
+        self.stats = {"guarded": 0, "timeouts": 0, "rejected": 0, "row_budget": 0}
+
+    def _recent_timeouts(self, fp: str, now: float):
+        times = [t for t in self._offenders.get(fp, ()) if now - t < self.offender_ttl]
+        if times:
+            self._offenders[fp] = times
+        else:
+            self._offenders.pop(fp, None)
+        return times
+
+    def check(self, sql: str) -> str:
+        """Fingerprint `sql`, raising QueryTimeoutError if its shape is a repeat offender."""
+        fp = fingerprint(sql)
+        if self.offender_threshold:
+            with self._lock:
+                if len(self._recent_timeouts(fp, time.time())) >= self.offender_threshold:
+                    self.stats["rejected"] += 1
+                    logger.warning("Query guard: rejecting repeat offender %s", fp)
+                    raise QueryTimeoutError("rejected", fp)
+        return fp
+
+    def record_timeout(self, fp: str):
+        with self._lock:
+            self.stats["timeouts"] += 1
+            if self.offender_threshold:
+                self._offenders.setdefault(fp, []).append(time.time())
+
+    def offenders(self) -> dict:
+        now = time.time()
+        with self._lock:
+            return {fp: len(self._recent_timeouts(fp, now)) for fp in list(self._offenders)}
+
+    def check_rows(self, fp: str, delivered: int):
+        if self.max_rows and delivered > self.max_rows:
+            with self._lock:
+                self.stats["row_budget"] += 1
+            raise QueryTimeoutError("row_budget", fp, limit=self.max_rows)
+
+    def guard(self, dbapi_conn, sql: str):
+        """Context manager that enforces the limits for statements run on `dbapi_conn`."""
+        return _Guarded(self, dbapi_conn, sql)
+
+
+class _Guarded:
+    def __init__(self, owner: QueryGuard, dbapi_conn, sql: str):
+        self.owner = owner
+        self.conn = dbapi_conn
+        self.fingerprint = owner.check(sql)
+        self.deadline = _Deadline(owner.timeout, owner.max_steps)
+
+    def reset(self):
+        self.deadline.reset()
+
+    def __enter__(self):
+        with self.owner._lock:
+            self.owner.stats["guarded"] += 1
+        if self.owner.timeout or self.owner.max_steps:
+            self.conn.set_progress_handler(self.deadline, PROGRESS_INTERVAL)
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        # Pooled connections must not keep the handler
+        self.conn.set_progress_handler(None, 0)
+        reason = self.deadline.tripped
+        if reason and (exc_type is None or issubclass(exc_type, sqlite3.OperationalError)
+                       or 'interrupted' in str(exc)):
+            self.owner.record_timeout(self.fingerprint)
+            limit = self.owner.timeout if reason == "deadline" else self.owner.max_steps
+            logger.warning("Query guard: aborted %s (%s) after %.2fs / %d VM steps",
+                           self.fingerprint, reason, self.deadline.elapsed, self.deadline.steps)
+            raise QueryTimeoutError(reason, self.fingerprint, self.deadline.elapsed,
+                                    self.deadline.steps, limit) from exc
+        return False
+
+
+query_guard = QueryGuard()
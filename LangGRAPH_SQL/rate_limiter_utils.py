@@ -1,30 +1,197 @@
-
+import os
 import time
+import asyncio
 import logging
+import threading
+from collections import deque
+
+from LangGRAPH_SQL.metrics import RATE_LIMIT_WAIT
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_MODEL = "gemini-2.5-flash"
+
+# Free-tier quotas per model: (requests per minute, tokens per minute).
+# Override globally with LLM_RPM_LIMIT / LLM_TPM_LIMIT.
+MODEL_LIMITS = {
+    "gemini-2.5-flash": (10, 250_000),
+    "gemini-2.5-pro": (5, 250_000),
+}
+
+# Rough prompt overhead (template text + completion) added to every estimate.
+PROMPT_OVERHEAD_TOKENS = 1000
+
+
+def estimate_tokens(*parts) -> int:
+    """Cheap token estimate (~4 chars per token) for the variable parts of a prompt."""
+    chars = sum(len(str(p)) for p in parts if p is not None)
+    return chars // 4 + PROMPT_OVERHEAD_TOKENS
+
+
+class _ModelBucket:
+    """
+    Sliding-window budget for one model.
+
+    Grants are handed out as reservations: each caller is assigned the earliest
+    start time at which both the request and token budgets have room, and that
+    start time is never earlier than the previous grant. Waiters are therefore
+    served strictly in arrival order (FIFO), whether they sleep in a thread or
+    on the event loop.
+    """
+
+    def __init__(self, rpm: int, tpm: int, window: float):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.window = window
+        self.grants = deque()  # (start_time, tokens), ordered by start_time
+        self.window_tokens = 0
+        self.last_start = 0.0
+
+    def reserve(self, tokens: int, now: float) -> float:
+        # Drop grants that have left the window
+        while self.grants and self.grants[0][0] <= now - self.window:
+            self.window_tokens -= self.grants.popleft()[1]
+
+        # A single request larger than the whole TPM budget can never fit; cap it
+        tokens = min(tokens, self.tpm)
+        start = max(now, self.last_start)
+
+        # Request budget: the rpm-th most recent grant must have left the window
+        if self.rpm and len(self.grants) >= self.rpm:
+            start = max(start, self.grants[-self.rpm][0] + self.window)
+
+        # Token budget: walk the oldest grants until enough tokens have expired
+        if self.tpm:
+            in_window = self.window_tokens
+            for granted_at, granted_tokens in self.grants:
+                if in_window + tokens <= self.tpm and granted_at > start - self.window:
+                    break
+                if granted_at > start - self.window:
+                    start = max(start, granted_at + self.window)
+                in_window -= granted_tokens
+
+        self.grants.append((start, tokens))
+        self.window_tokens += tokens
+        self.last_start = start
+        return start
+
+    def release(self, start: float, tokens: int):
+        """Give back a grant that will not be used (its waiter was cancelled)."""
+        tokens = min(tokens, self.tpm)
+        try:
+            self.grants.remove((start, tokens))
+        except ValueError:
+            return  # Already left the window
+        self.window_tokens -= tokens
+        if start == self.last_start:
+            self.last_start = max((granted_at for granted_at, _ in self.grants), default=0.0)
+
+
 class GlobalRateLimiter:
+    """
+    Process-wide, thread-safe and asyncio-aware rate limiter for LLM calls.
+
+    Each model gets its own requests-per-minute and tokens-per-minute budget.
+    Use `acquire()` from synchronous code and `await aacquire()` from coroutines;
+    both share the same queue, so sync and async callers are served fairly.
+    """
     _instance = None
-    _count = 0
-    _threshold = 4
-    _pause_duration = 60
+    _window = 60.0
 
     def __new__(cls):
         if cls._instance is None:
-            cls._instance = super(GlobalRateLimiter, cls).__new__(cls)
+            instance = super(GlobalRateLimiter, cls).__new__(cls)
+            instance._lock = threading.Lock()
+            instance._buckets = {}
+            instance._stats = {}
+            cls._instance = instance
         return cls._instance
 
-    @classmethod
-    def check_and_wait(cls):
-        cls._count += 1
-        logger.info(f"API Call Count: {cls._count}/{cls._threshold}")
-        if cls._count >= cls._threshold:
-            logger.warning(f"Rate limit threshold ({cls._threshold}) reached. Pausing for {cls._pause_duration} seconds...")
-            print(f"\n⚠️ Rate limit hit. Pausing for {cls._pause_duration}s to respect free tier... ⚠️\n")
-            time.sleep(cls._pause_duration)
-            cls._count = 0
-            logger.info("Resuming execution.")
+    def _limits_for(self, model: str):
+        rpm, tpm = MODEL_LIMITS.get(model, MODEL_LIMITS[DEFAULT_MODEL])
+        if os.environ.get("LLM_MODE", "live").lower() in ("replay", "fake"):
+            # Replayed and fake responses never reach the provider: no quota to respect
+            rpm, tpm = 0, 0
+        rpm = int(os.environ.get("LLM_RPM_LIMIT", rpm))
+        tpm = int(os.environ.get("LLM_TPM_LIMIT", tpm))
+        return rpm, tpm
+
+    def _reserve(self, model: str, tokens: int) -> float:
+        """Reserve a slot and return how long the caller must wait for it."""
+        return self._reserve_grant(model, tokens)[0]
+
+    def _reserve_grant(self, model: str, tokens: int):
+        """`_reserve()` that also returns the grant's start time, for `_release()`."""
+        with self._lock:
+            bucket = self._buckets.get(model)
+            if bucket is None:
+                rpm, tpm = self._limits_for(model)
+                bucket = self._buckets[model] = _ModelBucket(rpm, tpm, self._window)
+            now = time.monotonic()
+            start = bucket.reserve(tokens, now)
+            delay = start - now
+
+            stats = self._stats.setdefault(model, {
+                "calls": 0, "tokens": 0, "waits": 0,
+                "wait_seconds_total": 0.0, "wait_seconds_max": 0.0,
+            })
+            stats["calls"] += 1
+            stats["tokens"] += tokens
+            if delay > 0:
+                stats["waits"] += 1
+                stats["wait_seconds_total"] += delay
+                stats["wait_seconds_max"] = max(stats["wait_seconds_max"], delay)
+        RATE_LIMIT_WAIT.labels(model).observe(max(delay, 0.0))
+        return max(delay, 0.0), start
+
+    def _release(self, model: str, tokens: int, start: float):
+        """Return an unused reservation so later callers can have its budget."""
+        with self._lock:
+            bucket = self._buckets.get(model)
+            if bucket is not None:
+                bucket.release(start, tokens)
+            stats = self._stats.get(model)
+            if stats is not None:
+                stats["calls"] -= 1
+                stats["tokens"] -= tokens
+
+    def acquire(self, tokens: int = PROMPT_OVERHEAD_TOKENS, model: str = DEFAULT_MODEL) -> float:
+        """Block the current thread until `model` has budget for `tokens`. Returns seconds waited."""
+        delay = self._reserve(model, tokens)
+        if delay > 0:
+            logger.warning("Rate limit budget for %s exhausted. Waiting %.2fs...", model, delay)
+            time.sleep(delay)
+        return delay
+
+    async def aacquire(self, tokens: int = PROMPT_OVERHEAD_TOKENS, model: str = DEFAULT_MODEL) -> float:
+        """
+        Async variant of `acquire()` that yields to the event loop while waiting.
+        A caller cancelled while waiting gives its reservation back.
+        """
+        delay, start = self._reserve_grant(model, tokens)
+        if delay > 0:
+            logger.warning("Rate limit budget for %s exhausted. Waiting %.2fs...", model, delay)
+            try:
+                await asyncio.sleep(delay)
+            except asyncio.CancelledError:
+                self._release(model, tokens, start)
+                raise
+        return delay
+
+    def check_and_wait(self):
+        """Backward-compatible alias for `acquire()` with a default token estimate."""
+        return self.acquire()
+
+    def stats(self) -> dict:
+        """Snapshot of per-model call counts and time spent waiting for budget."""
+        with self._lock:
+            return {model: dict(s) for model, s in self._stats.items()}
+
+    def reset(self):
+        """Forget all reservations and metrics (used by benchmarks)."""
+        with self._lock:
+            self._buckets.clear()
+            self._stats.clear()
 
 # Global instance
 rate_limiter = GlobalRateLimiter()
@@ -0,0 +1,257 @@
+import io
+import os
+import re
+import csv
+import hmac
+import json
+import base64
+import hashlib
+import logging
+import secrets
+
+from LangGRAPH_SQL.query_guard import query_guard
+
+logger = logging.getLogger(__name__)
+
+# Rows kept in the graph state / first SSE page, and rows per streamed batch
+RESULT_PAGE_SIZE = int(os.environ.get("RESULT_PAGE_SIZE", 50))
+RESULT_BATCH_SIZE = int(os.environ.get("RESULT_BATCH_SIZE", 1000))
+
+# Continuation tokens carry SQL, so they are HMAC-signed. Without a configured
+# secret, tokens are only valid inside the process that issued them.
+_TOKEN_SECRET = os.environ.get("RESULT_TOKEN_SECRET", "").encode() or secrets.token_bytes(32)
+
+FORMATS = ("markdown", "jsonl", "csv", "arrow")
+
+
+# --- Continuation tokens ---
+
+def encode_token(payload: dict) -> str:
+    body = base64.urlsafe_b64encode(json.dumps(payload, separators=(',', ':'), default=str).encode()).decode()
+    sig = hmac.new(_TOKEN_SECRET, body.encode(), hashlib.sha256).hexdigest()[:32]
+    return f"{body}.{sig}"
+
+
+def decode_token(token: str) -> dict:
+    try:
+        body, sig = token.rsplit('.', 1)
+    except (AttributeError, ValueError):
+        raise ValueError("Malformed continuation token")
+    expected = hmac.new(_TOKEN_SECRET, body.encode(), hashlib.sha256).hexdigest()[:32]
+    if not hmac.compare_digest(sig, expected):
+        raise ValueError("Invalid continuation token signature")
+    return json.loads(base64.urlsafe_b64decode(body.encode()))
+
+
+_SIMPLE_SELECT_RE = re.compile(
+    r'^\s*SELECT\s+(?P<columns>.+?)\s+FROM\s+"?(?P<table>\w+)"?(?:\s+(?:AS\s+)?(?!WHERE\b|ORDER\b|LIMIT\b)\w+)?'
+    r'(?P<rest>(?:\s+(?:WHERE|ORDER|LIMIT)\b.*)?)\s*;?\s*$',
+    re.IGNORECASE | re.DOTALL,
+)
+_ORDER_BY_RE = re.compile(r"\bORDER\s+BY\s+(.*?)\s*(?:\bLIMIT\b.*)?$", re.IGNORECASE | re.DOTALL)
+_primary_keys = {}
+
+
+def _primary_key(engine, table: str):
+    """Single-column INTEGER PRIMARY KEY (rowid alias) of `table`, or None."""
+    key = (str(engine.url), table.lower())
+    if key not in _primary_keys:
+        with engine.connect() as conn:
+            info = conn.exec_driver_sql(f"PRAGMA table_info({_quote_identifier(table)})").fetchall()
+        pk = [r for r in info if r[5]]
+        _primary_keys[key] = pk[0][1] if len(pk) == 1 and (pk[0][2] or '').upper() == 'INTEGER' else None
+    return _primary_keys[key]
+
+
+def keyset_column(engine, sql: str):
+    """
+    Column that keyset continuation can use for `sql`, or None for offset.
+
+    Only detected where it is provably safe: a single-table SELECT without
+    DISTINCT, JOIN, GROUP BY, subqueries or compound parts, projecting the
+    table's INTEGER PRIMARY KEY (or `*`), and either unordered or ordered by
+    that key ascending, so ordering the result by the key changes nothing.
+    """
+    match = _SIMPLE_SELECT_RE.match(sql or '')
+    if not match or re.search(r"\(|\bDISTINCT\b|\bJOIN\b|\bGROUP\s+BY\b|\bUNION\b|\bINTERSECT\b|\bEXCEPT\b",
+                              sql, re.IGNORECASE):
+        return None
+    pk = _primary_key(engine, match.group("table"))
+    if pk is None:
+        return None
+    projected = [c.strip().strip('"').rsplit('.', 1)[-1].strip('"').lower() for c in match.group("columns").split(',')]
+    if '*' not in projected and pk.lower() not in projected:
+        return None
+    order = _ORDER_BY_RE.search(match.group("rest"))
+    if order and re.sub(r'\s+ASC$', '', order.group(1).strip(), flags=re.IGNORECASE).strip('"').rsplit('.', 1)[-1].strip('"').lower() != pk.lower():
+        return None
+    return pk
+
+
+def _quote_identifier(name: str) -> str:
+    return '"' + str(name).replace('"', '""') + '"'
+
+
+def _resume_statement(sql: str, token: dict):
+    """
+    SQL + params that continue a result set from a token (offset or keyset).
+
+    Keyset statements are always wrapped in `ORDER BY key`, first page included:
+    `key > last` only skips the delivered rows if they came in key order, which
+    the inner statement does not have to guarantee. Offset continuation re-runs
+    the statement and has SQLite step over the delivered rows, so each resume
+    costs O(offset); it suits the single "rest of the result" stream, while
+    clients paging through a large result should pass a key column.
+    """
+    if token.get("key") is not None:
+        key = _quote_identifier(token["key"])
+        if "after" in token:
+            return f"SELECT * FROM ({sql}) WHERE {key} > ? ORDER BY {key}", (token["after"],)
+        return f"SELECT * FROM ({sql}) ORDER BY {key}", ()
+    offset = int(token.get("offset", 0))
+    if offset:
+        return f"SELECT * FROM ({sql}) LIMIT -1 OFFSET ?", (offset,)
+    return sql, ()
+
+
+def _next_token(sql: str, token: dict, delivered: int, last_row, columns):
+    key = token.get("key")
+    if key is not None and last_row is not None:
+        return encode_token({"sql": sql, "key": key, "after": last_row[list(columns).index(key)]})
+    return encode_token({"sql": sql, "offset": int(token.get("offset", 0)) + delivered})
+
+
+# --- Row iteration ---
+
+def iter_batches(engine, sql: str = None, token: str = None, batch_size: int = None,
+                 max_rows: int = None, key_column: str = None):
+    """
+    Execute `sql` (or resume from `token`) and yield `(columns, rows)` batches.
+
+    Rows are pulled from the SQLite cursor with `fetchmany`, so memory and time to
+    first batch don't grow with the size of the result. Pass `key_column` to use
+    keyset continuation: rows are returned ordered by that column, which must be
+    unique and non-NULL in the result; otherwise continuation is by offset.
+
+    Execution runs under `query_guard`: each batch must be produced within the
+    deadline / VM-step budget, and the stream stops with a QueryTimeoutError
+    once it passes the row budget.
+    """
+    state = decode_token(token) if token else {"sql": sql, "offset": 0, "key": key_column}
+    sql = state["sql"]
+    batch_size = batch_size or RESULT_BATCH_SIZE
+    statement, params = _resume_statement(sql, state)
+
+    raw = engine.raw_connection()
+    try:
+        with query_guard.guard(raw.driver_connection, sql) as guard:
+            cursor = raw.cursor()
+            cursor.execute(statement, params)
+            columns = [d[0] for d in cursor.description or ()]
+            remaining = max_rows
+            delivered = 0
+            while remaining is None or remaining > 0:
+                # The budget covers producing a batch, not the consumer's time between batches
+                guard.reset()
+                rows = cursor.fetchmany(batch_size if remaining is None else min(batch_size, remaining))
+                if not rows:
+                    break
+                if remaining is not None:
+                    remaining -= len(rows)
+                delivered += len(rows)
+                query_guard.check_rows(guard.fingerprint, delivered)
+                yield columns, rows
+            cursor.close()
+    finally:
+        raw.close()
+
+
+class Page:
+    def __init__(self, columns, rows, next_token):
+        self.columns = columns
+        self.rows = rows
+        self.next_token = next_token
+
+
+def fetch_page(engine, sql: str = None, token: str = None, page_size: int = None, key_column: str = None) -> Page:
+    """One page of results plus a continuation token when more rows exist."""
+    page_size = page_size or RESULT_PAGE_SIZE
+    state = decode_token(token) if token else {"sql": sql, "offset": 0, "key": key_column}
+    columns, rows = [], []
+    # Read one row past the page to learn whether another page exists
+    for columns, batch in iter_batches(engine, token=encode_token(state), batch_size=page_size + 1,
+                                       max_rows=page_size + 1):
+        rows.extend(batch)
+    next_token = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        next_token = _next_token(state["sql"], state, page_size, rows[-1], columns)
+    return Page(columns, rows, next_token)
+
+
+# --- Encoders ---
+
+def format_markdown(columns, rows, header: bool = True) -> str:
+    lines = []
+    if header:
+        lines.append(f"| {' | '.join(columns)} |")
+        lines.append(f"| {' | '.join(['---'] * len(columns))} |")
+    lines.extend(f"| {' | '.join(map(str, row))} |" for row in rows)
+    return "\n".join(lines) + "\n" if lines else ""
+
+
+def _encode_jsonl(columns, rows, header):
+    return "".join(json.dumps(dict(zip(columns, row)), default=str) + "\n" for row in rows)
+
+
+def _encode_csv(columns, rows, header):
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    if header:
+        writer.writerow(columns)
+    writer.writerows(rows)
+    return buf.getvalue()
+
+
+def _encode_arrow(columns, rows, header):
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise ImportError("Arrow output requires pyarrow: `pip install pyarrow`")
+    arrays = []
+    for i in range(len(columns)):
+        values = [row[i] for row in rows]
+        try:
+            arrays.append(pa.array(values))
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            # SQLite columns can mix types; fall back to text
+            arrays.append(pa.array([None if v is None else str(v) for v in values]))
+    table = pa.Table.from_arrays(arrays, names=list(columns))
+    sink = pa.BufferOutputStream()
+    # Each batch is a self-contained IPC stream (schema + record batch)
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+_ENCODERS = {
+    "markdown": format_markdown,
+    "jsonl": _encode_jsonl,
+    "csv": _encode_csv,
+    "arrow": _encode_arrow,
+}
+
+
+def encode_batch(fmt: str, columns, rows, header: bool = True):
+    """Encode one batch as text (markdown/jsonl/csv) or bytes (arrow)."""
+    if fmt not in _ENCODERS:
+        raise ValueError(f"Unsupported result format '{fmt}'. Choose one of {FORMATS}")
+    return _ENCODERS[fmt](columns, rows, header)
+
+
+def iter_encoded(engine, token: str, fmt: str = "jsonl", batch_size: int = None):
+    """Yield encoded chunks for the rest of a result set, header only on the first chunk."""
+    first = True
+    for columns, rows in iter_batches(engine, token=token, batch_size=batch_size):
+        yield encode_batch(fmt, columns, rows, header=first)
+        first = False
@@ -1,16 +1,16 @@
-from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.runnables import RunnablePassthrough, RunnableMap, RunnableLambda
 
-import opik
+from LangGRAPH_SQL.tracing import track
+from LangGRAPH_SQL.llm_provider import lazy_chat_model
 from dotenv import load_dotenv
 
 load_dotenv()
 
 
 # Routing Model (Flash)
-model = ChatGoogleGenerativeAI(temperature=0.4, model='gemini-2.5-flash')
+model = lazy_chat_model(temperature=0.4, model='gemini-2.5-flash')
 
 template = ChatPromptTemplate.from_messages([
     ("system", """
@@ -53,9 +53,12 @@ chain = (
     | StrOutputParser()
 )
 
-@opik.track()
+@track()
 def agent_2(q):
     response = chain.invoke({"question": q}).replace('```', '')
     return response
 
-
+@track()
+async def aagent_2(q):
+    response = await chain.ainvoke({"question": q})
+    return response.replace('```', '')
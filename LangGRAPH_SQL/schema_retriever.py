@@ -0,0 +1,208 @@
+import os
+import re
+import math
+import logging
+import threading
+from collections import Counter
+
+from LangGRAPH_SQL.kb_service import kb_service
+
+logger = logging.getLogger(__name__)
+
+# Schema text (in estimated tokens) a single prompt section may use before it is
+# trimmed to the most relevant tables/columns. Small schemas are sent unchanged.
+SCHEMA_TOKEN_BUDGET = int(os.environ.get("SCHEMA_TOKEN_BUDGET", 2000))
+# Columns kept per table when a column list has to be trimmed
+SCHEMA_TOP_K = int(os.environ.get("SCHEMA_TOP_K", 8))
+
+_STOPWORDS = {
+    'a', 'an', 'the', 'of', 'in', 'on', 'for', 'to', 'and', 'or', 'is', 'are', 'was', 'be',
+    'by', 'with', 'from', 'at', 'as', 'it', 'this', 'that', 'my', 'i', 'me', 'what', 'which',
+    'how', 'show', 'give', 'list', 'each', 'per', 'e', 'g', 'eg', 'type', 'string', 'integer',
+    'float', 'date',
+}
+
+
+def tokenize(text: str):
+    tokens = []
+    for tok in re.findall(r"[a-z0-9]+", str(text).lower().replace('_', ' ')):
+        if tok in _STOPWORDS:
+            continue
+        # Light stemming so "spending"/"spend" and "merchants"/"merchant" meet
+        for suffix in ('ing', 'ies', 'es', 's', 'ed'):
+            if len(tok) > len(suffix) + 3 and tok.endswith(suffix):
+                tok = tok[:-len(suffix)] + ('y' if suffix == 'ies' else '')
+                break
+        tokens.append(tok)
+    return tokens
+
+
+def estimate_text_tokens(text: str) -> int:
+    return len(text) // 4
+
+
+def column_name(column_entry) -> str:
+    text = column_entry[0] if isinstance(column_entry, (list, tuple)) else str(column_entry)
+    return text.split(':', 1)[0].strip()
+
+
+class BM25:
+    def __init__(self, docs, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.term_freqs = [Counter(d) for d in docs]
+        self.doc_lens = [len(d) for d in docs]
+        self.avg_len = (sum(self.doc_lens) / len(docs)) if docs else 0.0
+        df = Counter(t for d in docs for t in set(d))
+        n = len(docs)
+        self.idf = {t: math.log(1 + (n - f + 0.5) / (f + 0.5)) for t, f in df.items()}
+
+    def scores(self, query_tokens):
+        result = []
+        for tf, dl in zip(self.term_freqs, self.doc_lens):
+            score = 0.0
+            for t in query_tokens:
+                f = tf.get(t)
+                if f:
+                    norm = self.k1 * (1 - self.b + self.b * dl / (self.avg_len or 1))
+                    score += self.idf[t] * f * (self.k1 + 1) / (f + norm)
+            result.append(score)
+        return result
+
+
+class SchemaRetriever:
+    """
+    Offline BM25 index over the knowledge base's table and column descriptions.
+
+    Used by the prompt builders to send only the schema slices relevant to a
+    question once the full schema would exceed SCHEMA_TOKEN_BUDGET.
+    """
+
+    def __init__(self, kb):
+        self.kb = kb
+        self.columns = []  # (table, position, entry)
+        docs = []
+        for table_name in kb:
+            entry = kb[table_name]
+            table_tokens = tokenize(table_name) + tokenize(entry[0])
+            for position, col in enumerate(entry[1] if len(entry) > 1 else ()):
+                col_tokens = tokenize(col[0] if col else '')
+                name_tokens = tokenize(column_name(col))
+                # Column name and description dominate; table context breaks ties
+                docs.append(name_tokens * 2 + col_tokens * 2 + table_tokens)
+                self.columns.append((table_name, position, col))
+        self.bm25 = BM25(docs)
+        self.savings = {}
+        self._lock = threading.Lock()
+
+    def search(self, question: str, k: int = None, tables=None):
+        """Top-k (table, column_name, score) for a question, best first."""
+        scores = self.bm25.scores(tokenize(question))
+        ranked = sorted(
+            ((s, i) for i, s in enumerate(scores)
+             if s > 0 and (tables is None or self.columns[i][0] in tables)),
+            reverse=True
+        )
+        if k is not None:
+            ranked = ranked[:k]
+        return [(self.columns[i][0], column_name(self.columns[i][2]), s) for s, i in ranked]
+
+    def _record(self, stage: str, full_text: str, sent_text: str):
+        full_tokens = estimate_text_tokens(full_text)
+        sent_tokens = estimate_text_tokens(sent_text)
+        with self._lock:
+            s = self.savings.setdefault(stage, {"calls": 0, "full_tokens": 0, "sent_tokens": 0})
+            s["calls"] += 1
+            s["full_tokens"] += full_tokens
+            s["sent_tokens"] += sent_tokens
+        if sent_tokens < full_tokens:
+            logger.info("Schema retrieval [%s]: sent ~%d of ~%d schema tokens", stage, sent_tokens, full_tokens)
+
+    def column_slice(self, table_name: str, question: str, budget: int = None, k: int = None) -> str:
+        """Column text for one table, trimmed to the relevant columns if over budget."""
+        budget = SCHEMA_TOKEN_BUDGET if budget is None else budget
+        full_text = self.kb.column_text(table_name)
+        if estimate_text_tokens(full_text) <= budget:
+            self._record("column_selection", full_text, full_text)
+            return full_text
+
+        entries = self.kb[table_name][1]
+        ranked = {name for _, name, _ in self.search(question, k=k or SCHEMA_TOP_K, tables={table_name})}
+        if not ranked:
+            self._record("column_selection", full_text, full_text)
+            return full_text
+        # Identifier columns are always kept since joins depend on them
+        kept = [
+            list(col) for col in entries
+            if column_name(col) in ranked or column_name(col) == 'id' or column_name(col).endswith('_id')
+        ]
+        sent_text = str(kept)
+        self._record("column_selection", full_text, sent_text)
+        return sent_text
+
+    def relevant_tables(self, question: str, tables, budget: int = None):
+        """Subset of `tables` (original order) whose descriptions fit the budget, most relevant first."""
+        budget = SCHEMA_TOKEN_BUDGET if budget is None else budget
+        tables = list(tables)
+        full_text = str(self.kb.table_descriptions(tables))
+        if estimate_text_tokens(full_text) <= budget:
+            self._record("subquestion", full_text, full_text)
+            return tables
+
+        table_scores = {}
+        for table_name, _, score in self.search(question, tables=set(tables)):
+            table_scores[table_name] = max(table_scores.get(table_name, 0.0), score)
+        chosen, used = set(), 0
+        for table_name in sorted(table_scores, key=table_scores.get, reverse=True):
+            cost = estimate_text_tokens(str({table_name: self.kb.description(table_name)}))
+            if chosen and used + cost > budget:
+                break
+            chosen.add(table_name)
+            used += cost
+        result = [t for t in tables if t in chosen] or tables
+        self._record("subquestion", full_text, str(self.kb.table_descriptions(result)))
+        return result
+
+    def schema_slice(self, question: str, sql_query: str = '', budget: int = None) -> str:
+        """
+        Schema text for the validator: every table the SQL references, plus the
+        tables most relevant to the question while the budget allows.
+        """
+        budget = SCHEMA_TOKEN_BUDGET if budget is None else budget
+        full_text = self.kb.schema_text
+        if estimate_text_tokens(full_text) <= budget:
+            self._record("validation", full_text, full_text)
+            return full_text
+
+        sql_lower = (sql_query or '').lower()
+        chosen = [t for t in self.kb if re.search(rf"\b{re.escape(t.lower())}\b", sql_lower)]
+        used = estimate_text_tokens(self.kb.schema_text_for(chosen))
+        for table_name, _, _ in self.search(question):
+            if table_name in chosen:
+                continue
+            cost = estimate_text_tokens(self.kb.schema_text_for([table_name]))
+            if used + cost > budget:
+                break
+            chosen.append(table_name)
+            used += cost
+        if not chosen:
+            self._record("validation", full_text, full_text)
+            return full_text
+        sent_text = self.kb.schema_text_for(chosen)
+        self._record("validation", full_text, sent_text)
+        return sent_text
+
+
+_retriever = None
+_retriever_lock = threading.Lock()
+
+
+def get_retriever() -> SchemaRetriever:
+    """Retriever for the current KB snapshot, rebuilt only when the KB is reloaded."""
+    global _retriever
+    kb = kb_service.get()
+    if _retriever is None or _retriever.kb is not kb:
+        with _retriever_lock:
+            if _retriever is None or _retriever.kb is not kb:
+                _retriever = SchemaRetriever(kb)
+    return _retriever
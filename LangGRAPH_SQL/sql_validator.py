@@ -0,0 +1,181 @@
+import os
+import re
+import sqlite3
+import logging
+import threading
+
+from LangGRAPH_SQL.kb_service import kb_service
+from LangGRAPH_SQL.db_engine import DB_PATH, readonly_uri, apply_read_pragmas
+from LangGRAPH_SQL.schema_retriever import column_name
+
+logger = logging.getLogger(__name__)
+
+STATIC_SQL_VALIDATION = os.environ.get("STATIC_SQL_VALIDATION", "1") not in ("0", "false", "False")
+
+# Statement parts a read-only analytical query is allowed to compile to
+_ALLOWED_ACTIONS = {
+    sqlite3.SQLITE_SELECT,
+    sqlite3.SQLITE_READ,
+    sqlite3.SQLITE_FUNCTION,
+    sqlite3.SQLITE_RECURSIVE,
+}
+
+_STRING_LITERAL_RE = re.compile(r"'((?:[^']|'')*)'")
+
+
+def extract_sql(text: str) -> str:
+    """Pull the SQL statement out of an LLM response (code fences, 'mysql' prefixes, chatter)."""
+    # 1. Extract block from ```sql ... ``` or ```mysql ... ```
+    sql_match = re.search(r'```(?:sql|mysql)?\n(.*?)\n```', text, re.DOTALL | re.IGNORECASE)
+    if sql_match:
+        sql_to_run = sql_match.group(1)
+    else:
+        sql_to_run = text
+
+    # 2. Strip "mysql" word if it appears at the start (common 2.5 flash quirk)
+    sql_to_run = re.sub(r'(?i)^\s*mysql\s*', '', sql_to_run)
+
+    # 3. If there is still conversational text, try to find the first WITH/SELECT
+    match_start = re.search(r'(?i)\b(WITH|SELECT)\b', sql_to_run)
+    if match_start:
+        sql_to_run = sql_to_run[match_start.start():]
+
+    # 4. Final Cleanup
+    return sql_to_run.replace('```', '').strip()
+
+
+def string_literals(sql: str):
+    return [m.group(1).replace("''", "'") for m in _STRING_LITERAL_RE.finditer(sql)]
+
+
+class StaticValidationResult:
+    def __init__(self, sql: str, issues):
+        self.sql = sql
+        self.issues = list(issues)
+
+    @property
+    def ok(self) -> bool:
+        return not self.issues
+
+    def __repr__(self):
+        return f"StaticValidationResult(ok={self.ok}, issues={self.issues})"
+
+
+class StaticSQLValidator:
+    """
+    Deterministic, local checks on generated SQL.
+
+    SQLite itself is the parser: the statement is compiled with `EXPLAIN` on a
+    read-only connection while an authorizer callback walks every action the
+    compiler emits. That yields the exact tables/columns the query reads and
+    rejects anything that is not a plain SELECT. If every check passes the LLM
+    validator can be skipped.
+    """
+
+    def __init__(self, db_path: str = DB_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._kb_columns = (None, {})
+        self.stats = {"fast_path": 0, "llm_fallback": 0}
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(readonly_uri(self.db_path), uri=True)
+            apply_read_pragmas(conn)
+            self._local.conn = conn
+        return conn
+
+    def _known_columns(self) -> dict:
+        kb = kb_service.get()
+        version, columns = self._kb_columns
+        if version != kb.version:
+            columns = {
+                t.lower(): {column_name(c).lower() for c in (kb[t][1] if len(kb[t]) > 1 else ())}
+                for t in kb
+            }
+            self._kb_columns = (kb.version, columns)
+        return columns
+
+    def _check_compiles(self, sql: str, issues):
+        known = self._known_columns()
+        seen = []
+
+        def authorizer(action, arg1, arg2, db_name, trigger):
+            if action not in _ALLOWED_ACTIONS:
+                seen.append(('denied', action))
+                return sqlite3.SQLITE_DENY
+            if action == sqlite3.SQLITE_READ:
+                seen.append(('read', (arg1 or '').lower(), (arg2 or '').lower()))
+            return sqlite3.SQLITE_OK
+
+        conn = self._connection()
+        conn.set_authorizer(authorizer)
+        try:
+            conn.execute(f"EXPLAIN {sql}").fetchall()
+        except sqlite3.Error as e:
+            issues.append(f"SQLite cannot compile the query: {e}")
+        finally:
+            conn.set_authorizer(None)
+
+        for item in seen:
+            if item[0] == 'denied':
+                issues.append(f"Statement performs a non-SELECT action (authorizer code {item[1]})")
+            else:
+                _, table_name, col = item
+                if table_name not in known:
+                    issues.append(f"Table '{table_name}' is not in the knowledge base")
+                elif col and col not in known[table_name]:
+                    issues.append(f"Column '{table_name}.{col}' is not in the knowledge base")
+
+    @staticmethod
+    def _check_filters(sql: str, fuzz_match, issues):
+        """Every matched filter value must appear verbatim, and filtered columns may not use other literals."""
+        if not fuzz_match:
+            return
+        expected = {}
+        for entry in fuzz_match:
+            fields = {}
+            for part in entry:
+                key, _, value = str(part).partition(':')
+                fields[key.strip()] = value
+            col = fields.get('column_name', '').lower()
+            if col:
+                expected.setdefault(col, set()).add(fields.get('filter_value', ''))
+
+        literals = set(string_literals(sql))
+        for col, values in expected.items():
+            for value in values - literals:
+                issues.append(f"Filter value '{value}' for column '{col}' is missing from the query")
+            # Literals compared to this column (col = '...' / col IN ('...', ...))
+            pattern = rf"\b{re.escape(col)}\s*(?:=\s*('(?:[^']|'')*')|IN\s*\(([^)]*)\))"
+            for eq, in_list in re.findall(pattern, sql, re.IGNORECASE):
+                used = set(string_literals(eq or in_list))
+                for value in used - values:
+                    issues.append(f"Column '{col}' is filtered on '{value}', which is not a matched value")
+
+    def validate(self, text: str, fuzz_match=None) -> StaticValidationResult:
+        sql = extract_sql(text or '')
+        issues = []
+        body = sql.rstrip().rstrip(';')
+        if not body:
+            issues.append("No SQL statement found")
+        elif not re.match(r'(?is)^\s*(WITH|SELECT)\b', body):
+            issues.append("Only SELECT statements are allowed")
+        elif ';' in _STRING_LITERAL_RE.sub("''", body):
+            issues.append("Multiple statements are not allowed")
+        else:
+            self._check_compiles(body, issues)
+            self._check_filters(body, fuzz_match, issues)
+
+        with self._lock:
+            self.stats["fast_path" if not issues else "llm_fallback"] += 1
+        return StaticValidationResult(body, dict.fromkeys(issues))
+
+    def fast_path_rate(self) -> float:
+        total = self.stats["fast_path"] + self.stats["llm_fallback"]
+        return self.stats["fast_path"] / total if total else 0.0
+
+
+sql_validator = StaticSQLValidator()
@@ -0,0 +1,74 @@
+import os
+import inspect
+import logging
+import functools
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Opik tracing of nodes and chains. opik is only imported on the first traced
+# call (or by `warm_up`), so importing the pipeline does not pay for it; with
+# tracing disabled it is never imported at all.
+TRACING_ENABLED = (os.environ.get("TRACING_ENABLED", "1") not in ("0", "false", "False")
+                   and os.environ.get("OPIK_TRACK_DISABLE", "false").lower() not in ("1", "true", "yes"))
+
+_lock = threading.Lock()
+_tracer = None
+
+
+def track(**options):
+    """
+    Lazy `opik.track(**options)`: the real decorator is built on the first
+    call of the function. Returns the function unchanged when tracing is off.
+    """
+
+    def decorate(func):
+        if not TRACING_ENABLED:
+            return func
+        tracked = None
+
+        def resolve():
+            nonlocal tracked
+            if tracked is None:
+                import opik
+                tracked = opik.track(**options)(func)
+            return tracked
+
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                return await resolve()(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            return resolve()(*args, **kwargs)
+        return wrapper
+
+    return decorate
+
+
+def get_tracer():
+    """The shared LangChain OpikTracer, built on first use; None when tracing is off."""
+    global _tracer
+    if not TRACING_ENABLED:
+        return None
+    if _tracer is None:
+        with _lock:
+            if _tracer is None:
+                from opik.integrations.langchain import OpikTracer
+                _tracer = OpikTracer()
+    return _tracer
+
+
+def tracer_callbacks() -> list:
+    """Callbacks for a chain or graph invoke config."""
+    tracer = get_tracer()
+    return [tracer] if tracer is not None else []
+
+
+def warm_up():
+    """Import opik and build the tracer ahead of the first request."""
+    if TRACING_ENABLED:
+        import opik  # noqa: F401
+        get_tracer()
@@ -0,0 +1,134 @@
+import sys
+import time
+import logging
+import threading
+
+from rapidfuzz import utils
+
+from LangGRAPH_SQL.db_version import data_version_tracker
+
+logger = logging.getLogger(__name__)
+
+
+class ColumnValues:
+    """Distinct values of one column, kept ready for rapidfuzz."""
+    __slots__ = ("values", "processed", "version", "loaded_at", "nbytes")
+
+    def __init__(self, values, version):
+        # Originals are returned to callers; `processed` is what gets scored
+        self.values = values
+        self.processed = [utils.default_process(v) for v in values]
+        self.version = version
+        self.loaded_at = time.time()
+        self.nbytes = (
+            sys.getsizeof(self.values) + sys.getsizeof(self.processed)
+            + sum(sys.getsizeof(v) for v in self.values)
+            + sum(sys.getsizeof(v) for v in self.processed)
+        )
+
+
+class ValueIndex:
+    """
+    In-memory index of distinct (table, column) values used by fuzzy filter matching.
+
+    Each distinct set is loaded once. finance.db's data version is checked on every
+    lookup (a stat + `PRAGMA data_version`, well under a millisecond). When it moves,
+    every loaded column is marked stale and re-queried on its next lookup: row counts
+    or rowids cannot reveal an in-place UPDATE, and no cheaper check of the content
+    exists than the DISTINCT query itself. A reloaded set equal to the previous one
+    keeps its preprocessed values.
+    """
+
+    def __init__(self, engine, tracker=data_version_tracker):
+        self.engine = engine
+        self.tracker = tracker
+        self._lock = threading.RLock()
+        self._entries = {}
+        self._stale = set()
+        self._schema = None
+        self._version = None
+
+    def _execute(self, sql):
+        with self.engine.connect() as conn:
+            return conn.exec_driver_sql(sql).fetchall()
+
+    def schema(self) -> dict:
+        """Map of table -> {column: declared type}, read from SQLite once."""
+        if self._schema is None:
+            tables = [r[0] for r in self._execute(
+                "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+            )]
+            self._schema = {
+                t: {r[1]: (r[2] or '').upper() for r in self._execute(f'PRAGMA table_info("{t}")')}
+                for t in tables
+            }
+        return self._schema
+
+    def _check_identifiers(self, table_name, column_name):
+        # Names come from LLM output, so never interpolate unknown identifiers into SQL
+        schema = self.schema()
+        if table_name not in schema or column_name not in schema[table_name]:
+            raise ValueError(f"Unknown column '{table_name}.{column_name}'")
+
+    def _refresh_if_changed(self):
+        version = self.tracker.version()
+        if version == self._version:
+            return
+        if self._version is not None:
+            self._schema = None
+            self._stale.update(self._entries)
+            if self._entries:
+                logger.info("Value index: database changed, %d column(s) will be reloaded", len(self._entries))
+        self._version = version
+
+    def get(self, table_name: str, column_name: str) -> ColumnValues:
+        with self._lock:
+            self._refresh_if_changed()
+            key = (table_name, column_name)
+            entry = self._entries.get(key)
+            if entry is None or key in self._stale:
+                self._check_identifiers(table_name, column_name)
+                start_time = time.time()
+                rows = self._execute(
+                    f'SELECT DISTINCT "{column_name}" FROM "{table_name}" WHERE "{column_name}" IS NOT NULL'
+                )
+                values = [str(r[0]) for r in rows]
+                self._stale.discard(key)
+                if entry is not None and entry.values == values:
+                    entry.version = self._version
+                    return entry
+                entry = ColumnValues(values, self._version)
+                self._entries[key] = entry
+                logger.info(
+                    "Value index: loaded %d distinct values for %s.%s (%.1f KiB) in %.3fs",
+                    len(entry.values), table_name, column_name, entry.nbytes / 1024, time.time() - start_time,
+                )
+            return entry
+
+    def warm_up(self, columns=None):
+        """
+        Preload distinct sets. `columns` is an iterable of (table, column); by default
+        every TEXT column in the database is loaded.
+        """
+        if columns is None:
+            columns = [
+                (t, c) for t, cols in self.schema().items()
+                for c, col_type in cols.items() if 'CHAR' in col_type or 'TEXT' in col_type
+            ]
+        for table_name, column_name in columns:
+            try:
+                self.get(table_name, column_name)
+            except Exception as e:
+                logger.warning("Value index warm-up skipped %s.%s: %s", table_name, column_name, e)
+
+    def memory_report(self) -> dict:
+        """Approximate bytes held per 'table.column'."""
+        with self._lock:
+            return {f"{t}.{c}": e.nbytes for (t, c), e in self._entries.items()}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._stale.clear()
+            self._schema = None
+            self._version = None
@@ -0,0 +1,204 @@
+"""
+Cold start: import-time profile of the pipeline and time to the first served request.
+
+Three measurements, each in a fresh process (LLM_MODE=fake, caches off):
+
+  import profile   python -X importtime -c "import LangGRAPH_SQL.graph_entry", summarised
+                   as the total and the heaviest packages (self time summed per
+                   package). The import budget fails if the total exceeds
+                   --budget-ms or if any module that should only load on first
+                   use (opik, pandas, IPython, the Gemini SDK, CrewAI) is
+                   imported eagerly.
+  no warm-up       server_v1 with GRAPH_WARMUP=0 / VALUE_INDEX_WARMUP=0: the first
+                   request pays for importing the pipeline.
+  warm-up          the default: the startup warm-up loads the pipeline, model
+                   clients and value index in the background; /ready answers 503
+                   until it is done, then the first request is sent.
+
+Times are seconds since the process was started (interpreter start included).
+The report is written to benchmarks/results/cold_start-<timestamp>.json; the
+exit status is 1 if the import budget is exceeded.
+
+Run from the project root:
+    python benchmarks/bench_cold_start.py [--budget-ms 2500] [--top 15]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import subprocess
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+PROFILED_MODULE = "LangGRAPH_SQL.graph_entry"
+# Loaded on first use (tracing, model clients) or not at all by the pipeline
+LAZY_MODULES = ("opik", "pandas", "IPython", "langchain_google_genai", "crewai")
+QUESTION = "top merchants by spend"
+
+
+def bench_env(tmp: str, **overrides) -> dict:
+    env = dict(
+        os.environ,
+        LLM_MODE="fake",
+        OPIK_TRACK_DISABLE="true",
+        LLM_CACHE_ENABLED="0",
+        ANSWER_CACHE_ENABLED="0",
+        LOG_CONSOLE="off",
+        LOG_FILE=os.path.join(tmp, "cold_start.jsonl"),
+        CHECKPOINT_DB_PATH=os.path.join(tmp, "checkpoints.db"),
+        INDEX_ADVISOR_DB_PATH=os.path.join(tmp, "query_plans.db"),
+        # The first request must go through the LLM stages (model clients, chains)
+        INTENT_MATCHING="0",
+    )
+    env.update(overrides)
+    return env
+
+
+# --- Import profile ---
+
+def parse_importtime(stderr: str):
+    """`-X importtime` lines -> [(module, depth, self_us, cumulative_us)] in output order."""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "| imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        depth = (len(name) - len(name.lstrip())) // 2 - 1
+        entries.append((name.strip(), depth, int(self_us), int(cumulative_us)))
+    return entries
+
+
+def profile_imports(env: dict, top: int) -> dict:
+    proc = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {PROFILED_MODULE}"],
+                          cwd=ROOT, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"Importing {PROFILED_MODULE} failed:\n{proc.stderr[-4000:]}")
+    entries = parse_importtime(proc.stderr)
+    imported = {name for name, _, _, _ in entries}
+    # Self time summed per top-level package (namespace packages such as
+    # langgraph have no cumulative line of their own)
+    packages = {}
+    for name, _, self_us, _ in entries:
+        package = name.split(".")[0]
+        packages[package] = packages.get(package, 0) + self_us
+    project = sorted(((name, self_us) for name, _, self_us, _ in entries if name.startswith("LangGRAPH_SQL")),
+                     key=lambda e: -e[1])
+    return {
+        "total_ms": round(sum(self_us for _, _, self_us, _ in entries) / 1000, 1),
+        "modules": len(entries),
+        "package_self_ms": {name: round(us / 1000, 1) for name, us in
+                            sorted(packages.items(), key=lambda p: -p[1])[:top]},
+        "project_self_ms": {name: round(us / 1000, 1) for name, us in project[:top]},
+        "eager_lazy_modules": [m for m in LAZY_MODULES if m in imported],
+    }
+
+
+# --- First request ---
+
+def run_child() -> dict:
+    """Import the server, wait for /ready, serve one streamed run; seconds since the parent started us."""
+    started = float(os.environ["COLD_START_T0"])
+    since = lambda: round(time.time() - started, 3)
+
+    import server_v1
+    from fastapi.testclient import TestClient
+    marks = {"server_import_s": since()}
+    with TestClient(server_v1.app) as client:  # runs the startup event
+        while True:
+            ready = client.get("/ready")
+            if ready.status_code == 200:
+                break
+            if ready.json().get("status") == "error":
+                raise RuntimeError(f"Warm-up failed: {ready.json()}")
+            time.sleep(0.01)
+        marks["ready_s"] = since()
+        start = time.perf_counter()
+        body = client.post("/runs/stream", json={"input": {"user_query": QUESTION}}).text
+        if "event: end" not in body:
+            raise RuntimeError(f"First request did not complete:\n{body[-2000:]}")
+        marks["first_request_ms"] = round((time.perf_counter() - start) * 1000, 1)
+        marks["first_request_s"] = since()
+    return marks
+
+
+def first_request(env: dict) -> dict:
+    env = dict(env, COLD_START_T0=repr(time.time()))
+    proc = subprocess.run([sys.executable, os.path.abspath(__file__), "--child"],
+                          cwd=ROOT, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"Cold-start child failed:\n{proc.stderr[-4000:]}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True).stdout.strip()
+    except OSError:
+        return ""
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--budget-ms", type=float, default=2500,
+                        help=f"maximum -X importtime total for {PROFILED_MODULE}")
+    parser.add_argument("--top", type=int, default=15, help="packages / project modules listed in the profile")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        import logging
+        logging.disable(logging.CRITICAL)
+        print(json.dumps(run_child()))
+        sys.exit(0)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "machine": f"{platform.system()} {platform.machine()}, {os.cpu_count()} CPUs",
+            "budget_ms": args.budget_ms,
+        },
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        profile = profile_imports(bench_env(tmp), args.top)
+        report["import_profile"] = profile
+        print(f"import {PROFILED_MODULE}: {profile['total_ms']:.0f} ms across {profile['modules']} modules "
+              f"(budget {args.budget_ms:.0f} ms)")
+        print(f"\n{'package':<36}{'self ms':>14}")
+        for name, ms in profile["package_self_ms"].items():
+            print(f"{name:<36}{ms:>14.1f}")
+        print(f"\n{'project module':<36}{'self ms':>14}")
+        for name, ms in profile["project_self_ms"].items():
+            print(f"{name:<36}{ms:>14.1f}")
+
+        report["first_request"] = {
+            "no_warmup": first_request(bench_env(tmp, GRAPH_WARMUP="0", VALUE_INDEX_WARMUP="0")),
+            "warmup": first_request(bench_env(tmp, GRAPH_WARMUP="1", VALUE_INDEX_WARMUP="1")),
+        }
+    print(f"\n{'server':<14}{'imported s':>12}{'ready s':>10}{'first request ms':>18}{'served s':>10}")
+    for label, marks in report["first_request"].items():
+        print(f"{label:<14}{marks['server_import_s']:>12.2f}{marks['ready_s']:>10.2f}"
+              f"{marks['first_request_ms']:>18.0f}{marks['first_request_s']:>10.2f}")
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, f"cold_start-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {path}")
+
+    failures = []
+    if profile["total_ms"] > args.budget_ms:
+        failures.append(f"import time {profile['total_ms']:.0f} ms exceeds the {args.budget_ms:.0f} ms budget")
+    if profile["eager_lazy_modules"]:
+        failures.append(f"imported eagerly: {', '.join(profile['eager_lazy_modules'])}")
+    if failures:
+        print("IMPORT BUDGET EXCEEDED: " + "; ".join(failures))
+        sys.exit(1)
@@ -0,0 +1,125 @@
+"""
+Concurrency benchmark for the async graph path.
+
+Runs the full finance pipeline N times concurrently on one event loop, the way
+server_v1 streams runs, and compares wall time with a single run. The Gemini
+models are swapped for a chat model that answers from canned responses after a
+fixed latency, so the numbers show pipeline overhead and blocking, not provider
+speed. A ticker task records the worst event-loop stall while the runs are in
+flight.
+
+Run from the project root:
+    python benchmarks/bench_concurrency.py [N] [latency_seconds]
+"""
+import os
+import sys
+import time
+import asyncio
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Provider limits and caches would hide what is being measured
+os.environ.setdefault("LLM_RPM_LIMIT", "100000")
+os.environ.setdefault("LLM_TPM_LIMIT", "1000000000")
+os.environ.setdefault("LLM_CACHE_ENABLED", "0")
+os.environ.setdefault("ANSWER_CACHE_ENABLED", "0")
+os.environ.setdefault("CHECKPOINT_ENABLED", "0")
+# Measure the LLM pipeline, not the intent library shortcut
+os.environ.setdefault("INTENT_MATCHING", "0")
+os.environ.setdefault("OPIK_TRACK_DISABLE", "true")
+os.environ.setdefault("GOOGLE_API_KEY", "benchmark")
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatResult, ChatGeneration
+import langchain_google_genai
+
+LATENCY = float(sys.argv[2]) if len(sys.argv) > 2 else 0.5
+
+CANNED = [
+    ("subquestion generator", '[["total spend per merchant", "transactions"]]'),
+    ("schema selector", '[["total spend per merchant", "transactions", '
+                        '[["merchant", "merchant name"], ["amount", "transaction amount"]]]]'),
+    ("data column selector", '[["merchant", "merchant name"], ["amount", "transaction amount"]]'),
+    ("determine whether filters", '["no"]'),
+    ("SQLite query generator", "```sql\nSELECT merchant, SUM(amount) AS total FROM transactions "
+                               "GROUP BY merchant ORDER BY total DESC LIMIT 5;\n```"),
+    ("query validator", "```sql\nSELECT merchant, SUM(amount) AS total FROM transactions "
+                        "GROUP BY merchant ORDER BY total DESC LIMIT 5\n```"),
+]
+
+
+def _answer(messages):
+    text = "\n".join(str(m.content) for m in messages)
+    for marker, reply in CANNED:
+        if marker in text:
+            return reply
+    return "['orders']"
+
+
+class LatencyModel(BaseChatModel):
+    """Chat model with a fixed response latency (sync sleep / async sleep)."""
+    model: str = "gemini-2.5-flash"
+    temperature: float = 0
+
+    def __init__(self, **kwargs):
+        super().__init__(model=kwargs.get("model", "gemini-2.5-flash"), temperature=kwargs.get("temperature", 0))
+
+    @property
+    def _llm_type(self):
+        return "latency-benchmark"
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        time.sleep(LATENCY)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=_answer(messages)))])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs):
+        await asyncio.sleep(LATENCY)
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=_answer(messages)))])
+
+
+langchain_google_genai.ChatGoogleGenerativeAI = LatencyModel
+
+from LangGRAPH_SQL.graph_entry import sql_pipeline_app  # noqa: E402
+
+
+async def stream_run(query: str):
+    last = None
+    async for event in sql_pipeline_app.astream({"user_query": query}, stream_mode="values"):
+        last = event
+    return last
+
+
+async def measure(n: int):
+    stalls = []
+    done = asyncio.Event()
+
+    async def ticker():
+        while not done.is_set():
+            t = time.perf_counter()
+            await asyncio.sleep(0.01)
+            stalls.append(time.perf_counter() - t - 0.01)
+
+    tick = asyncio.create_task(ticker())
+    start = time.perf_counter()
+    results = await asyncio.gather(*(stream_run(f"Top 5 merchants by spending #{i}") for i in range(n)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await tick
+    ok = sum(1 for r in results if r and str(r.get("sql_query", "")).startswith("|"))
+    return elapsed, max(stalls or [0.0]), ok
+
+
+async def main(n: int):
+    await measure(1)  # warm-up: imports, KB, value index, SQLite connections
+    single, single_stall, _ = await measure(1)
+    many, many_stall, ok = await measure(n)
+    print(f"LLM latency per call: {LATENCY:.2f}s")
+    print(f"{'runs':>6} {'wall (s)':>10} {'max loop stall (ms)':>20} {'ok':>5}")
+    print(f"{1:>6} {single:>10.2f} {single_stall * 1000:>20.1f} {1:>5}")
+    print(f"{n:>6} {many:>10.2f} {many_stall * 1000:>20.1f} {ok:>5}")
+    print(f"Concurrency efficiency: {single * n / many:.1f}x of ideal {n}x")
+
+
+if __name__ == "__main__":
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 20))
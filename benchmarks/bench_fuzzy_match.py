@@ -0,0 +1,48 @@
+"""
+Micro-benchmark: per-value extract loop vs. one batched rapidfuzz.cdist call.
+
+Run from the project root:
+    python benchmarks/bench_fuzzy_match.py
+"""
+import os
+import sys
+import time
+import random
+import string
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from LangGRAPH_SQL.value_index import ColumnValues
+from LangGRAPH_SQL.fuzzy_wuzzy import score_loop, score_batch
+
+SIZES = [10_000, 50_000, 100_000]
+QUERY_COUNTS = [1, 5, 20]
+REPEATS = 3
+
+
+def synthetic_merchants(n, seed=42):
+    rng = random.Random(seed)
+    words = ["".join(rng.choices(string.ascii_uppercase, k=rng.randint(3, 9))) for _ in range(2000)]
+    return [f"{rng.choice(words)} {rng.choice(words)} {i}" for i in range(n)]
+
+
+def best_of(fn, *args):
+    best = float('inf')
+    for _ in range(REPEATS):
+        start = time.perf_counter()
+        fn(*args)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+if __name__ == "__main__":
+    print(f"{'distinct':>10} {'queries':>8} {'loop (ms)':>10} {'batch (ms)':>11} {'speedup':>8}")
+    for size in SIZES:
+        entry = ColumnValues(synthetic_merchants(size), version=None)
+        rng = random.Random(size)
+        for n_queries in QUERY_COUNTS:
+            queries = [v.lower()[:-2] for v in rng.sample(entry.values, n_queries)]
+            loop_s = best_of(score_loop, entry, queries)
+            batch_s = best_of(score_batch, entry, queries)
+            assert [r[0][0] for r in score_loop(entry, queries) if r] == [r[0][0] for r in score_batch(entry, queries) if r]
+            print(f"{size:>10} {n_queries:>8} {loop_s * 1000:>10.1f} {batch_s * 1000:>11.1f} {loop_s / batch_s:>7.1f}x")
@@ -0,0 +1,163 @@
+"""
+Intent library: classification accuracy on a labelled question set and latency with / without it.
+
+  classification   every question of QUESTIONS is classified (reference date
+                   REFERENCE_DATE, inside the sample ledger) and compared with its
+                   label: the template that should answer it, or None when it
+                   must fall through to the LLM pipeline. A wrong template is the
+                   costly error (a fast wrong answer); a missed match only costs
+                   latency. Every rendered SQL is also run through the static
+                   validator (compiles against finance.db, reads only KB columns).
+  pipeline         each question runs through the async pipeline with
+                   INTENT_MATCHING off and on (LLM_MODE=fake, LLM_FAKE_LATENCY
+                   seconds per call); mean latency is reported for the questions
+                   the library answers and for the ones it passes on.
+
+The report is written to benchmarks/results/intents-<timestamp>.json.
+
+Run from the project root:
+    python benchmarks/bench_intents.py [--latency 0.5] [--skip-pipeline]
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import statistics
+from datetime import date, datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+# Inside finance.db's sample data, so relative periods select rows
+REFERENCE_DATE = date(2026, 1, 20)
+
+# (question, template expected to answer it or None for the LLM pipeline)
+QUESTIONS = [
+    ("Top merchants by spend", "top_merchants"),
+    ("Top 3 merchants by spend last month", "top_merchants"),
+    ("Which merchant did I spend the most at in the Transport category?", "top_merchants"),
+    ("What are my 10 biggest merchants this year?", "top_merchants"),
+    ("How much did I spend at the top merchant last month?", "top_merchants"),
+    ("How much did I spend on food last month?", "total_spend"),
+    ("How much did I spend at Amazn?", "total_spend"),
+    ("How much did I spend at Starbucks in January?", "total_spend"),
+    ("Total spending in the past 3 months", "total_spend"),
+    ("How much did I spend between 2025-12-01 and 2025-12-31?", "total_spend"),
+    ("Spending by category last month", "spend_by_category"),
+    ("Show my spend per category for December 2025", "spend_by_category"),
+    ("Am I over budget?", "budget_status"),
+    ("Which categories went over their monthly budget in December 2025?", "budget_status"),
+    ("Am I within budget on Shopping last month?", "budget_status"),
+    ("Any subscription price increases?", "subscription_price_changes"),
+    ("Compare what I expect to pay for subscriptions with what I actually paid those services",
+     "subscription_price_changes"),
+    ("List my recurring subscriptions and their expected amounts", "subscriptions"),
+    ("What subscriptions do I have?", "subscriptions"),
+    # Shapes the templates cannot express: must reach the LLM pipeline
+    ("What is my average daily spending?", None),
+    ("Top 5 merchants by spend on weekends", None),
+    ("How much did I spend excluding Amazon?", None),
+    ("How much did I spend at Amazon and Zara?", None),
+    ("What was my total income this year?", None),
+    ("What is the monthly limit for Shopping?", None),
+    ("Am I over budget in the last 3 months?", None),
+    ("Which merchants did I visit more than 5 times?", None),
+    ("How did my food spending change month over month?", None),
+]
+
+parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+parser.add_argument("--latency", default="0.5", help="LLM_FAKE_LATENCY in seconds, unless already set")
+parser.add_argument("--skip-pipeline", action="store_true", help="only run the classification part")
+args = parser.parse_args()
+
+os.environ.setdefault("LLM_MODE", "fake")
+os.environ.setdefault("LLM_FAKE_LATENCY", args.latency)
+os.environ.setdefault("LLM_CACHE_ENABLED", "0")
+os.environ.setdefault("ANSWER_CACHE_ENABLED", "0")
+os.environ.setdefault("CHECKPOINT_ENABLED", "0")
+os.environ.setdefault("OPIK_TRACK_DISABLE", "true")
+os.environ.setdefault("LOG_CONSOLE", "off")
+# Provider limits would hide what is being measured
+os.environ.setdefault("LLM_RPM_LIMIT", "100000")
+os.environ.setdefault("LLM_TPM_LIMIT", "1000000000")
+
+from LangGRAPH_SQL.intent_library import intent_library
+from LangGRAPH_SQL.sql_validator import sql_validator
+
+
+def classification() -> dict:
+    rows = []
+    print(f"{'question':<72}{'expected':<28}{'got':<28}{'conf':>6}  outcome")
+    for question, expected in QUESTIONS:
+        start = time.perf_counter()
+        match = intent_library.classify(question, today=REFERENCE_DATE)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        got = match.intent if match.matched else None
+        issues = sql_validator.validate(match.sql).issues if match.matched else []
+        rows.append({"question": question, "expected": expected, "got": got, "confidence": round(match.confidence, 3),
+                     "outcome": match.outcome, "slots": match.slots, "ms": round(elapsed_ms, 3),
+                     "sql_issues": issues})
+        flag = "" if got == expected else "  <-- MISMATCH"
+        if issues:
+            flag += f"  SQL: {issues}"
+        print(f"{question[:70]:<72}{str(expected):<28}{str(got):<28}{match.confidence:>6.2f}  {match.outcome}{flag}")
+
+    answerable = [r for r in rows if r["expected"]]
+    matched = [r for r in rows if r["got"]]
+    summary = {
+        "questions": len(rows),
+        "coverage": round(sum(r["got"] == r["expected"] for r in answerable) / len(answerable), 3),
+        "wrong_template": sum(1 for r in matched if r["got"] != r["expected"]),
+        "invalid_sql": sum(1 for r in matched if r["sql_issues"]),
+        "classify_ms_median": round(statistics.median(r["ms"] for r in rows), 3),
+        "rows": rows,
+    }
+    print(f"\ncoverage {summary['coverage']:.0%} of answerable questions, {summary['wrong_template']} wrong "
+          f"template(s), {summary['invalid_sql']} invalid SQL, classify {summary['classify_ms_median']:.2f} ms median")
+    return summary
+
+
+async def pipeline() -> dict:
+    from LangGRAPH_SQL import graph_entry
+    await graph_entry.arun_sql_pipeline("warm-up question")  # imports, KB, value index
+    matched = {q for q, _ in QUESTIONS if intent_library.classify(q).matched}
+    results = {}
+    for enabled in (False, True):
+        graph_entry.INTENT_MATCHING = enabled
+        latencies = {"answered by templates": [], "passed to LLM": []}
+        for question, _ in QUESTIONS:
+            start = time.perf_counter()
+            await graph_entry.arun_sql_pipeline(question)
+            kind = "answered by templates" if question in matched else "passed to LLM"
+            latencies[kind].append(time.perf_counter() - start)
+        results["on" if enabled else "off"] = {k: round(statistics.mean(v), 3) for k, v in latencies.items() if v}
+
+    print(f"\n{'intent matching':<18}{'answered by templates s':>26}{'passed to LLM s':>18}")
+    for mode, r in results.items():
+        print(f"{mode:<18}{r.get('answered by templates', 0):>26.3f}{r.get('passed to LLM', 0):>18.3f}")
+    return results
+
+
+if __name__ == "__main__":
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "llm_mode": os.environ["LLM_MODE"],
+            "fake_latency": os.environ["LLM_FAKE_LATENCY"],
+            "reference_date": REFERENCE_DATE.isoformat(),
+        },
+        "classification": classification(),
+    }
+    if not args.skip_pipeline:
+        report["pipeline"] = asyncio.run(pipeline())
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, f"intents-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, default=str)
+    print(f"\nResults written to {path}")
+    if report["classification"]["wrong_template"] or report["classification"]["invalid_sql"]:
+        sys.exit(1)
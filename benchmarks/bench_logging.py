@@ -0,0 +1,156 @@
+"""
+Logging overhead per request: synchronous handlers vs the queue pipeline.
+
+Runs the finance pipeline once (LLM_MODE=fake) and captures every log call it
+makes, then replays that request's log calls many times under two setups:
+
+  sync   - the previous configuration: f-strings formatted by the caller and
+           written by a FileHandler + StreamHandler in the request thread
+  queue  - log_config: lazy %-formatting, ContextFilter (run/thread/node ids,
+           per-node level and sampling), LazyQueueHandler -> background writer
+           (rotating JSON file + console)
+
+The caller-side time per request is what a request pays; "drained" includes the
+writer thread finishing the backlog. Console output goes to /dev/null in both
+setups so the terminal does not dominate.
+
+Run from the project root:
+    python benchmarks/bench_logging.py [requests] [threads]
+"""
+import os
+import sys
+import time
+import uuid
+import logging
+import tempfile
+import threading
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ.setdefault("LLM_MODE", "fake")
+os.environ.setdefault("LLM_CACHE_ENABLED", "0")
+os.environ.setdefault("ANSWER_CACHE_ENABLED", "0")
+os.environ.setdefault("CHECKPOINT_ENABLED", "0")
+# Measure the LLM pipeline, not the intent library shortcut
+os.environ.setdefault("INTENT_MATCHING", "0")
+os.environ.setdefault("OPIK_TRACK_DISABLE", "true")
+os.environ.setdefault("LOG_CONSOLE", "off")
+
+from LangGRAPH_SQL import log_config
+from LangGRAPH_SQL.log_config import log_context, node_var
+
+# Record-creation flags as the old basicConfig setup had them (configure_logging turns them off)
+_STOCK_FLAGS = {name: getattr(logging, name) for name in
+                ("_srcfile", "logProcesses", "logMultiprocessing", "logAsyncioTasks")}
+
+
+class _Capture(logging.Handler):
+    def __init__(self):
+        super().__init__(logging.DEBUG)
+        self.calls = []
+
+    def emit(self, record):
+        if record.name.startswith("LangGRAPH_SQL"):
+            self.calls.append((record.name, record.levelno, record.msg, record.args or (), node_var.get()))
+
+
+def capture_request():
+    """The (logger, level, msg, args, node) calls made by one pipeline run."""
+    from LangGRAPH_SQL.graph_entry import run_sql_pipeline
+    log_config.shutdown_logging()
+    capture = _Capture()
+    root = logging.getLogger()
+    root.addHandler(capture)
+    root.setLevel(logging.DEBUG)
+    run_sql_pipeline("top merchants by spend")
+    root.removeHandler(capture)
+    return capture.calls
+
+
+def replay_sync(calls, n):
+    for _ in range(n):
+        for name, level, msg, args, node in calls:
+            # Before: every line was an INFO-or-higher f-string, formatted up front
+            logging.getLogger(name).log(max(level, logging.INFO), msg % args if args else msg)
+
+
+def replay_queue(calls, n):
+    for _ in range(n):
+        with log_context(run_id=str(uuid.uuid4()), thread_id=str(uuid.uuid4())):
+            for name, level, msg, args, node in calls:
+                token = node_var.set(node)
+                logging.getLogger(name).log(level, msg, *args)
+                node_var.reset(token)
+
+
+def run(replay, calls, requests, threads):
+    per_thread = max(1, requests // threads)
+    workers = [threading.Thread(target=replay, args=(calls, per_thread)) for _ in range(threads)]
+    start = time.perf_counter()
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    return time.perf_counter() - start, per_thread * threads
+
+
+def setup_sync(tmp, devnull):
+    log_config.shutdown_logging()
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    formatter = logging.Formatter(log_config.TEXT_FORMAT, log_config.TEXT_DATEFMT)
+    for handler in (logging.FileHandler(os.path.join(tmp, "sync.log"), encoding='utf-8'),
+                    logging.StreamHandler(devnull)):
+        handler.setFormatter(formatter)
+        root.addHandler(handler)
+    root.setLevel(logging.INFO)
+    for name, value in _STOCK_FLAGS.items():
+        setattr(logging, name, value)
+
+
+def teardown_sync():
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        handler.close()
+        root.removeHandler(handler)
+
+
+def setup_queue(tmp, devnull, console="text", sample_rate="1.0"):
+    log_config.LOG_FILE = os.path.join(tmp, f"queue-{sample_rate}.jsonl")
+    log_config.LOG_CONSOLE = console
+    log_config.LOG_SAMPLE_RATE = sample_rate
+    stderr, sys.stderr = sys.stderr, devnull
+    try:
+        log_config.configure_logging(force=True)
+    finally:
+        sys.stderr = stderr
+
+
+def main(requests=2000, threads=1):
+    calls = capture_request()
+    info_lines = sum(1 for c in calls if c[1] >= logging.INFO)
+    print(f"One request logs {len(calls)} calls ({info_lines} at INFO or above, "
+          f"{len(calls) - info_lines} demoted to DEBUG)")
+    print(f"{requests} requests on {threads} thread(s)\n")
+    print(f"{'setup':<28}{'caller us/req':>14}{'drained us/req':>16}{'req/s (drained)':>17}")
+
+    devnull = open(os.devnull, 'w')
+    with tempfile.TemporaryDirectory() as tmp:
+        setup_sync(tmp, devnull)
+        elapsed, done = run(replay_sync, calls, requests, threads)
+        teardown_sync()
+        print(f"{'sync file+console':<28}{elapsed / done * 1e6:>14.1f}{elapsed / done * 1e6:>16.1f}{done / elapsed:>17,.0f}")
+
+        for label, sample_rate in (("queue json+console", "1.0"), ("queue, LOG_SAMPLE_RATE=0.1", "0.1")):
+            setup_queue(tmp, devnull, sample_rate=sample_rate)
+            start = time.perf_counter()
+            elapsed, done = run(replay_queue, calls, requests, threads)
+            log_config.shutdown_logging()  # waits for the writer to drain the queue
+            drained = time.perf_counter() - start
+            print(f"{label:<28}{elapsed / done * 1e6:>14.1f}{drained / done * 1e6:>16.1f}{done / drained:>17,.0f}")
+    devnull.close()
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000, int(sys.argv[2]) if len(sys.argv) > 2 else 1)
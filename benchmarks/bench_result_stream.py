@@ -0,0 +1,95 @@
+"""
+First-batch latency and peak memory of the streaming result executor.
+
+Builds a throwaway `transactions` table with 1M rows and compares the old
+approach (fetch everything, concatenate a markdown string) with
+result_stream.iter_encoded for growing result sizes. Time to the first batch
+and peak traced memory of the streaming path should stay flat as the result grows.
+
+Run from the project root:
+    python benchmarks/bench_result_stream.py [rows]
+"""
+import os
+import sys
+import time
+import random
+import sqlite3
+import tempfile
+import tracemalloc
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text
+
+from LangGRAPH_SQL.result_stream import encode_token, iter_encoded
+
+MERCHANTS = ["Amazon", "Starbucks", "Netflix", "Uber", "Zomato", "Walmart", "Target", "Shell"]
+CATEGORIES = ["Food", "Shopping", "Transport", "Entertainment", "Bills"]
+
+
+def build_db(path: str, rows: int):
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE transactions (id INTEGER PRIMARY KEY, date TEXT, merchant TEXT, category TEXT, amount REAL)")
+    rng = random.Random(42)
+    chunk = 50000
+    for start in range(0, rows, chunk):
+        conn.executemany(
+            "INSERT INTO transactions VALUES (?, ?, ?, ?, ?)",
+            [(i, f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}", rng.choice(MERCHANTS),
+              rng.choice(CATEGORIES), round(rng.uniform(1, 2000), 2))
+             for i in range(start, min(start + chunk, rows))]
+        )
+    conn.commit()
+    conn.close()
+
+
+def run_concat(engine, sql):
+    start = time.perf_counter()
+    with engine.connect() as connection:
+        result = connection.execute(text(sql))
+        columns = result.keys()
+        rows = result.fetchall()
+        md_table = f"| {' | '.join(columns)} |\n"
+        md_table += f"| {' | '.join(['---'] * len(columns))} |\n"
+        for row in rows:
+            md_table += f"| {' | '.join(map(str, row))} |\n"
+    # Nothing can be sent before the whole table exists
+    return time.perf_counter() - start
+
+
+def run_stream(engine, sql, fmt):
+    start = time.perf_counter()
+    first = None
+    for _ in iter_encoded(engine, encode_token({"sql": sql, "offset": 0}), fmt):
+        if first is None:
+            first = time.perf_counter() - start
+    return first
+
+
+def measure(fn, *args):
+    tracemalloc.start()
+    first = fn(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return first, peak / 1e6
+
+
+if __name__ == "__main__":
+    total_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        print(f"Building {total_rows:,} rows ...")
+        build_db(db_path, total_rows)
+        engine = create_engine(f"sqlite:///{db_path}")
+
+        print(f"{'rows':>10} {'mode':>10} {'first batch (s)':>16} {'peak MB':>9}")
+        for limit in (1_000, 100_000, total_rows):
+            sql = f"SELECT * FROM transactions ORDER BY id LIMIT {limit}"
+            for label, fn, args in (
+                ("concat", run_concat, (engine, sql)),
+                ("markdown", run_stream, (engine, sql, "markdown")),
+                ("jsonl", run_stream, (engine, sql, "jsonl")),
+                ("csv", run_stream, (engine, sql, "csv")),
+            ):
+                first, peak = measure(fn, *args)
+                print(f"{limit:>10,} {label:>10} {first:>16.4f} {peak:>9.1f}")
@@ -0,0 +1,76 @@
+"""
+Recall and prompt-size report for the offline schema retriever.
+
+For a fixed set of finance questions with hand-labelled relevant columns, reports
+recall@k of SchemaRetriever.search and the schema tokens each prompt stage would
+send at a few token budgets.
+
+Run from the project root:
+    python benchmarks/bench_schema_retrieval.py
+"""
+import os
+import sys
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from LangGRAPH_SQL.kb_service import kb_service
+from LangGRAPH_SQL.schema_retriever import SchemaRetriever, estimate_text_tokens
+
+# question -> relevant (table, column) pairs
+SAMPLE_QUESTIONS = {
+    "Am I over budget this month?": [
+        ("transactions", "amount"), ("transactions", "category"), ("transactions", "date"),
+        ("budgets", "category"), ("budgets", "monthly_limit"),
+    ],
+    "Top 5 merchants by spending": [("transactions", "merchant"), ("transactions", "amount")],
+    "How much did I spend on food last month?": [
+        ("transactions", "amount"), ("transactions", "category"), ("transactions", "date"),
+    ],
+    "Which subscriptions cost more than expected?": [
+        ("recurring_subscriptions", "service_name"), ("recurring_subscriptions", "expected_amount"),
+        ("transactions", "merchant"), ("transactions", "amount"),
+    ],
+    "What is my monthly limit for shopping?": [("budgets", "category"), ("budgets", "monthly_limit")],
+    "Show total income per month": [
+        ("transactions", "amount"), ("transactions", "category"), ("transactions", "date"),
+    ],
+    "List transactions at Starbucks": [("transactions", "merchant"), ("transactions", "id")],
+    "How much am I paying for Netflix?": [
+        ("recurring_subscriptions", "service_name"), ("recurring_subscriptions", "expected_amount"),
+    ],
+}
+
+K_VALUES = [3, 5, 8, 12]
+BUDGETS = [2000, 200, 100, 40]
+
+
+if __name__ == "__main__":
+    kb = kb_service.get()
+    retriever = SchemaRetriever(kb)
+
+    print("Recall@k over the sample question set")
+    for k in K_VALUES:
+        found = total = 0
+        for question, relevant in SAMPLE_QUESTIONS.items():
+            hits = {(t, c) for t, c, _ in retriever.search(question, k=k)}
+            found += len(hits & set(relevant))
+            total += len(relevant)
+        print(f"  recall@{k:<3} {found / total:.2f}")
+
+    print("\nSchema tokens per stage (summed over questions)")
+    print(f"  {'budget':>7} {'subquestion':>14} {'column_sel':>14} {'validation':>14}")
+    for budget in BUDGETS:
+        sizes = {"subquestion": [0, 0], "column_sel": [0, 0], "validation": [0, 0]}
+        for question, relevant in SAMPLE_QUESTIONS.items():
+            tables = list(kb)
+            sent = retriever.relevant_tables(question, tables, budget=budget)
+            sizes["subquestion"][0] += estimate_text_tokens(str(kb.table_descriptions(tables)))
+            sizes["subquestion"][1] += estimate_text_tokens(str(kb.table_descriptions(sent)))
+            for table_name in {t for t, _ in relevant}:
+                sizes["column_sel"][0] += estimate_text_tokens(kb.column_text(table_name))
+                sizes["column_sel"][1] += estimate_text_tokens(retriever.column_slice(table_name, question, budget=budget))
+            sql = "SELECT * FROM " + ", ".join(sorted({t for t, _ in relevant}))
+            sizes["validation"][0] += estimate_text_tokens(kb.schema_text)
+            sizes["validation"][1] += estimate_text_tokens(retriever.schema_slice(question, sql, budget=budget))
+        row = "  ".join(f"{sent:>6}/{full:<6}" for full, sent in sizes.values())
+        print(f"  {budget:>7}  {row}")
@@ -0,0 +1,162 @@
+"""
+Table/column selection: multi-call vs compact mode on a fixed question set.
+
+Each question of QUESTIONS runs through the selection graph (customer_agent's
+graph_final) once per SELECTION_MODE and is scored against the tables and
+columns an SQL answer needs:
+
+  latency        wall time of the selection step per question
+  llm calls      provider calls per question (subquestion, column selection, compact)
+  tokens         prompt / completion tokens per question, from the metrics registry
+  tables         questions whose selected tables are exactly the expected ones
+  column recall  expected (table, column) pairs that were selected
+  precision      selected (table, column) pairs that were expected
+  fallbacks      compact answers that failed KB validation and re-ran the multi-call path
+
+With the default LLM_MODE=fake every prompt gets a canned answer after
+LLM_FAKE_LATENCY seconds (0.8 unless set), so only latency, call and token
+counts mean anything. For accuracy, record the question set once against the
+provider (LLM_MODE=record) and compare the modes with LLM_MODE=replay.
+
+Run from the project root:
+    python benchmarks/bench_selection_modes.py [--modes multi,compact]
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+
+# question -> {table: columns the SQL needs}
+QUESTIONS = [
+    ("Top merchants by spend", {"transactions": {"merchant", "amount"}}),
+    ("How much did I spend on food last month?", {"transactions": {"amount", "category", "date"}}),
+    ("Which categories went over their monthly budget?",
+     {"transactions": {"category", "amount"}, "budgets": {"category", "monthly_limit"}}),
+    ("List my recurring subscriptions and their expected amounts",
+     {"recurring_subscriptions": {"service_name", "expected_amount"}}),
+    ("What was my total income in January 2026?", {"transactions": {"amount", "category", "date"}}),
+    ("How many transactions did I make at Amazon?", {"transactions": {"id", "merchant"}}),
+    ("Compare what I expect to pay for subscriptions with what I actually paid those services",
+     {"recurring_subscriptions": {"service_name", "expected_amount"}, "transactions": {"merchant", "amount"}}),
+    ("What is my average daily spending?", {"transactions": {"date", "amount"}}),
+    ("What is the monthly limit for Shopping?", {"budgets": {"category", "monthly_limit"}}),
+    ("Which merchant did I spend the most at in the Transport category?",
+     {"transactions": {"merchant", "amount", "category"}}),
+]
+SELECTION_CHAINS = ("chain_subquestion", "chain_column_extractor", "chain_compact_selection")
+
+
+os.environ.setdefault("LLM_MODE", "fake")
+os.environ.setdefault("LLM_FAKE_LATENCY", "0.8")
+os.environ.setdefault("LLM_CACHE_ENABLED", "0")
+os.environ.setdefault("OPIK_TRACK_DISABLE", "true")
+os.environ.setdefault("LOG_CONSOLE", "off")
+# Provider limits would hide what is being measured
+os.environ.setdefault("LLM_RPM_LIMIT", "100000")
+os.environ.setdefault("LLM_TPM_LIMIT", "1000000000")
+
+from LangGRAPH_SQL.log_config import configure_logging
+from LangGRAPH_SQL import customer_agent
+from LangGRAPH_SQL.metrics import metrics, LLM_CALLS, LLM_PROMPT_TOKENS, LLM_COMPLETION_TOKENS, COMPACT_SELECTIONS
+
+TABLES = ['transactions', 'budgets', 'recurring_subscriptions']
+
+
+def _usage():
+    """(calls, prompt tokens, completion tokens) of the selection chains so far."""
+    snap = metrics.snapshot()
+    calls = sum(v for (chain, outcome), v in snap[LLM_CALLS.name].items()
+                if chain in SELECTION_CHAINS and outcome != "cache")
+    prompt = sum(v for (chain,), v in snap[LLM_PROMPT_TOKENS.name].items() if chain in SELECTION_CHAINS)
+    completion = sum(v for (chain,), v in snap[LLM_COMPLETION_TOKENS.name].items() if chain in SELECTION_CHAINS)
+    return calls, prompt, completion
+
+
+def _selected(result):
+    """{(table, column)} from column_extract rows ["name of table:<t>", "<column>", "<description>"]."""
+    pairs = set()
+    for row in result.get('column_extract', []):
+        if len(row) >= 2 and str(row[0]).startswith("name of table:"):
+            pairs.add((row[0].split(":", 1)[1].strip(), str(row[1]).strip()))
+    return pairs
+
+
+def run_mode(mode: str) -> dict:
+    customer_agent.SELECTION_MODE = mode
+    rows = []
+    for question, expected in QUESTIONS:
+        fallbacks_before = metrics.snapshot()[COMPACT_SELECTIONS.name].get(("fallback",), 0)
+        calls_before, prompt_before, completion_before = _usage()
+        start = time.perf_counter()
+        result = customer_agent.graph_final.invoke({"user_query": question, "table_lst": TABLES})
+        elapsed = time.perf_counter() - start
+        calls, prompt, completion = _usage()
+
+        wanted = {(t, c) for t, cols in expected.items() for c in cols}
+        got = _selected(result)
+        rows.append({
+            "question": question,
+            "latency_s": round(elapsed, 3),
+            "llm_calls": calls - calls_before,
+            "prompt_tokens": prompt - prompt_before,
+            "completion_tokens": completion - completion_before,
+            "tables_exact": {t for t, _ in got} == set(expected),
+            "column_recall": round(len(wanted & got) / len(wanted), 3),
+            "column_precision": round(len(wanted & got) / len(got), 3) if got else 0.0,
+            "fallback": metrics.snapshot()[COMPACT_SELECTIONS.name].get(("fallback",), 0) > fallbacks_before,
+        })
+
+    return {
+        "latency_median_s": round(statistics.median(r["latency_s"] for r in rows), 3),
+        "latency_mean_s": round(statistics.mean(r["latency_s"] for r in rows), 3),
+        "llm_calls_per_question": round(statistics.mean(r["llm_calls"] for r in rows), 2),
+        "prompt_tokens_per_question": round(statistics.mean(r["prompt_tokens"] for r in rows)),
+        "completion_tokens_per_question": round(statistics.mean(r["completion_tokens"] for r in rows)),
+        "tables_exact": round(sum(r["tables_exact"] for r in rows) / len(rows), 3),
+        "column_recall": round(statistics.mean(r["column_recall"] for r in rows), 3),
+        "column_precision": round(statistics.mean(r["column_precision"] for r in rows), 3),
+        "fallbacks": sum(r["fallback"] for r in rows),
+        "questions": rows,
+    }
+
+
+def main(modes):
+    configure_logging()
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "llm_mode": os.environ["LLM_MODE"],
+            "fake_latency": os.environ["LLM_FAKE_LATENCY"],
+            "questions": len(QUESTIONS),
+        },
+        "modes": {},
+    }
+    print(f"{len(QUESTIONS)} questions, LLM_MODE={os.environ['LLM_MODE']}\n")
+    print(f"{'mode':<10}{'median s':>10}{'mean s':>9}{'calls/q':>9}{'prompt tok/q':>14}{'compl tok/q':>13}"
+          f"{'tables':>8}{'col recall':>12}{'precision':>11}{'fallbacks':>11}")
+    for mode in modes:
+        s = report["modes"][mode] = run_mode(mode)
+        print(f"{mode:<10}{s['latency_median_s']:>10.2f}{s['latency_mean_s']:>9.2f}{s['llm_calls_per_question']:>9.2f}"
+              f"{s['prompt_tokens_per_question']:>14}{s['completion_tokens_per_question']:>13}"
+              f"{s['tables_exact']:>8.0%}{s['column_recall']:>12.0%}{s['column_precision']:>11.0%}{s['fallbacks']:>11}")
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, f"selection_modes-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--modes", default="multi,compact", help="comma-separated SELECTION_MODE values")
+    args = parser.parse_args()
+    main([m.strip() for m in args.modes.split(",") if m.strip()])
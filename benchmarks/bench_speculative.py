@@ -0,0 +1,146 @@
+"""
+Speculative SQL generation: latency gained vs LLM calls wasted.
+
+Runs a fixed mix of questions through the async pipeline (as server_v1 does)
+with SPECULATIVE_GENERATION off and on. The fake model answers filter_check
+with "no filters" for most questions and with a merchant filter for the ones in
+FILTERED, so both outcomes of the speculation are exercised:
+
+  no filters   the SQL generated alongside filter_check is used: one LLM round trip saved
+  filters      the speculative call is discarded: one wasted call, no added latency
+
+Reported per mode: mean latency of each kind of question, LLM calls per run,
+and the speculative_* metrics (used / wasted / saved seconds). The report is
+written to benchmarks/results/speculative-<timestamp>.json.
+
+Run from the project root:
+    python benchmarks/bench_speculative.py [--latency 0.5]
+"""
+import os
+import sys
+import json
+import time
+import asyncio
+import argparse
+import statistics
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+
+parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+parser.add_argument("--latency", default="0.5", help="LLM_FAKE_LATENCY in seconds, unless already set")
+args = parser.parse_args()
+
+os.environ.setdefault("LLM_MODE", "fake")
+os.environ.setdefault("LLM_FAKE_LATENCY", args.latency)
+os.environ.setdefault("LLM_CACHE_ENABLED", "0")
+os.environ.setdefault("ANSWER_CACHE_ENABLED", "0")
+os.environ.setdefault("CHECKPOINT_ENABLED", "0")
+# Measure the LLM pipeline, not the intent library shortcut
+os.environ.setdefault("INTENT_MATCHING", "0")
+os.environ.setdefault("OPIK_TRACK_DISABLE", "true")
+os.environ.setdefault("LOG_CONSOLE", "off")
+# Provider limits would hide what is being measured
+os.environ.setdefault("LLM_RPM_LIMIT", "100000")
+os.environ.setdefault("LLM_TPM_LIMIT", "1000000000")
+
+from LangGRAPH_SQL import graph_entry
+from LangGRAPH_SQL.llm_provider import fake_responder
+from LangGRAPH_SQL.metrics import metrics, LLM_CALLS, SPECULATIVE_GENERATIONS, SPECULATIVE_SAVED
+
+QUESTIONS = [
+    "Top merchants by spend",
+    "How much did I spend last month?",
+    "What is my average daily spending?",
+    "Which categories went over budget?",
+    "List my recurring subscriptions",
+    "What was my total income this year?",
+    "How much did I spend at Amazon?",
+    "How much did I spend at Starbucks in January?",
+]
+# Questions whose filter_check answer asks for a filter (value matched by fuzz_filter)
+FILTERED = {"How much did I spend at Amazon?": "Amazn", "How much did I spend at Starbucks in January?": "Starbuks"}
+
+_respond = fake_responder.respond
+
+
+def _respond_with_filters(prompt_text: str) -> str:
+    if "determine whether filters" in prompt_text:
+        for question, value in FILTERED.items():
+            if question in prompt_text:
+                return f'[["yes"], ["transactions", "merchant", "{value}"]]'
+    return _respond(prompt_text)
+
+
+fake_responder.respond = _respond_with_filters
+
+
+def _counters():
+    snap = metrics.snapshot()
+    calls = sum(v for (_, outcome), v in snap[LLM_CALLS.name].items() if outcome != "cache")
+    speculation = {outcome: v for (outcome,), v in snap[SPECULATIVE_GENERATIONS.name].items()}
+    saved = snap[SPECULATIVE_SAVED.name].get((), {"sum": 0.0})["sum"]
+    return calls, speculation, saved
+
+
+async def run_mode(speculative: bool) -> dict:
+    graph_entry.SPECULATIVE_GENERATION = speculative
+    calls_before, spec_before, saved_before = _counters()
+    latencies = {"no filters": [], "filters": []}
+    for question in QUESTIONS:
+        start = time.perf_counter()
+        answer = await graph_entry.arun_sql_pipeline(question)
+        kind = "filters" if question in FILTERED else "no filters"
+        latencies[kind].append(time.perf_counter() - start)
+        if answer.startswith("Error"):
+            print(f"  {question!r}: {answer[:120]}")
+    calls, spec, saved = _counters()
+    return {
+        "latency": {kind: statistics.mean(values) for kind, values in latencies.items()},
+        "calls_per_run": (calls - calls_before) / len(QUESTIONS),
+        "used": spec.get("used", 0) - spec_before.get("used", 0),
+        "wasted": spec.get("wasted", 0) - spec_before.get("wasted", 0),
+        "saved_s": saved - saved_before,
+    }
+
+
+async def main():
+    await graph_entry.arun_sql_pipeline(QUESTIONS[0])  # warm-up: imports, KB, value index
+    print(f"{len(QUESTIONS)} questions ({len(FILTERED)} with filters), "
+          f"LLM latency {os.environ['LLM_FAKE_LATENCY']}s per call\n")
+    print(f"{'speculative':<13}{'no filters s':>14}{'filters s':>11}{'calls/run':>11}{'used':>6}{'wasted':>8}{'saved s':>9}")
+    results = {}
+    for speculative in (False, True):
+        r = results["on" if speculative else "off"] = await run_mode(speculative)
+        print(f"{'on' if speculative else 'off':<13}{r['latency']['no filters']:>14.2f}{r['latency']['filters']:>11.2f}"
+              f"{r['calls_per_run']:>11.2f}{r['used']:>6}{r['wasted']:>8}{r['saved_s']:>9.2f}")
+    counts = (("no filters", len(QUESTIONS) - len(FILTERED)), ("filters", len(FILTERED)))
+    total = {mode: sum(r["latency"][kind] * n for kind, n in counts) for mode, r in results.items()}
+    calls = {mode: r["calls_per_run"] * len(QUESTIONS) for mode, r in results.items()}
+    print(f"\nTotal latency {total['off']:.2f}s -> {total['on']:.2f}s "
+          f"({(total['on'] - total['off']) / total['off']:+.0%}); "
+          f"LLM calls {calls['off']:.0f} -> {calls['on']:.0f} ({calls['on'] - calls['off']:+.0f} wasted)")
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "llm_mode": os.environ["LLM_MODE"],
+            "fake_latency": os.environ["LLM_FAKE_LATENCY"],
+            "questions": len(QUESTIONS),
+            "filtered": len(FILTERED),
+        },
+        "modes": results,
+        "total_latency_s": {mode: round(t, 3) for mode, t in total.items()},
+    }
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    path = os.path.join(RESULTS_DIR, f"speculative-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {path}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,104 @@
+"""
+Repeated analytical queries against the tuned read-only engine profiles.
+
+Builds a throwaway `transactions` table (3M rows by default) and runs the same
+set of aggregate queries several times through engines with different
+mmap_size / cache_size / temp_store settings, reporting the mean latency per query. The
+first pass of each profile is discarded so every profile starts with the file
+in the OS page cache.
+
+Run from the project root:
+    python benchmarks/bench_sqlite_engine.py [rows] [repeats]
+"""
+import os
+import sys
+import time
+import random
+import sqlite3
+import tempfile
+import statistics
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sqlalchemy import create_engine, text
+
+from LangGRAPH_SQL.db_engine import create_readonly_engine
+
+MERCHANTS = ["Amazon", "Starbucks", "Netflix", "Uber", "Zomato", "Walmart", "Target", "Shell",
+             "Spotify", "Myntra", "Swiggy", "Zara", "Ola", "Burger King", "Tim Hortons"]
+CATEGORIES = ["Food", "Shopping", "Transport", "Entertainment", "Bills", "Income"]
+
+QUERIES = [
+    "SELECT merchant, SUM(amount) AS total FROM transactions GROUP BY merchant ORDER BY total DESC LIMIT 5",
+    "SELECT category, strftime('%Y-%m', date) AS month, SUM(amount) FROM transactions "
+    "WHERE category != 'Income' GROUP BY category, month",
+    "SELECT COUNT(*), AVG(amount) FROM transactions WHERE merchant = 'Starbucks'",
+    "SELECT date, SUM(amount) FROM transactions WHERE date >= '2024-06-01' GROUP BY date ORDER BY date",
+    "SELECT * FROM transactions WHERE amount > 1990 ORDER BY amount DESC LIMIT 20",
+]
+
+MB = 1 << 20
+
+PROFILES = {
+    # name: engine factory
+    "default create_engine": lambda path: create_engine(f"sqlite:///{path}"),
+    "ro, mmap 0, cache 2MB": lambda path: create_readonly_engine(path, mmap_size=0, cache_size=-2000),
+    "ro, mmap 0, cache 256MB": lambda path: create_readonly_engine(path, mmap_size=0, cache_size=-262144),
+    "ro, mmap 1GB, cache 2MB": lambda path: create_readonly_engine(path, mmap_size=1024 * MB, cache_size=-2000),
+    "ro, mmap 1GB, cache 256MB": lambda path: create_readonly_engine(path, mmap_size=1024 * MB, cache_size=-262144),
+    "ro, defaults": lambda path: create_readonly_engine(path),
+    "ro, defaults, temp MEMORY": lambda path: create_readonly_engine(path, temp_store="MEMORY"),
+}
+
+
+def build_db(path: str, rows: int):
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("CREATE TABLE transactions (id INTEGER PRIMARY KEY, date TEXT, merchant TEXT, "
+                 "category TEXT, amount REAL)")
+    rng = random.Random(7)
+    chunk = 100000
+    for start in range(0, rows, chunk):
+        conn.executemany(
+            "INSERT INTO transactions VALUES (?, ?, ?, ?, ?)",
+            [(i, f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}", rng.choice(MERCHANTS),
+              rng.choice(CATEGORIES), round(rng.uniform(1, 2000), 2))
+             for i in range(start, min(start + chunk, rows))]
+        )
+        conn.commit()
+    conn.close()
+
+
+def run_profile(engine, repeats: int):
+    timings = {q: [] for q in QUERIES}
+    with engine.connect() as conn:
+        for q in QUERIES:  # warm-up pass
+            conn.execute(text(q)).fetchall()
+        for _ in range(repeats):
+            for q in QUERIES:
+                start = time.perf_counter()
+                conn.execute(text(q)).fetchall()
+                timings[q].append(time.perf_counter() - start)
+    return timings
+
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 3_000_000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, "bench.db")
+        print(f"Building {rows:,} rows ...")
+        build_db(db_path, rows)
+        print(f"Database size: {os.path.getsize(db_path) / 1e6:.0f} MB, {repeats} repeats per query\n")
+
+        print(f"{'profile':<28} " + " ".join(f"{'q' + str(i + 1):>8}" for i in range(len(QUERIES))) + f" {'total':>9}")
+        baseline = None
+        for name, factory in PROFILES.items():
+            engine = factory(db_path)
+            timings = run_profile(engine, repeats)
+            engine.dispose()
+            means = [statistics.mean(timings[q]) * 1000 for q in QUERIES]
+            total = sum(means)
+            baseline = baseline or total
+            print(f"{name:<28} " + " ".join(f"{m:>8.1f}" for m in means)
+                  + f" {total:>7.1f}ms  ({baseline / total:.2f}x)")
@@ -0,0 +1,298 @@
+"""
+Benchmark suite for the local (non-LLM) work done per request, with a tracked baseline.
+
+For each data size a ledger is generated with database_generator_script.py
+(seeded, cached under .cache/bench/) and the benchmarks run in a fresh child
+process pointed at it with FINANCE_DB_PATH and LLM_MODE=fake, so nothing
+touches the network and graph import time is measured cold:
+
+    graph_import            import LangGRAPH_SQL.graph_entry (KB, engine, chains, compile)
+    graph_compile           StateGraph.compile() of the SQL pipeline
+    kb_load                 loading the knowledge base file into a fresh service
+    remove_duplicates       merging column selections from three domain graphs
+    parse_*                 regex / ast.literal_eval parsing of typical LLM outputs
+    extract_sql             SQL cleaning of a fenced, chatty LLM response
+    get_values_cold/warm    distinct values of transactions.merchant (index build / cached)
+    call_match              fuzzy-matching three filter values
+    intent_classify_*       intent library classification and slot extraction (matched / fall-through)
+    safe_executor_*         _execute_query: SQL cleaning, first page, markdown formatting
+    format_markdown_1000    markdown table of 1000 rows
+
+Every benchmark reports the median and minimum milliseconds per call, and
+`rel`: its minimum divided by the minimum of a fixed pure-Python calibration
+workload timed in the same process. Results are written to benchmarks/results/
+as JSON and compared with the committed benchmarks/baseline.json by `rel`, so
+the comparison carries across machines of different speed; a benchmark whose
+`rel` grew by more than --threshold (default 50%, to absorb differences in CPU
+caches, disks and SQLite builds between machines) is reported as a regression
+and the exit status is 1. A missing baseline is an error (exit status 2).
+The committed baseline covers 10,000 and 1,000,000 rows; other sizes are
+reported without comparison. --save-baseline runs the suite --baseline-runs
+times and keeps each benchmark's slowest `rel`, so run-to-run noise of the
+recording machine is not reported as a regression; on a dedicated machine a
+local baseline with a tighter --threshold can be used.
+
+Run from the project root:
+    python benchmarks/bench_suite.py [--sizes 10000,1000000,10000000] [--repeats 5]
+    python benchmarks/bench_suite.py --save-baseline     # record the current numbers as the baseline (3 runs)
+    python benchmarks/bench_suite.py --sizes 10000,1000000 --threshold 0.25   # compare tightly
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+BENCH_DIR = os.path.join(ROOT, '.cache', 'bench')
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+BASELINE_PATH = os.path.join(ROOT, 'benchmarks', 'baseline.json')
+DEFAULT_SIZES = [10_000, 1_000_000, 10_000_000]
+# Differences below this many milliseconds are noise, whatever the ratio
+NOISE_FLOOR_MS = 0.05
+
+ROUTER_OUTPUT = "```json\n['customer', 'orders', 'product']\n```"
+FILTER_OUTPUT = '[["yes"], ["transactions", "merchant", "Starbucks, Amazon"], ["transactions", "category", "Food"]]'
+SUBQUESTION_OUTPUT = ('Here are the subquestions:\n```json\n[["total spend per merchant", "transactions"], '
+                      '["monthly budget per category", "budgets"]]\n```')
+COLUMN_OUTPUT = ('[["merchant", "Merchant name, TEXT, e.g. Starbucks"], ["amount", "Amount, DECIMAL, e.g. 250.00"], '
+                 '["category", "Category, TEXT, e.g. Food"], ["date", "Date, DATE, e.g. 2025-01-01"]]')
+SQL_OUTPUT = ("Sure! Here is the query you asked for:\n```sql\nSELECT merchant, SUM(amount) AS total\n"
+              "FROM transactions\nWHERE category != 'Income'\nGROUP BY merchant\nORDER BY total DESC\nLIMIT 5;\n```\n"
+              "This returns the top merchants by spend.")
+EXECUTOR_QUERIES = {
+    "safe_executor_aggregate": "```sql\nSELECT merchant, SUM(amount) AS total FROM transactions "
+                               "WHERE category != 'Income' GROUP BY merchant ORDER BY total DESC LIMIT 5;\n```",
+    "safe_executor_filtered_page": "```sql\nSELECT * FROM transactions WHERE merchant = 'Starbucks' "
+                                   "ORDER BY date DESC;\n```",
+    "safe_executor_range": "```sql\nSELECT date, SUM(amount) FROM transactions WHERE date >= '2025-12-01' "
+                           "GROUP BY date ORDER BY date;\n```",
+}
+FILTER_VALUES = ["yes", ["transactions", "merchant", "starbuks, amazn, uber eats"]]
+INTENT_QUESTIONS = {
+    "intent_classify_matched": "How much did I spend at Starbuks on Food last month?",
+    "intent_classify_fallthrough": "What is my average daily spending at Starbucks on weekends?",
+}
+
+
+# --- Child: run the benchmarks against one database ---
+
+def measure(fn, repeats: int, inner: int = 1):
+    """Median / min milliseconds per call over `repeats` timed runs of `inner` calls (after one warm-up)."""
+    fn()
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(inner):
+            fn()
+        samples.append((time.perf_counter() - start) * 1000 / inner)
+    return {"median_ms": round(statistics.median(samples), 4), "min_ms": round(min(samples), 4)}
+
+
+def calibration_workload():
+    """Fixed CPU-bound work (sorting, hashing, JSON) that benchmarks are normalized by."""
+    data = [(i * 7919) % 10007 for i in range(20_000)]
+    json.loads(json.dumps(sorted(data)))
+    return len({str(v) for v in data})
+
+
+def synthetic_column_outputs(per_domain: int = 300):
+    """Three domain graph outputs with ~50% overlapping column selections."""
+    def domain(offset):
+        return {"column_extract": [["name of table:transactions", f"col_{(i + offset) % per_domain}", "description"]
+                                   for i in range(per_domain)]}
+    return {"cust_out": domain(0), "order_out": domain(per_domain // 2), "product_out": domain(per_domain // 4)}
+
+
+def run_child(repeats: int) -> dict:
+    calibration = [measure(calibration_workload, max(repeats, 10), inner=5)]
+    results = {}
+
+    start = time.perf_counter()
+    import LangGRAPH_SQL.graph_entry as graph_entry
+    import_ms = round((time.perf_counter() - start) * 1000, 2)
+    # Cold import happens once per process: a single sample
+    results["graph_import"] = {"median_ms": import_ms, "min_ms": import_ms}
+
+    from LangGRAPH_SQL import customer_agent, fuzzy_wuzzy
+    from LangGRAPH_SQL.kb_service import KnowledgeBaseService, kb_service
+    from LangGRAPH_SQL.value_index import ValueIndex
+    from LangGRAPH_SQL.sql_validator import extract_sql
+    from LangGRAPH_SQL.result_stream import format_markdown
+    from LangGRAPH_SQL.intent_library import intent_library
+
+    results["graph_compile"] = measure(lambda: graph_entry.builder_final.compile(), repeats)
+    results["kb_load"] = measure(lambda: KnowledgeBaseService(path=kb_service.path).get(), repeats)
+
+    outputs = synthetic_column_outputs()
+    results["remove_duplicates"] = measure(lambda: graph_entry.remove_duplicates(outputs), repeats, inner=20)
+    results["parse_router_output"] = measure(lambda: graph_entry._parse_router_output(ROUTER_OUTPUT), repeats, inner=1000)
+    results["parse_filter_response"] = measure(lambda: graph_entry._parse_filter_response(FILTER_OUTPUT, []), repeats, inner=1000)
+    results["parse_subquestions"] = measure(
+        lambda: customer_agent._parse_subquestions(customer_agent._extract_subquestion_list(SUBQUESTION_OUTPUT)),
+        repeats, inner=1000)
+    results["parse_column_selection"] = measure(
+        lambda: customer_agent._parse_column_selection("transactions", customer_agent._extract_column_list(COLUMN_OUTPUT)),
+        repeats, inner=1000)
+    results["parse_validated_query"] = measure(lambda: graph_entry._clean_validated_query(SQL_OUTPUT), repeats, inner=1000)
+    results["extract_sql"] = measure(lambda: extract_sql(SQL_OUTPUT), repeats, inner=1000)
+
+    results["get_values_cold"] = measure(
+        lambda: ValueIndex(fuzzy_wuzzy.engine).get("transactions", "merchant"), repeats)
+    results["get_values_warm"] = measure(lambda: fuzzy_wuzzy.get_values("transactions", "merchant"), repeats, inner=100)
+    results["call_match"] = measure(lambda: fuzzy_wuzzy.call_match(FILTER_VALUES), repeats)
+    for name, question in INTENT_QUESTIONS.items():
+        results[name] = measure(lambda q=question: intent_library.classify(q), repeats, inner=20)
+
+    for name, query in EXECUTOR_QUERIES.items():
+        results[name] = measure(lambda q=query: graph_entry._execute_query(q), repeats, inner=10)
+
+    columns = ["id", "date", "merchant", "amount", "category"]
+    rows = [(i, "2025-01-01", f"Merchant {i % 97}", round(i * 1.37, 2), "Food") for i in range(1000)]
+    results["format_markdown_1000"] = measure(lambda: format_markdown(columns, rows), repeats)
+
+    # Calibrated before and after, so drift during the run does not skew the unit
+    calibration.append(measure(calibration_workload, max(repeats, 10), inner=5))
+    results["calibration"] = min(calibration, key=lambda c: c["min_ms"])
+    unit = results["calibration"]["min_ms"]
+    for value in results.values():
+        value["rel"] = round(value["min_ms"] / unit, 4)
+    return results
+
+
+# --- Parent: databases, child processes, baseline comparison ---
+
+def ensure_database(rows: int) -> str:
+    """Seeded ledger with `rows` transactions, generated once and reused."""
+    os.makedirs(BENCH_DIR, exist_ok=True)
+    path = os.path.join(BENCH_DIR, f"finance_{rows}.db")
+    if not os.path.exists(path):
+        from database_generator_script import create_complete_database
+        create_complete_database(path, rows=rows, n_merchants=max(14, min(rows // 1000, 2000)), days=365,
+                                 skew=1.0, seed=42, csv_path=os.path.join(BENCH_DIR, 'no_statements.csv'),
+                                 end_date='2025-12-31')
+    return path
+
+
+def run_size(rows: int, repeats: int) -> dict:
+    db_path = ensure_database(rows)
+    with tempfile.TemporaryDirectory() as tmp:
+        env = dict(
+            os.environ,
+            FINANCE_DB_PATH=db_path,
+            LLM_MODE="fake",
+            OPIK_TRACK_DISABLE="true",
+            LLM_CACHE_ENABLED="0",
+            ANSWER_CACHE_ENABLED="0",
+            CHECKPOINT_DB_PATH=os.path.join(tmp, "checkpoints.db"),
+            INDEX_ADVISOR_DB_PATH=os.path.join(tmp, "query_plans.db"),
+        )
+        proc = subprocess.run([sys.executable, os.path.abspath(__file__), "--child", "--repeats", str(repeats)],
+                              cwd=ROOT, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f"Benchmark child for {rows} rows failed:\n{proc.stderr[-4000:]}")
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True).stdout.strip()
+    except OSError:
+        return ""
+
+
+def compare(current: dict, baseline: dict, threshold: float):
+    """Print current vs baseline normalized times (`rel`); return the list of regressions."""
+    regressions = []
+    print(f"\n{'size':>10} {'benchmark':<28} {'baseline':>10} {'current':>10} {'change':>8}   (rel = min / calibration)")
+    for size, benches in current["results"].items():
+        base_benches = baseline.get("results", {}).get(size, {})
+        for name, value in benches.items():
+            if name == "calibration":
+                continue
+            base = base_benches.get(name)
+            if base is None or "rel" not in base:
+                print(f"{size:>10} {name:<28} {'-':>10} {value['rel']:>10.4g} {'new':>8}")
+                continue
+            # Minimums are the least noisy statistic for short, CPU-bound runs
+            before, after = base["rel"], value["rel"]
+            change = (after - before) / before if before else 0.0
+            # The noise floor is absolute: scale it to this run's calibration unit
+            floor = NOISE_FLOOR_MS * value["rel"] / value["min_ms"] if value["min_ms"] else 0.0
+            flag = ""
+            if change > threshold and after - before > floor:
+                flag = "  REGRESSION"
+                regressions.append((size, name, before, after))
+            print(f"{size:>10} {name:<28} {before:>10.4g} {after:>10.4g} {change:>+7.0%}{flag}")
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[1])
+    parser.add_argument("--sizes", default=",".join(str(s) for s in DEFAULT_SIZES), help="comma-separated row counts")
+    parser.add_argument("--repeats", type=int, default=5)
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--save-baseline", action="store_true", help="write these results as the new baseline")
+    parser.add_argument("--baseline-runs", type=int, default=3, help="suite runs combined into a saved baseline")
+    parser.add_argument("--threshold", type=float, default=0.5, help="allowed relative slowdown before flagging (0.5 = 50%%)")
+    parser.add_argument("--child", action="store_true", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        import logging
+        logging.disable(logging.CRITICAL)
+        print(json.dumps(run_child(args.repeats)))
+        sys.exit(0)
+
+    import sqlite3
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "sqlite": sqlite3.sqlite_version,
+            "machine": f"{platform.system()} {platform.machine()}, {os.cpu_count()} CPUs",
+            "repeats": args.repeats,
+            "threshold": args.threshold,
+        },
+        "results": {},
+    }
+    for size in [int(s) for s in args.sizes.split(",") if s.strip()]:
+        print(f"Running benchmarks on {size:,} rows ...")
+        runs = [run_size(size, args.repeats) for _ in range(args.baseline_runs if args.save_baseline else 1)]
+        # A baseline keeps the slowest run of each benchmark: the noise seen on this machine is not a regression
+        report["results"][str(size)] = {name: max((run[name] for run in runs), key=lambda v: v["rel"])
+                                         for name in runs[0]}
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    stamp = datetime.now().strftime("%Y%m%d-%H%M%S")
+    for path in (os.path.join(RESULTS_DIR, f"bench_suite-{stamp}.json"), os.path.join(RESULTS_DIR, "latest.json")):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    print(f"Results written to {os.path.join(RESULTS_DIR, f'bench_suite-{stamp}.json')}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} regression(s) above {args.threshold:.0%} vs baseline "
+                  f"({baseline['meta'].get('commit', '?')})")
+            sys.exit(1)
+        print("\nNo regressions vs baseline.")
+    else:
+        print(f"ERROR: no baseline at {args.baseline}; restore the committed one or record one "
+              f"with --save-baseline.", file=sys.stderr)
+        sys.exit(2)
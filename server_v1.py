@@ -1,20 +1,34 @@
+import time
+# Reference point for the startup milestones below (interpreter start is not included)
+_PROCESS_START = time.perf_counter()
 import os
 import uuid
 import uvicorn
 import asyncio
 import logging
 import json
+import hmac
+import base64
+import threading
 from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import StreamingResponse
+from fastapi.responses import StreamingResponse, PlainTextResponse, JSONResponse
+from starlette.concurrency import iterate_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from typing import Any, Dict, List, Optional, Union
 from dotenv import load_dotenv
+from LangGRAPH_SQL.async_utils import run_blocking
+from LangGRAPH_SQL.checkpoint_store import get_run_store
+from LangGRAPH_SQL.coalescer import coalescer
+from LangGRAPH_SQL.query_guard import query_guard, QueryTimeoutError
+from LangGRAPH_SQL.index_advisor import index_advisor
+from LangGRAPH_SQL.metrics import metrics, RUNS_IN_FLIGHT, PIPELINE_LATENCY
+from LangGRAPH_SQL.log_config import configure_logging, bind_log_context
 
 # Load environment variables early
 load_dotenv()
 
-logging.basicConfig(level=logging.INFO)
+configure_logging()
 logger = logging.getLogger("server")
 
 app = FastAPI(title="LangGraph Premium Shim")
@@ -40,10 +54,88 @@ def get_graph():
         logger.info("Graph initialized successfully.")
     return graph
 
+def pipeline_input(query: str):
+    from LangGRAPH_SQL.graph_entry import pipeline_input as _pipeline_input
+    return _pipeline_input(query)
+
+# Import the pipeline, build the model clients and the tracer in the background
+# at startup; /ready answers 503 until this (and the value index warm-up) is done
+GRAPH_WARMUP = os.environ.get("GRAPH_WARMUP", "1") not in ("0", "false", "False")
+VALUE_INDEX_WARMUP = os.environ.get("VALUE_INDEX_WARMUP", "1") not in ("0", "false", "False")
+# Shared secret for admin endpoints that modify finance.db; unset disables them
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN", "")
+
+# Seconds from _PROCESS_START to each milestone: "warm_up", "first_request"
+_startup_seconds = {}
+_ready = threading.Event()
+_warm_up_error = None
+
+def _mark_startup(stage: str):
+    if stage not in _startup_seconds:
+        _startup_seconds[stage] = time.perf_counter() - _PROCESS_START
+        logger.info("Startup milestone %s at %.2fs", stage, _startup_seconds[stage])
+
+def _collect_startup_stats():
+    return [("startup_seconds", "gauge", "Seconds from process start to each startup milestone",
+             [({"stage": stage}, value) for stage, value in sorted(_startup_seconds.items())])]
+
+metrics.register_collector(_collect_startup_stats)
+
+def _warm_graph():
+    global _warm_up_error
+    try:
+        get_graph()
+        from LangGRAPH_SQL.llm_provider import warm_up_models
+        from LangGRAPH_SQL.tracing import warm_up as warm_up_tracing
+        warm_up_models()
+        warm_up_tracing()
+    except Exception as e:
+        _warm_up_error = str(e)
+        logger.error("Graph warm-up failed: %s", e, exc_info=True)
+
+def _warm_value_index():
+    try:
+        from LangGRAPH_SQL.fuzzy_wuzzy import value_index
+        value_index.warm_up()
+        logger.info("Value index warmed up: %s", value_index.memory_report())
+    except Exception as e:
+        logger.warning("Value index warm-up failed: %s", e)
+
+def _warm_up_all():
+    # One thread, in order: concurrent first imports would only contend for the import lock
+    if GRAPH_WARMUP:
+        _warm_graph()
+    if VALUE_INDEX_WARMUP:
+        _warm_value_index()
+    _mark_startup("warm_up")
+    _ready.set()
+
+@app.on_event("startup")
+async def warm_up():
+    """Load the pipeline and preload distinct filter values in the background so the first request is fast."""
+    if GRAPH_WARMUP or VALUE_INDEX_WARMUP:
+        asyncio.get_running_loop().run_in_executor(None, _warm_up_all)
+    else:
+        _ready.set()
+
+@app.get("/ready")
+async def readiness():
+    """Readiness probe: 503 until the background warm-up has finished (or failed)."""
+    if not _ready.is_set():
+        return JSONResponse({"status": "starting"}, status_code=503)
+    if _warm_up_error is not None:
+        return JSONResponse({"status": "error", "detail": _warm_up_error}, status_code=503)
+    return {"status": "ready", "startup_seconds": _startup_seconds}
+
 class ThreadCreate(BaseModel):
     thread_id: Optional[str] = None
     metadata: Optional[Dict[str, Any]] = None
 
+class ResultStreamRequest(BaseModel):
+    token: str
+    format: Optional[str] = "jsonl"
+    batch_size: Optional[int] = None
+
 class RunCreate(BaseModel):
     assistant_id: str
     input: Optional[Dict[str, Any]] = None
@@ -87,29 +179,59 @@ async def get_assistant(assistant_id: str):
         "name": "Autonomous SQL Analyst"
     }
 
+def _snapshot_to_dict(snapshot):
+    return {
+        "values": snapshot.values,
+        "next": list(snapshot.next),
+        "metadata": snapshot.metadata or {},
+        "created_at": snapshot.created_at,
+        "config": snapshot.config or {},
+        "parent_config": snapshot.parent_config or {},
+        "checkpoint_id": (snapshot.config or {}).get("configurable", {}).get("checkpoint_id"),
+    }
+
 @app.post("/threads")
 async def create_thread(data: ThreadCreate):
     """Thread creation for persistent sessions."""
-    thread_id = data.thread_id or str(uuid.uuid4())
-    return {"thread_id": thread_id, "metadata": data.metadata or {}}
+    return await run_blocking(get_run_store().create_thread, data.thread_id, data.metadata)
 
 @app.get("/threads/{thread_id}/state")
 async def get_thread_state(thread_id: str):
-    """Retrieve state - dummy response for now to satisfy UI."""
-    return {"values": {}, "next": [], "metadata": {}, "created_at": "2024-01-01T00:00:00Z", "config": {}, "parent_config": {}}
+    """Latest checkpointed state of a thread."""
+    active_graph = await run_blocking(get_graph)
+    if active_graph.checkpointer is None:
+        # CHECKPOINT_ENABLED=0: nothing is persisted
+        return {"values": {}, "next": [], "metadata": {}, "created_at": None, "config": {}, "parent_config": {}}
+    snapshot = await active_graph.aget_state({"configurable": {"thread_id": thread_id}})
+    return _snapshot_to_dict(snapshot)
 
 @app.post("/threads/search")
 async def search_threads(request: Request):
-    """Dummy thread search."""
-    return [{"thread_id": str(uuid.uuid4()), "metadata": {}, "created_at": "2024-01-01T00:00:00Z"}]
+    """Threads by metadata, newest first."""
+    try:
+        body = await request.json()
+    except Exception:
+        body = {}
+    body = body if isinstance(body, dict) else {}
+    return await run_blocking(
+        get_run_store().search_threads,
+        body.get("metadata"), body.get("limit", 10), body.get("offset", 0)
+    )
 
 @app.get("/threads/{thread_id}/history")
-async def get_thread_history(thread_id: str):
-    return []
+async def get_thread_history(thread_id: str, limit: int = 10):
+    """Checkpoints of a thread, newest first."""
+    active_graph = await run_blocking(get_graph)
+    if active_graph.checkpointer is None:
+        return []
+    history = []
+    async for snapshot in active_graph.aget_state_history({"configurable": {"thread_id": thread_id}}, limit=limit):
+        history.append(_snapshot_to_dict(snapshot))
+    return history
 
 @app.get("/threads/{thread_id}/runs")
-async def list_runs(thread_id: str):
-    return []
+async def list_runs(thread_id: str, limit: int = 10, offset: int = 0):
+    return await run_blocking(get_run_store().list_runs, thread_id, limit, offset)
 
 @app.post("/threads/{thread_id}/runs/wait")
 async def wait_run(thread_id: str, request: Request):
@@ -123,25 +245,35 @@ async def create_run_stream(thread_id: str = None, request: Request = None):
     # Log the raw request for debugging
     if request:
         body = await request.body()
-        logger.info(f"Raw request body: {body.decode('utf-8')}")
+        # Request bodies carry the whole question and history: debug only
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Raw request body: %s", body.decode('utf-8', 'replace'))
         try:
             data_dict = json.loads(body.decode('utf-8'))
-            logger.info(f"Parsed request: {data_dict}")
+            logger.debug("Parsed request: %s", data_dict)
         except:
             data_dict = {}
     else:
         data_dict = {}
     
     try:
-        active_graph = get_graph()
+        # First call imports the whole pipeline; keep that off the event loop
+        active_graph = await run_blocking(get_graph)
     except Exception as e:
-        logger.error(f"Failed to load graph: {str(e)}", exc_info=True)
+        logger.error("Failed to load graph: %s", e, exc_info=True)
         raise HTTPException(status_code=500, detail=f"Graph initialization failed: {str(e)}")
     
-    config = {"configurable": {"thread_id": thread_id or str(uuid.uuid4())}}
+    thread_id = thread_id or str(uuid.uuid4())
+    config = {"configurable": {"thread_id": thread_id}}
+    run_store = get_run_store()
+    run = await run_blocking(run_store.create_run, thread_id, data_dict.get("input"), data_dict.get("metadata"))
+    # Each request runs in its own task; the streaming task and the graph inherit this
+    bind_log_context(run_id=run["run_id"], thread_id=thread_id)
     
     async def event_generator():
+        status, error = "success", None
         try:
+            await run_blocking(run_store.update_run, run["run_id"], "running")
             # Handle various input formats
             user_input = data_dict.get("input", {})
             query = ""
@@ -170,20 +302,155 @@ async def create_run_stream(thread_id: str = None, request: Request = None):
                     elif isinstance(last_msg, str):
                         query = last_msg
             
-            logger.info(f"Processing query: '{query}'")
+            # No input on a thread whose last run stopped part-way: continue that run
+            # from its last completed node instead of starting over
+            graph_input = pipeline_input(query)
+            if data_dict.get("input") is None and not query and active_graph.checkpointer is not None:
+                snapshot = await active_graph.aget_state(config)
+                if snapshot.next:
+                    logger.info("Resuming thread %s at %s", thread_id, list(snapshot.next))
+                    graph_input = None
+            
+            logger.info("Processing query: '%s'", query)
             
             stream_mode = data_dict.get("stream_mode", "values")
+            result_format = data_dict.get("result_format")
+            produce = lambda: _graph_events(active_graph, graph_input, config, stream_mode, result_format)
+            
+            metadata = {'run_id': run['run_id'], 'thread_id': thread_id}
+            if coalescer.enabled and graph_input is not None and query:
+                # Identical questions in flight share one run (and one set of LLM calls)
+                key = await run_blocking(coalescer.key_for, query, stream_mode, result_format)
+                flight, is_leader = coalescer.join(key, produce)
+                events = flight.events()
+                if not is_leader:
+                    metadata['coalesced'] = True
+            else:
+                events = produce()
             
+            yield f"event: metadata\ndata: {json.dumps(metadata)}\n\n"
+            async for chunk in events:
+                yield chunk
+            
+            yield "event: end\ndata: {}\n\n"
+        except (asyncio.CancelledError, GeneratorExit):
+            # Client went away; the checkpoints let a later run resume this one
+            status = "interrupted"
+            raise
+        except Exception as e:
+            status, error = "error", str(e)
+            logger.error("Streaming error: %s", e, exc_info=True)
+            yield f"event: error\ndata: {json.dumps({'detail': str(e)})}\n\n"
+        finally:
+            await asyncio.shield(run_blocking(run_store.update_run, run["run_id"], status, error))
+            if status == "success":
+                _mark_startup("first_request")
+
+    return StreamingResponse(event_generator(), media_type="text/event-stream")
+
+async def _graph_events(active_graph, graph_input, config, stream_mode, result_format=None):
+    """SSE `data` events of one graph run, then optional `rows` events for the rest of the result."""
+    last_values = None
+    start, status = time.perf_counter(), "error"
+    async with RUNS_IN_FLIGHT.track():
+        try:
             async for event in active_graph.astream(
-                {"user_query": query}, 
+                graph_input, 
                 config=config, 
                 stream_mode=stream_mode
             ):
+                if stream_mode == "values" and isinstance(event, dict):
+                    last_values = event
                 yield f"event: data\ndata: {json.dumps(event)}\n\n"
-            
+            status = "ok"
+        except (asyncio.CancelledError, GeneratorExit):
+            status = "interrupted"
+            raise
+        finally:
+            PIPELINE_LATENCY.labels(status).observe(time.perf_counter() - start)
+    
+    # Optionally push the rows beyond the first page as they are fetched
+    if result_format and last_values and last_values.get("next_page_token"):
+        async for chunk in _result_events(last_values["next_page_token"], result_format):
+            yield chunk
+
+async def _result_events(token: str, fmt: str, batch_size: Optional[int] = None):
+    """SSE `rows` events for a result set, one per fetched batch."""
+    from LangGRAPH_SQL.graph_entry import engine
+    from LangGRAPH_SQL.result_stream import iter_encoded
+    # Batches are fetched and encoded in the threadpool so the event loop stays free
+    async for chunk in iterate_in_threadpool(iter_encoded(engine, token, fmt, batch_size)):
+        if isinstance(chunk, bytes):
+            payload = {"format": fmt, "encoding": "base64", "data": base64.b64encode(chunk).decode()}
+        else:
+            payload = {"format": fmt, "data": chunk}
+        yield f"event: rows\ndata: {json.dumps(payload)}\n\n"
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    """Node latencies, LLM calls/tokens, rate-limit waits, SQL timings and cache hit rates (Prometheus text format)."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/admin/coalescing")
+async def coalescing_stats():
+    """How many streaming requests were attached to an identical in-flight run."""
+    return coalescer.metrics()
+
+@app.get("/admin/query-guard")
+async def query_guard_stats():
+    """Guarded executions, timeouts, early rejections and the current repeat offenders."""
+    return {**query_guard.stats, "offenders": query_guard.offenders()}
+
+@app.get("/admin/index-advisor")
+async def index_advisor_report(request: Request, measure: bool = False):
+    """
+    Index recommendations from the recorded query plans; `measure=true` times them
+    on a scratch copy of finance.db (a full backup plus repeated query runs), so it
+    requires the X-Admin-Token header like /apply.
+    """
+    if measure:
+        _require_admin(request)
+    return await run_blocking(index_advisor.report, measure)
+
+def _require_admin(request: Request):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=403, detail="Admin endpoint disabled: set ADMIN_TOKEN to enable it")
+    if not hmac.compare_digest(request.headers.get("X-Admin-Token", ""), ADMIN_TOKEN):
+        raise HTTPException(status_code=401, detail="Invalid or missing X-Admin-Token header")
+
+@app.post("/admin/index-advisor/apply")
+async def index_advisor_apply(request: Request):
+    """
+    Measure the recommendations and create the ones the query planner actually uses.
+
+    Writes to finance.db, which the pipeline otherwise only opens read-only: the
+    new indexes and ANALYZE move its data_version, which invalidates the answer
+    cache and the value index. Requires the X-Admin-Token header (ADMIN_TOKEN).
+    """
+    _require_admin(request)
+    return await run_blocking(index_advisor.report, True, True)
+
+@app.post("/results/stream")
+async def stream_results(data: ResultStreamRequest):
+    """Stream the rows of a result set from a continuation token (next_page_token in the run state)."""
+    from LangGRAPH_SQL.result_stream import FORMATS, decode_token
+    if data.format not in FORMATS:
+        raise HTTPException(status_code=400, detail=f"Unsupported format '{data.format}'. Choose one of {FORMATS}")
+    try:
+        decode_token(data.token)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def event_generator():
+        try:
+            async for chunk in _result_events(data.token, data.format, data.batch_size):
+                yield chunk
             yield "event: end\ndata: {}\n\n"
+        except QueryTimeoutError as e:
+            logger.warning("Result streaming stopped by query guard: %s", e)
+            yield f"event: error\ndata: {json.dumps(e.to_dict())}\n\n"
         except Exception as e:
-            logger.error(f"Streaming error: {str(e)}", exc_info=True)
+            logger.error("Result streaming error: %s", e, exc_info=True)
             yield f"event: error\ndata: {json.dumps({'detail': str(e)})}\n\n"
 
     return StreamingResponse(event_generator(), media_type="text/event-stream")
@@ -197,7 +464,7 @@ async def create_run_non_stream(thread_id: str, request: Request):
     except:
         data_dict = {}
     
-    logger.info(f"Non-streaming run request: {data_dict}")
+    logger.debug("Non-streaming run request: %s", data_dict)
     
     # Return a dummy run ID
     return {
@@ -26,4 +26,4 @@ if __name__ == "__main__":
     print("RESULT:")
     print("="*70)
     print(result)
-    print("\n\nCheck the logs/ directory for the timestamped log file!")
+    print("\n\nCheck logs/sql_pipeline.jsonl for the run's log lines!")
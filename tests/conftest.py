@@ -0,0 +1,10 @@
+import os
+import sys
+
+# Offline, quiet defaults for every test; set before LangGRAPH_SQL modules read them at import
+os.environ.setdefault("LLM_MODE", "fake")
+os.environ.setdefault("LLM_FAKE_LATENCY", "0")
+os.environ.setdefault("OPIK_TRACK_DISABLE", "true")
+os.environ.setdefault("LOG_CONSOLE", "off")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,94 @@
+import pytest
+
+from LangGRAPH_SQL import answer_cache as answer_cache_module
+from LangGRAPH_SQL.answer_cache import AnswerCache, normalize_question
+
+
+@pytest.mark.parametrize("question, expected", [
+    ("  How much did I SPEND?? ", "how much did i spend"),
+    ("Top five merchants", "top 5 merchants"),
+    ("two hundred", "200"),
+    ("one hundred and five dollars", "105 dollars"),
+    ("twenty-five", "25"),
+    ("two thousand three hundred forty", "2340"),
+    ("one two three", "1 2 3"),
+    ("spent over 1,000.00", "spent over 1000"),
+    ("limit 05", "limit 5"),
+])
+def test_normalize_question(question, expected):
+    assert normalize_question(question) == expected
+
+
+def test_equivalent_questions_share_a_normal_form():
+    assert normalize_question("Top 5 merchants?") == normalize_question("top five   merchants")
+
+
+class FakeVersion:
+    def __init__(self):
+        self.value = "v1"
+
+    def version(self):
+        return self.value
+
+
+@pytest.fixture
+def versions(monkeypatch):
+    data = FakeVersion()
+    schema = {"hash": "kb1"}
+    monkeypatch.setattr(answer_cache_module, "data_version_tracker", data)
+    monkeypatch.setattr(answer_cache_module, "schema_hash", lambda path: schema["hash"])
+    return data, schema
+
+
+@pytest.fixture
+def cache(tmp_path, versions):
+    return AnswerCache(str(tmp_path / "answers.sqlite"), ttl_seconds=3600, max_entries=3)
+
+
+def test_hit_for_a_differently_written_question(cache):
+    cache.put("Top five merchants?", "answer")
+    assert cache.get("top 5 merchants") == "answer"
+    assert cache.get("top 6 merchants") is None
+    assert cache.stats()["hits"] == 1
+    assert cache.stats()["misses"] == 1
+
+
+def test_data_version_change_invalidates_and_purges(cache, versions):
+    data, _ = versions
+    cache.put("q", "old")
+    data.value = "v2"
+    assert cache.get("q") is None
+    assert cache._connection().execute("SELECT COUNT(*) FROM answers").fetchone()[0] == 0
+    assert cache.stats()["evictions"] == 1
+
+
+def test_schema_change_invalidates(cache, versions):
+    _, schema = versions
+    cache.put("q", "old")
+    schema["hash"] = "kb2"
+    assert cache.get("q") is None
+
+
+def test_expired_entries_are_misses(cache):
+    cache.ttl_seconds = -1
+    cache.put("q", "answer")
+    assert cache.get("q") is None
+
+
+def test_lru_eviction_keeps_max_entries(cache, monkeypatch):
+    clock = iter(range(1_000_000, 1_000_100))
+    monkeypatch.setattr(answer_cache_module.time, "time", lambda: float(next(clock)))
+    for i in range(3):
+        cache.put(f"question {i}", str(i))
+    cache.get("question 0")
+    cache.put("question 3", "3")
+    assert cache.get("question 1") is None
+    assert [cache.get(f"question {i}") for i in (0, 2, 3)] == ["0", "2", "3"]
+
+
+def test_version_hashes_the_active_knowledge_base(cache, monkeypatch):
+    seen = []
+    monkeypatch.setattr(answer_cache_module, "schema_hash", lambda path: seen.append(path) or "kb")
+    monkeypatch.setattr(answer_cache_module.kb_service, "path", "/somewhere/kb.json")
+    cache.get("q")
+    assert seen == ["/somewhere/kb.json"]
@@ -0,0 +1,120 @@
+import time
+import sqlite3
+import operator
+from typing import Annotated, TypedDict
+
+import pytest
+from langgraph.checkpoint.base import empty_checkpoint
+from langgraph.graph import StateGraph, START, END
+
+from LangGRAPH_SQL.checkpoint_store import SQLiteCheckpointSaver, RunStore
+
+
+@pytest.fixture
+def saver(tmp_path):
+    return SQLiteCheckpointSaver(str(tmp_path / "checkpoints.db"))
+
+
+def config(thread_id, checkpoint_id=None):
+    configurable = {"thread_id": thread_id, "checkpoint_ns": ""}
+    if checkpoint_id:
+        configurable["checkpoint_id"] = checkpoint_id
+    return {"configurable": configurable}
+
+
+def put_checkpoint(saver, thread_id, parent=None, **values):
+    checkpoint = empty_checkpoint()
+    checkpoint["channel_values"] = values
+    return saver.put(config(thread_id, parent), checkpoint, {"source": "loop", "step": 1}, {})
+
+
+def count(saver, table, thread_id):
+    return saver._read(f"SELECT COUNT(*) FROM {table} WHERE thread_id = ?", (thread_id,))[0][0]
+
+
+def test_put_get_round_trip(saver):
+    first = put_checkpoint(saver, "t1", question="top merchants", rows=[1, 2])
+    second = put_checkpoint(saver, "t1", parent=first["configurable"]["checkpoint_id"], question="next")
+    saver.put_writes(second, [("answer", {"sql": "SELECT 1"})], task_id="task-1")
+
+    latest = saver.get_tuple(config("t1"))
+    assert latest.config == second
+    assert latest.checkpoint["channel_values"] == {"question": "next"}
+    assert latest.metadata["step"] == 1
+    assert latest.parent_config == first
+    assert latest.pending_writes == [("task-1", "answer", {"sql": "SELECT 1"})]
+
+    older = saver.get_tuple(first)
+    assert older.checkpoint["channel_values"] == {"question": "top merchants", "rows": [1, 2]}
+    assert saver.get_tuple(config("unknown")) is None
+
+
+def test_list_newest_first_with_limit_and_before(saver):
+    ids = [put_checkpoint(saver, "t1", n=i)["configurable"]["checkpoint_id"] for i in range(3)]
+    assert [c.config["configurable"]["checkpoint_id"] for c in saver.list(config("t1"))] == ids[::-1]
+    assert len(list(saver.list(config("t1"), limit=1))) == 1
+    before = list(saver.list(config("t1"), before=config("t1", ids[2])))
+    assert [c.config["configurable"]["checkpoint_id"] for c in before] == ids[1::-1]
+
+
+def test_compact_thread_keeps_only_the_latest_checkpoint(saver):
+    configs = [put_checkpoint(saver, "t1", n=i) for i in range(4)]
+    for c in configs:
+        saver.put_writes(c, [("n", 1)], task_id="task")
+    saver.compact_thread("t1")
+    assert count(saver, "checkpoints", "t1") == 1
+    assert count(saver, "writes", "t1") == 1
+    assert saver.get_tuple(config("t1")).config == configs[-1]
+
+
+def test_delete_thread_removes_threads_and_runs(saver):
+    store = RunStore(saver.path)
+    store.create_run("t1", {"question": "q"})
+    put_checkpoint(saver, "t1", n=1)
+    saver.delete_thread("t1")
+    for table in ("checkpoints", "writes", "runs", "threads"):
+        assert count(saver, table, "t1") == 0
+
+
+def test_prune_deletes_idle_threads(tmp_path):
+    saver = SQLiteCheckpointSaver(str(tmp_path / "checkpoints.db"), retention_hours=0)
+    put_checkpoint(saver, "old", n=1)
+    saver.flush()
+    assert saver.prune() == 1
+    assert saver.get_tuple(config("old")) is None
+    assert saver.stats["pruned_threads"] == 1
+
+
+def test_read_waits_only_for_its_own_thread(saver):
+    put_checkpoint(saver, "idle", n=1)
+    saver.flush()
+    # Hold the write lock so the writer cannot commit "busy"'s checkpoint
+    blocker = sqlite3.connect(saver.path, isolation_level=None)
+    blocker.execute("BEGIN IMMEDIATE")
+    try:
+        put_checkpoint(saver, "busy", n=2)
+        start = time.monotonic()
+        assert saver.get_tuple(config("idle")).checkpoint["channel_values"] == {"n": 1}
+        assert time.monotonic() - start < 1.0
+    finally:
+        blocker.execute("ROLLBACK")
+        blocker.close()
+    assert saver.get_tuple(config("busy")).checkpoint["channel_values"] == {"n": 2}
+
+
+class CounterState(TypedDict):
+    steps: Annotated[list, operator.add]
+
+
+def test_graph_resumes_thread_state(saver):
+    builder = StateGraph(CounterState)
+    builder.add_node("step", lambda state: {"steps": [len(state["steps"])]})
+    builder.add_edge(START, "step")
+    builder.add_edge("step", END)
+    graph = builder.compile(checkpointer=saver)
+
+    graph.invoke({"steps": []}, config("thread"))
+    result = graph.invoke({"steps": []}, config("thread"))
+    assert result["steps"] == [0, 1]
+    saver.compact_thread("thread")
+    assert graph.invoke({"steps": []}, config("thread"))["steps"] == [0, 1, 2]
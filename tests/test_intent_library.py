@@ -0,0 +1,76 @@
+from datetime import date
+
+import pytest
+
+from LangGRAPH_SQL.intent_library import intent_library
+from LangGRAPH_SQL.sql_validator import StaticSQLValidator
+
+# Inside finance.db's sample data, so relative periods select rows
+TODAY = date(2026, 1, 20)
+
+
+def classify(question):
+    return intent_library.classify(question, today=TODAY)
+
+
+def limit_of(match):
+    return int(match.sql.rsplit("LIMIT", 1)[1])
+
+
+@pytest.mark.parametrize("question, intent", [
+    ("Top merchants by spend", "top_merchants"),
+    ("What are my 10 biggest merchants this year?", "top_merchants"),
+    ("How much did I spend on food last month?", "total_spend"),
+    ("How much did I spend between 2025-12-01 and 2025-12-31?", "total_spend"),
+    ("Spending by category last month", "spend_by_category"),
+    ("Am I over budget?", "budget_status"),
+    ("Any subscription price increases?", "subscription_price_changes"),
+    ("What subscriptions do I have?", "subscriptions"),
+])
+def test_common_questions_match_a_template(question, intent):
+    match = classify(question)
+    assert match.matched
+    assert match.intent == intent
+    assert StaticSQLValidator().validate(match.sql).ok
+
+
+@pytest.mark.parametrize("question", [
+    "What is my average daily spending?",
+    "Top 5 merchants by spend on weekends",
+    "How much did I spend excluding Amazon?",
+    "How much did I spend at Amazon and Zara?",
+    "What was my total income this year?",
+    "Which merchants did I visit more than 5 times?",
+    "Top 500 merchants",
+    "Tell me a joke",
+])
+def test_unsupported_shapes_fall_through_to_the_llm(question):
+    match = classify(question)
+    assert not match.matched
+    assert match.sql is None
+
+
+def test_slots_are_extracted_and_rendered():
+    match = classify("Top 3 merchants by spend last month")
+    assert match.slots["n"] == 3
+    assert match.slots["period"]["start"] == "2025-12-01"
+    assert "date >= '2025-12-01' AND date < '2026-01-01'" in match.sql
+    assert limit_of(match) == 3
+
+
+def test_misspelled_merchant_resolves_through_the_value_index():
+    match = classify("How much did I spend at Amazn?")
+    assert match.slots["merchant"] == "Amazon"
+    assert "merchant = 'Amazon'" in match.sql
+
+
+@pytest.mark.parametrize("question, limit", [
+    ("How much did I spend at the top merchant?", 1),
+    ("Which merchant did I spend the most at?", 1),
+    ("Top merchants by spend", 5),
+    ("Which merchants did I spend the most at?", 5),
+])
+def test_singular_merchant_questions_ask_for_one_row(question, limit):
+    match = classify(question)
+    assert match.intent == "top_merchants"
+    assert limit_of(match) == limit
@@ -0,0 +1,109 @@
+import asyncio
+
+import pytest
+from langchain_core.messages import AIMessage
+from langchain_core.prompt_values import StringPromptValue
+
+from LangGRAPH_SQL import llm_cache as llm_cache_module
+from LangGRAPH_SQL.llm_cache import LLMResponseCache, cached_model
+
+
+class CountingModel:
+    """Chat model stand-in that answers with a counter and records its calls."""
+
+    def __init__(self, mode=None, model="test-model", temperature=0):
+        self.mode = mode
+        self.model = model
+        self.temperature = temperature
+        self.calls = 0
+
+    def invoke(self, prompt, config=None):
+        self.calls += 1
+        return AIMessage(content=f"answer {self.calls}")
+
+    async def ainvoke(self, prompt, config=None):
+        return self.invoke(prompt, config)
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = LLMResponseCache(str(tmp_path / "llm_cache.sqlite"))
+    monkeypatch.setattr(llm_cache_module, "llm_cache", cache)
+    return cache
+
+
+def prompt(text="SELECT what?"):
+    return StringPromptValue(text=text)
+
+
+def test_key_depends_on_prompt_model_and_temperature():
+    key = LLMResponseCache.make_key("p", "m", 0)
+    assert key == LLMResponseCache.make_key("p", "m", 0)
+    assert len({key, LLMResponseCache.make_key("p2", "m", 0), LLMResponseCache.make_key("p", "m2", 0),
+                LLMResponseCache.make_key("p", "m", 0.5)}) == 4
+
+
+def test_get_put_round_trip_and_stats(cache):
+    assert cache.get("k", "chain") is None
+    cache.put("k", "chain", "m", "response")
+    assert cache.get("k", "chain") == "response"
+    assert cache.stats()["chain"]["hits"] == 1
+    assert cache.stats()["chain"]["misses"] == 1
+
+
+def test_eviction_keeps_the_cache_under_max_bytes(cache):
+    cache.max_bytes = 100
+    for i in range(50):
+        cache.put(f"k{i}", "chain", "m", "x" * 10)
+    total = cache._connection().execute("SELECT SUM(size) FROM responses").fetchone()[0]
+    assert total <= 100
+
+
+def test_second_call_is_served_from_cache(cache):
+    model = CountingModel(mode="fake")
+    runnable = cached_model(model, "test_chain")
+    assert runnable.invoke(prompt()).content == "answer 1"
+    assert runnable.invoke(prompt()).content == "answer 1"
+    assert runnable.invoke(prompt("other")).content == "answer 2"
+    assert model.calls == 2
+
+
+def test_async_path_shares_the_cache(cache):
+    model = CountingModel(mode="fake")
+    runnable = cached_model(model, "test_chain")
+    runnable.invoke(prompt())
+
+    async def run():
+        return await runnable.ainvoke(prompt())
+
+    assert asyncio.run(run()).content == "answer 1"
+    assert model.calls == 1
+
+
+def test_bypassed_chain_always_calls_the_model(cache):
+    model = CountingModel(mode="fake")
+    runnable = cached_model(model, "test_chain")
+    cache.set_bypass("test_chain")
+    runnable.invoke(prompt())
+    runnable.invoke(prompt())
+    assert model.calls == 2
+
+
+@pytest.mark.parametrize("mode", ["record", "replay"])
+def test_record_and_replay_modes_skip_the_cache(cache, mode):
+    cached_model(CountingModel(mode="fake"), "test_chain").invoke(prompt())
+    model = CountingModel(mode=mode)
+    runnable = cached_model(model, "test_chain")
+    runnable.invoke(prompt())
+    runnable.invoke(prompt())
+    assert model.calls == 2
+
+
+def test_mode_switch_after_building_the_chain_skips_the_cache(cache, monkeypatch):
+    model = CountingModel(mode=None)
+    runnable = cached_model(model, "test_chain")
+    runnable.invoke(prompt())
+    monkeypatch.setenv("LLM_MODE", "record")
+    runnable.invoke(prompt())
+    asyncio.run(runnable.ainvoke(prompt()))
+    assert model.calls == 3
@@ -0,0 +1,110 @@
+import asyncio
+
+import pytest
+
+from LangGRAPH_SQL.rate_limiter_utils import _ModelBucket, GlobalRateLimiter, estimate_tokens, PROMPT_OVERHEAD_TOKENS
+
+
+def test_requests_within_budget_start_immediately():
+    bucket = _ModelBucket(rpm=3, tpm=0, window=60.0)
+    assert [bucket.reserve(10, now=100.0) for _ in range(3)] == [100.0, 100.0, 100.0]
+
+
+def test_request_over_rpm_waits_for_oldest_grant_to_leave_window():
+    bucket = _ModelBucket(rpm=2, tpm=0, window=60.0)
+    bucket.reserve(10, now=0.0)
+    bucket.reserve(10, now=5.0)
+    assert bucket.reserve(10, now=10.0) == 60.0
+    # The next one is gated by the second grant
+    assert bucket.reserve(10, now=10.0) == 65.0
+
+
+def test_token_budget_delays_until_enough_tokens_expire():
+    bucket = _ModelBucket(rpm=0, tpm=1000, window=60.0)
+    assert bucket.reserve(600, now=0.0) == 0.0
+    assert bucket.reserve(300, now=1.0) == 1.0
+    # 600 + 300 + 500 > 1000: the first grant has to leave the window
+    assert bucket.reserve(500, now=2.0) == 60.0
+
+
+def test_oversized_request_is_capped_to_the_tpm_budget():
+    bucket = _ModelBucket(rpm=0, tpm=1000, window=60.0)
+    assert bucket.reserve(5000, now=0.0) == 0.0
+    assert bucket.window_tokens == 1000
+
+
+def test_grants_are_fifo_never_earlier_than_previous_start():
+    bucket = _ModelBucket(rpm=1, tpm=0, window=60.0)
+    starts = [bucket.reserve(1, now=float(t)) for t in (0, 1, 2, 3)]
+    assert starts == [0.0, 60.0, 120.0, 180.0]
+
+
+def test_expired_grants_are_dropped_from_the_window():
+    bucket = _ModelBucket(rpm=1, tpm=100, window=60.0)
+    bucket.reserve(100, now=0.0)
+    assert bucket.reserve(100, now=61.0) == 61.0
+    assert len(bucket.grants) == 1
+    assert bucket.window_tokens == 100
+
+
+def test_released_grant_frees_its_slot():
+    bucket = _ModelBucket(rpm=1, tpm=1000, window=60.0)
+    bucket.reserve(100, now=0.0)
+    assert bucket.reserve(100, now=1.0) == 60.0
+    bucket.release(60.0, 100)
+    assert bucket.window_tokens == 100
+    # The next caller takes the released slot instead of queueing behind it
+    assert bucket.reserve(100, now=2.0) == 60.0
+
+
+def test_unlimited_bucket_never_waits():
+    bucket = _ModelBucket(rpm=0, tpm=0, window=60.0)
+    assert all(bucket.reserve(10**6, now=0.0) == 0.0 for _ in range(100))
+
+
+def test_estimate_tokens_adds_prompt_overhead():
+    assert estimate_tokens("a" * 400, None) == 100 + PROMPT_OVERHEAD_TOKENS
+
+
+@pytest.fixture
+def limiter(monkeypatch):
+    monkeypatch.setenv("LLM_RPM_LIMIT", "2")
+    monkeypatch.setenv("LLM_TPM_LIMIT", "0")
+    limiter = GlobalRateLimiter()
+    limiter.reset()
+    yield limiter
+    limiter.reset()
+
+
+def test_limiter_is_a_process_wide_singleton():
+    assert GlobalRateLimiter() is GlobalRateLimiter()
+
+
+def test_limiter_reports_delay_and_stats(limiter):
+    model = "test-model"
+    assert limiter._reserve(model, 10) == 0.0
+    assert limiter._reserve(model, 10) == 0.0
+    delay = limiter._reserve(model, 10)
+    assert 59.0 < delay <= 60.0
+    stats = limiter.stats()[model]
+    assert stats["calls"] == 3
+    assert stats["tokens"] == 30
+    assert stats["waits"] == 1
+
+
+def test_cancelled_async_waiter_returns_its_reservation(limiter):
+    model = "test-model"
+    limiter._reserve(model, 10)
+    limiter._reserve(model, 10)
+
+    async def cancel_waiter():
+        waiter = asyncio.create_task(limiter.aacquire(10, model))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+
+    asyncio.run(cancel_waiter())
+    assert limiter.stats()[model]["calls"] == 2
+    # Only the two granted calls hold the window: the next caller waits one window, not two
+    assert 59.0 < limiter._reserve(model, 10) <= 60.0
@@ -0,0 +1,117 @@
+import json
+import base64
+import sqlite3
+
+import pytest
+
+from LangGRAPH_SQL.db_engine import create_readonly_engine
+from LangGRAPH_SQL.result_stream import (
+    decode_token, encode_token, encode_batch, fetch_page, iter_batches, iter_encoded, keyset_column,
+)
+
+ROWS = 23
+
+
+@pytest.fixture(scope="module")
+def engine(tmp_path_factory):
+    path = tmp_path_factory.mktemp("stream") / "ledger.db"
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE t (id INTEGER PRIMARY KEY, amount REAL)")
+    # Amounts descend while ids ascend, so "ORDER BY amount" is not key order
+    conn.executemany("INSERT INTO t VALUES (?, ?)", [(i, float(ROWS - i) if i % 2 else float(i)) for i in range(ROWS)])
+    conn.commit()
+    conn.close()
+    engine = create_readonly_engine(str(path))
+    yield engine
+    engine.dispose()
+
+
+def test_token_round_trip():
+    payload = {"sql": "SELECT 1", "offset": 50}
+    assert decode_token(encode_token(payload)) == payload
+
+
+def test_tampered_body_is_rejected():
+    body, sig = encode_token({"sql": "SELECT id FROM t", "offset": 0}).rsplit(".", 1)
+    forged = base64.urlsafe_b64encode(json.dumps({"sql": "SELECT * FROM secrets", "offset": 0}).encode()).decode()
+    with pytest.raises(ValueError, match="signature"):
+        decode_token(f"{forged}.{sig}")
+
+
+def test_tampered_signature_is_rejected():
+    token = encode_token({"sql": "SELECT 1", "offset": 0})
+    flipped = token[:-1] + ("0" if token[-1] != "0" else "1")
+    with pytest.raises(ValueError, match="signature"):
+        decode_token(flipped)
+
+
+@pytest.mark.parametrize("token", ["", "no-signature", None])
+def test_malformed_tokens_are_rejected(token):
+    with pytest.raises(ValueError):
+        decode_token(token)
+
+
+def collect_pages(engine, sql, page_size, key_column=None):
+    page = fetch_page(engine, sql, page_size=page_size, key_column=key_column)
+    rows, pages = list(page.rows), 1
+    while page.next_token:
+        page = fetch_page(engine, token=page.next_token, page_size=page_size)
+        rows.extend(page.rows)
+        pages += 1
+    return rows, pages
+
+
+def test_offset_pages_cover_the_result_once(engine):
+    sql = "SELECT id, amount FROM t ORDER BY amount, id"
+    rows, pages = collect_pages(engine, sql, page_size=5)
+    assert pages == 5
+    assert rows == list(next(iter_batches(engine, sql, batch_size=100))[1])
+
+
+def test_keyset_pages_follow_key_order_even_when_sql_orders_otherwise(engine):
+    rows, _ = collect_pages(engine, "SELECT id, amount FROM t ORDER BY amount DESC", page_size=4, key_column="id")
+    ids = [r[0] for r in rows]
+    assert ids == list(range(ROWS))
+
+
+@pytest.mark.parametrize("sql, expected", [
+    ("SELECT * FROM t WHERE amount > 3", "id"),
+    ("SELECT t.id, amount FROM t ORDER BY t.id ASC", "id"),
+    ("SELECT amount FROM t", None),
+    ("SELECT id, amount FROM t ORDER BY amount", None),
+    ("SELECT id FROM t ORDER BY id DESC", None),
+    ("SELECT DISTINCT id FROM t", None),
+    ("SELECT id FROM t WHERE id IN (SELECT id FROM t)", None),
+])
+def test_keyset_column_only_when_key_order_is_safe(engine, sql, expected):
+    assert keyset_column(engine, sql) == expected
+
+
+def test_detected_keyset_tokens_seek_by_key(engine):
+    sql = "SELECT id, amount FROM t WHERE amount > 3"
+    page = fetch_page(engine, sql, page_size=5, key_column=keyset_column(engine, sql))
+    state = decode_token(page.next_token)
+    assert state["key"] == "id" and state["after"] == page.rows[-1][0]
+    rows, _ = collect_pages(engine, sql, page_size=5, key_column="id")
+    assert rows == list(next(iter_batches(engine, sql, batch_size=100))[1])
+
+
+def test_page_without_more_rows_has_no_token(engine):
+    page = fetch_page(engine, "SELECT id FROM t", page_size=ROWS)
+    assert len(page.rows) == ROWS
+    assert page.next_token is None
+
+
+def test_stream_resumes_after_first_page(engine):
+    page = fetch_page(engine, "SELECT id FROM t ORDER BY id", page_size=10)
+    chunks = list(iter_encoded(engine, page.next_token, "jsonl", batch_size=5))
+    assert len(chunks) == 3
+    streamed = [json.loads(line)["id"] for chunk in chunks for line in chunk.splitlines()]
+    assert streamed == list(range(10, ROWS))
+
+
+def test_csv_header_only_on_request():
+    assert encode_batch("csv", ["a", "b"], [(1, 2)], header=True).splitlines() == ["a,b", "1,2"]
+    assert encode_batch("csv", ["a", "b"], [(1, 2)], header=False).splitlines() == ["1,2"]
+    with pytest.raises(ValueError):
+        encode_batch("xml", ["a"], [(1,)])
@@ -0,0 +1,66 @@
+import pytest
+
+from LangGRAPH_SQL.sql_validator import StaticSQLValidator, extract_sql, string_literals
+
+
+@pytest.fixture(scope="module")
+def validator():
+    return StaticSQLValidator()
+
+
+def issues(validator, text, fuzz_match=None):
+    return validator.validate(text, fuzz_match).issues
+
+
+@pytest.mark.parametrize("sql", [
+    "SELECT merchant, SUM(amount) AS total FROM transactions GROUP BY merchant ORDER BY total DESC LIMIT 5",
+    "SELECT category, monthly_limit FROM budgets;",
+    "WITH s AS (SELECT category, SUM(amount) AS spent FROM transactions GROUP BY category) "
+    "SELECT s.category FROM s JOIN budgets b ON b.category = s.category WHERE s.spent > b.monthly_limit",
+    "```sql\nSELECT service_name FROM recurring_subscriptions\n```",
+    "Sure, here it is: SELECT COUNT(*) FROM transactions WHERE merchant = 'Joe''s; Cafe'",
+])
+def test_accepts_plain_selects_over_known_columns(validator, sql):
+    assert issues(validator, sql) == []
+
+
+@pytest.mark.parametrize("sql, expected", [
+    ("", "No SQL statement found"),
+    ("DELETE FROM transactions", "Only SELECT statements are allowed"),
+    ("SELECT 1; DROP TABLE budgets", "Multiple statements are not allowed"),
+    ("SELECT * FROM no_such_table", "SQLite cannot compile the query"),
+    ("SELECT missing_column FROM transactions", "SQLite cannot compile the query"),
+    ("SELECT name FROM sqlite_master", "is not in the knowledge base"),
+    ("WITH d AS (DELETE FROM budgets RETURNING *) SELECT * FROM d", "SQLite cannot compile the query"),
+])
+def test_rejects(validator, sql, expected):
+    found = issues(validator, sql)
+    assert any(expected in issue for issue in found), found
+
+
+def test_rejects_non_select_actions_hidden_in_a_select(validator):
+    found = issues(validator, "SELECT * FROM pragma_table_info('budgets')")
+    assert any("non-SELECT action" in issue for issue in found), found
+
+
+FUZZ_MATCH = [["table name:transactions", "column_name:merchant", "filter_value:Amazon"]]
+
+
+def test_filter_values_must_be_used_verbatim(validator):
+    assert issues(validator, "SELECT SUM(amount) FROM transactions WHERE merchant = 'Amazon'", FUZZ_MATCH) == []
+    found = issues(validator, "SELECT SUM(amount) FROM transactions WHERE merchant = 'amazon'", FUZZ_MATCH)
+    assert "Filter value 'Amazon' for column 'merchant' is missing from the query" in found
+    assert "Column 'merchant' is filtered on 'amazon', which is not a matched value" in found
+
+
+def test_fast_path_rate_counts_outcomes():
+    validator = StaticSQLValidator()
+    validator.validate("SELECT amount FROM transactions")
+    validator.validate("DROP TABLE budgets")
+    assert validator.fast_path_rate() == 0.5
+
+
+def test_extract_sql_and_literals():
+    assert extract_sql("mysql\nSELECT 1") == "SELECT 1"
+    assert extract_sql("Here you go:\n```sql\nSELECT 2;\n```\nDone") == "SELECT 2;"
+    assert string_literals("WHERE a = 'x' AND b IN ('it''s', 'y')") == ["x", "it's", "y"]